@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+API_KEY = os.environ.setdefault("SERVICE_API_KEY", "bench-key")
+
+AGENT_MODULES = {
+    "solar": "services.solar_agent.app.main:app",
+    "battery": "services.battery_agent.app.main:app",
+    "vehicle": "services.vehicle_agent.app.main:app",
+    "load": "services.load_agent.app.main:app",
+}
+
+AGENT_URL_ENV = {
+    "solar": "SOLAR_AGENT_URL",
+    "battery": "BATTERY_AGENT_URL",
+    "vehicle": "VEHICLE_AGENT_URL",
+    "load": "LOAD_AGENT_URL",
+}
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_healthy(url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=0.5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Service at {url} did not become healthy")
+
+
+@dataclass
+class LocalServices:
+    urls: Dict[str, str]
+    processes: List[subprocess.Popen]
+
+    def rss_kib(self) -> int:
+        """Resident memory of all service processes (Linux only)."""
+        total = 0
+        for process in self.processes:
+            with open(f"/proc/{process.pid}/status", encoding="ascii") as status_file:
+                for line in status_file:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        return total
+
+
+@contextmanager
+def uvicorn_services(
+    modules: Dict[str, str], env: Dict[str, str] | None = None, extra_args: Sequence[str] = ()
+) -> Iterator[LocalServices]:
+    """Start each ``name -> module:app`` as a local uvicorn subprocess."""
+    processes: List[subprocess.Popen] = []
+    urls: Dict[str, str] = {}
+    child_env = {**os.environ, "PYTHONPATH": str(REPO_ROOT), **(env or {})}
+    try:
+        for name, module in modules.items():
+            port = free_port()
+            urls[name] = f"http://127.0.0.1:{port}"
+            processes.append(
+                subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+                     "--log-level", "warning", "--timeout-graceful-shutdown", "2", *extra_args],
+                    cwd=REPO_ROOT,
+                    env=child_env,
+                )
+            )
+        for url in urls.values():
+            _wait_until_healthy(url)
+        yield LocalServices(urls=urls, processes=processes)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+@contextmanager
+def running_agents() -> Iterator[Dict[str, str]]:
+    """Start the four agents and export their URLs so the central settings pick them up."""
+    with uvicorn_services(AGENT_MODULES) as services:
+        for name, url in services.urls.items():
+            os.environ[AGENT_URL_ENV[name]] = url
+        yield services.urls
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize_ms(samples: list[float]) -> Dict[str, float]:
+    return {
+        "mean_ms": 1000 * sum(samples) / len(samples),
+        "p50_ms": 1000 * percentile(samples, 50),
+        "p95_ms": 1000 * percentile(samples, 95),
+        "p99_ms": 1000 * percentile(samples, 99),
+    }
+
+
+IN_PROCESS_URLS = {
+    "solar": "http://solar.inprocess",
+    "battery": "http://battery.inprocess",
+    "vehicle": "http://vehicle.inprocess",
+    "load": "http://load.inprocess",
+}
+
+
+def in_process_agents() -> Dict[str, httpx.AsyncBaseTransport]:
+    """Point the central settings at the agent apps imported into this process.
+
+    Returns ``base URL -> ASGI transport`` for ``build_http_client(transports=...)``.
+    """
+    import importlib
+
+    transports: Dict[str, httpx.AsyncBaseTransport] = {}
+    for name, module in AGENT_MODULES.items():
+        module_name, attribute = module.split(":")
+        agent_app = getattr(importlib.import_module(module_name), attribute)
+        os.environ[AGENT_URL_ENV[name]] = IN_PROCESS_URLS[name]
+        transports[IN_PROCESS_URLS[name]] = httpx.ASGITransport(app=agent_app)
+    return transports
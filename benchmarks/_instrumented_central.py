@@ -0,0 +1,118 @@
+"""The central app with per-hop and per-phase timings, for ``benchmarks.load_test``.
+
+Importing this module wraps the coordination phases of ``services.central.app.main``
+and hooks the shared HTTP client, so every call to an agent is timed under
+``(phase, agent, request)``. ``GET /bench/timings`` returns the percentiles
+collected since the last ``POST /bench/timings/reset``. Serve it with::
+
+    uvicorn benchmarks._instrumented_central:app
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks._agents import AGENT_URL_ENV, summarize_ms
+from services.central.app import main as central
+
+PHASES = ("push_measurements", "fetch_statuses", "plan_actions", "execute_plan", "execute_plan_concurrently")
+
+app = central.app
+_hops: Dict[Tuple[str, str, str], List[float]] = defaultdict(list)
+_phases: Dict[str, List[float]] = defaultdict(list)
+_current_phase: ContextVar[str] = ContextVar("bench_phase", default="other")
+
+
+def _timed(name: str, function: Callable) -> Callable:
+    if inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def timed_async(*args: Any, **kwargs: Any) -> Any:
+            # Tasks spawned for the fan-out copy the context, so their hops see this phase.
+            token = _current_phase.set(name)
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                _phases[name].append(time.perf_counter() - started)
+                _current_phase.reset(token)
+
+        return timed_async
+
+    @functools.wraps(function)
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _phases[name].append(time.perf_counter() - started)
+
+    return timed
+
+
+for _name in PHASES:
+    setattr(central, _name, _timed(_name, getattr(central, _name)))
+
+
+def _agent_names() -> Dict[str, str]:
+    names = {}
+    for name, variable in AGENT_URL_ENV.items():
+        url = os.environ.get(variable)
+        if url:
+            names[httpx.URL(url).netloc.decode()] = name
+    return names
+
+
+def _install_hooks(client: httpx.AsyncClient) -> None:
+    agents = _agent_names()
+
+    async def on_request(request: httpx.Request) -> None:
+        request.extensions["bench_started"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response) -> None:
+        request = response.request
+        elapsed = time.perf_counter() - request.extensions["bench_started"]
+        agent = agents.get(request.url.netloc.decode(), request.url.host)
+        _hops[(_current_phase.get(), agent, f"{request.method} {request.url.path}")].append(elapsed)
+
+    client.event_hooks["request"].append(on_request)
+    client.event_hooks["response"].append(on_response)
+
+
+_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def _instrumented_lifespan(application):
+    async with _lifespan(application):
+        _install_hooks(application.state.http_client)
+        yield
+
+
+app.router.lifespan_context = _instrumented_lifespan
+
+
+@app.get("/bench/timings", include_in_schema=False)
+def timings() -> Dict[str, Any]:
+    return {
+        "phases": {name: {"count": len(samples), **summarize_ms(samples)} for name, samples in _phases.items()},
+        "hops": [
+            {"phase": phase, "agent": agent, "request": request, "count": len(samples), **summarize_ms(samples)}
+            for (phase, agent, request), samples in sorted(_hops.items())
+        ],
+    }
+
+
+@app.post("/bench/timings/reset", include_in_schema=False)
+def reset_timings() -> Dict[str, str]:
+    _hops.clear()
+    _phases.clear()
+    return {"status": "ok"}
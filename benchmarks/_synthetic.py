@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+
+
+def synthetic_columns(count: int, seed: int = 0):
+    """Random but physically consistent site states, one row per site."""
+    from services.central.app.dispatch import SiteColumns
+
+    rng = np.random.default_rng(seed)
+    battery_capacity = rng.uniform(5, 20, count)
+    vehicle_capacity = rng.uniform(40, 80, count)
+    flexible = rng.uniform(0, 5, count)
+    return SiteColumns(
+        production_kw=rng.uniform(0, 12, count),
+        consumption_kw=rng.uniform(1, 12, count),
+        battery_capacity_kwh=battery_capacity,
+        battery_soc_kwh=rng.uniform(0, 1, count) * battery_capacity,
+        battery_min_soc_kwh=0.1 * battery_capacity,
+        battery_max_charge_kw=rng.uniform(2, 5, count),
+        battery_max_discharge_kw=rng.uniform(2, 5, count),
+        vehicle_connected=rng.random(count) < 0.7,
+        vehicle_capacity_kwh=vehicle_capacity,
+        vehicle_soc_kwh=rng.uniform(0, 1, count) * vehicle_capacity,
+        vehicle_max_charge_kw=rng.uniform(3, 11, count),
+        vehicle_max_discharge_kw=rng.uniform(3, 11, count),
+        flexible_load_kw=flexible,
+        shed_kw=rng.uniform(0, 1, count) * flexible,
+    )
+
+
+def synthetic_statuses(count: int, seed: int = 0) -> List:
+    from services.central.app.models import BatteryStatus, LoadStatus, SolarStatus, SystemStatus, VehicleStatus
+
+    c = synthetic_columns(count, seed)
+    statuses = []
+    for index in range(count):
+        flexible = float(c.flexible_load_kw[index])
+        shed = float(c.shed_kw[index])
+        critical = max(float(c.consumption_kw[index]) - (flexible - shed), 0.0)
+        statuses.append(
+            SystemStatus(
+                solar=SolarStatus(production_kw=float(c.production_kw[index])),
+                battery=BatteryStatus(
+                    capacity_kwh=float(c.battery_capacity_kwh[index]),
+                    state_of_charge_kwh=float(c.battery_soc_kwh[index]),
+                    min_state_of_charge_kwh=float(c.battery_min_soc_kwh[index]),
+                    max_charge_rate_kw=float(c.battery_max_charge_kw[index]),
+                    max_discharge_rate_kw=float(c.battery_max_discharge_kw[index]),
+                    mode="idle",
+                    power_kw=0.0,
+                ),
+                vehicle=VehicleStatus(
+                    connected=bool(c.vehicle_connected[index]),
+                    capacity_kwh=float(c.vehicle_capacity_kwh[index]),
+                    state_of_charge_kwh=float(c.vehicle_soc_kwh[index]),
+                    max_charge_rate_kw=float(c.vehicle_max_charge_kw[index]),
+                    max_discharge_rate_kw=float(c.vehicle_max_discharge_kw[index]),
+                    mode="idle",
+                    power_kw=0.0,
+                ),
+                load=LoadStatus(
+                    critical_load_kw=critical,
+                    flexible_load_kw=flexible,
+                    shed_kw=shed,
+                    total_nominal_load_kw=critical + flexible,
+                    total_consumption_kw=critical + flexible - shed,
+                ),
+            )
+        )
+    return statuses
@@ -0,0 +1,83 @@
+"""Requests per second of the agents' mutating endpoints, driven in process through ASGI.
+
+Measures handler, validation and serialization cost without sockets: battery and
+vehicle ``/control`` and load ``/shed`` at each ``--concurrency`` level, with and
+without ``expected_version`` (the optimistic variant re-reads the version from each
+reply and retries on ``409``). Run from the repository root::
+
+    python -m benchmarks.bench_agent_mutations --requests 3000 --concurrency 1 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from benchmarks._agents import AGENT_MODULES, API_KEY
+
+ENDPOINTS: Dict[str, tuple[str, Callable[[int], Dict[str, Any]]]] = {
+    "battery": ("/control", lambda i: {"mode": "charge" if i % 2 else "discharge", "power_kw": 0.5}),
+    "vehicle": ("/control", lambda i: {"mode": "charge" if i % 2 else "discharge", "power_kw": 0.5}),
+    "load": ("/shed", lambda i: {"shed_kw": 0.1 * (i % 10)}),
+}
+
+
+async def _drive(client: httpx.AsyncClient, path: str, body, requests: int, concurrency: int, optimistic: bool):
+    remaining = iter(range(requests))
+    latest = int((await client.get("/status")).headers["X-State-Version"])
+    conflicts = 0
+
+    async def worker() -> None:
+        nonlocal latest, conflicts
+        for index in remaining:
+            while True:
+                payload = body(index)
+                if optimistic:
+                    payload["expected_version"] = latest
+                response = await client.post(path, json=payload)
+                latest = max(latest, int(response.headers["X-State-Version"]))
+                if response.status_code != 409:
+                    response.raise_for_status()
+                    break
+                conflicts += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"requests_per_s": requests / (time.perf_counter() - started), "conflicts": conflicts}
+
+
+async def run(requests: int, levels: List[int]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name, (path, body) in ENDPOINTS.items():
+        module_name, attribute = AGENT_MODULES[name].split(":")
+        app = getattr(importlib.import_module(module_name), attribute)
+        transport = httpx.ASGITransport(app=app)
+        headers = {"X-API-Key": API_KEY}
+        async with httpx.AsyncClient(transport=transport, base_url=f"http://{name}", headers=headers) as client:
+            if name == "vehicle":
+                await client.post("/update", json={"connected": True, "state_of_charge_kwh": 30.0})
+            results[f"{name} {path}"] = {
+                f"c={concurrency}{' optimistic' if optimistic else ''}": await _drive(
+                    client, path, body, requests, concurrency, optimistic
+                )
+                for concurrency in levels
+                for optimistic in (False, True)
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark the vectorized multi-site dispatch used by ``POST /coordinate/batch``.
+
+Two measurements per site count:
+
+* ``allocate``: the NumPy allocation pass alone over synthetic site states;
+* ``endpoint``: the whole ``/coordinate/batch`` request with every site pointing
+  at the four agents running in-process (ASGI transport, no sockets).
+
+Run from the repository root::
+
+    python -m benchmarks.bench_batch_dispatch --sizes 1 100 10000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks._agents import API_KEY, in_process_agents
+from benchmarks._synthetic import synthetic_columns
+
+
+def bench_allocate(count: int, repeat: int) -> float:
+    from services.central.app.dispatch import allocate
+
+    columns = synthetic_columns(count)
+    allocate(columns)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        allocate(columns)
+    return (time.perf_counter() - started) / repeat
+
+
+async def bench_endpoint(count: int) -> float:
+    transports = in_process_agents()
+    from services.central.app import main as central
+
+    central.app.state.http_client = central.build_http_client(transports=transports)
+    rng = np.random.default_rng(count)
+    body = {
+        "sites": {
+            f"site-{index}": {
+                "solar": {"production_kw": float(rng.uniform(0, 12))},
+                "load": {"critical_load_kw": float(rng.uniform(1, 6)), "flexible_load_kw": float(rng.uniform(0, 5))},
+            }
+            for index in range(count)
+        }
+    }
+    # Every synthetic site shares the in-process agents of the default site.
+    default_agents = central.site_agents()
+    central.settings.sites = {site_id: default_agents for site_id in body["sites"]}
+    transport = httpx.ASGITransport(app=central.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://central", timeout=None) as client:
+        started = time.perf_counter()
+        response = await client.post("/coordinate/batch", json=body, headers={"X-API-Key": API_KEY})
+        elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    await central.app.state.http_client.aclose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'sites':>8} {'allocate':>14} {'sites/s':>14} {'endpoint':>12} {'sites/s':>12}")
+    for count in args.sizes:
+        allocate_seconds = bench_allocate(count, args.repeat)
+        endpoint_seconds = asyncio.run(bench_endpoint(count))
+        print(
+            f"{count:>8} {allocate_seconds * 1e6:>12.1f}us {count / allocate_seconds:>14,.0f} "
+            f"{endpoint_seconds * 1e3:>10.1f}ms {count / endpoint_seconds:>12,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Rate accuracy and timing of central's internal control loop, against a loop that sleeps one period per tick.
+
+Central and the agents run in process. For each ``--rate`` the control loop runs
+for ``--seconds`` and reports the achieved tick rate, skipped ticks, tick duration
+and lateness (start after the due time); the baseline, ``await tick(); await
+asyncio.sleep(1 / rate)``, runs the same ticks for the same time. Rates above what
+one cycle allows show the loop skipping deadlines instead of falling behind.
+Run from the repository root::
+
+    python -m benchmarks.bench_control_loop --rate 5 20 50 200 --seconds 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from benchmarks._agents import in_process_agents
+
+
+async def _sleeping_loop(tick, rate: float, seconds: float) -> Dict[str, Any]:
+    ticks = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        await tick()
+        ticks += 1
+        await asyncio.sleep(1.0 / rate)
+    return {"achieved_hz": ticks / (time.perf_counter() - started)}
+
+
+async def run(rates: List[float], seconds: float) -> Dict[str, Any]:
+    transports = in_process_agents()
+    from services.central.app import main as central
+    from services.central.app.control_loop import ControlLoop
+    from services.central.app.models import CoordinationPayload
+
+    central.app.state.agent_transports = transports
+    report: Dict[str, Any] = {}
+    async with central.app.router.lifespan_context(central.app):
+        queue = central.app.state.coordination_queue
+
+        async def tick() -> None:
+            await queue.submit(CoordinationPayload())
+
+        for rate in rates:
+            loop = ControlLoop(tick, rate)
+            started = time.perf_counter()
+            loop.start()
+            await asyncio.sleep(seconds)
+            await loop.stop()
+            stats = loop.stats()
+            report[f"{rate:g} Hz"] = {
+                "control_loop": {
+                    "achieved_hz": stats.ticks / (time.perf_counter() - started),
+                    "skipped_ticks": stats.skipped_ticks,
+                    "duration": stats.duration.model_dump() if stats.duration else None,
+                    "lateness": stats.lateness.model_dump() if stats.lateness else None,
+                },
+                "sleeping_loop": await _sleeping_loop(tick, rate, seconds),
+            }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, nargs="+", default=[5.0, 20.0, 50.0, 200.0])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rate, args.seconds)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Memory and latency of the five-process deployment versus the single-process edge node.
+
+Both modes run under local uvicorn processes. The benchmark drives ``POST /coordinate``
+and ``GET /status`` on the central endpoint and reports the total resident memory of
+the processes involved. Run from the repository root (Linux only, for the RSS)::
+
+    python -m benchmarks.bench_deployment_modes --requests 500
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+import httpx
+
+from benchmarks._agents import AGENT_MODULES, AGENT_URL_ENV, API_KEY, LocalServices, summarize_ms, uvicorn_services
+
+PAYLOAD = {
+    "solar": {"production_kw": 6.0},
+    "load": {"critical_load_kw": 3.0, "flexible_load_kw": 2.0},
+}
+
+
+class _RSS:
+    def __init__(self, *groups: LocalServices) -> None:
+        self._groups = groups
+
+    def __call__(self) -> int:
+        return sum(group.rss_kib() for group in self._groups)
+
+
+@contextmanager
+def multi_process() -> Iterator[Tuple[str, _RSS]]:
+    with uvicorn_services(AGENT_MODULES) as agents:
+        env = {AGENT_URL_ENV[name]: url for name, url in agents.urls.items()}
+        with uvicorn_services({"central": "services.central.app.main:app"}, env=env) as central:
+            yield central.urls["central"], _RSS(agents, central)
+
+
+@contextmanager
+def edge() -> Iterator[Tuple[str, _RSS]]:
+    with uvicorn_services({"edge": "services.edge.app.main:app"}) as node:
+        yield node.urls["edge"], _RSS(node)
+
+
+def drive(base_url: str, requests: int) -> Dict[str, Dict[str, float]]:
+    headers = {"X-API-Key": API_KEY}
+    results = {}
+    with httpx.Client(base_url=base_url, headers=headers, timeout=10.0) as client:
+        for _ in range(20):
+            client.post("/coordinate", json=PAYLOAD).raise_for_status()
+        for name, call in (
+            ("coordinate", lambda: client.post("/coordinate", json=PAYLOAD)),
+            ("status", lambda: client.get("/status")),
+        ):
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                call().raise_for_status()
+                samples.append(time.perf_counter() - started)
+            results[name] = summarize_ms(samples)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for mode, start in (("multi_process", multi_process), ("edge", edge)):
+        with start() as (base_url, rss):
+            latencies = drive(base_url, args.requests)
+            report[mode] = {"rss_mib": rss() / 1024, **latencies}
+
+    for mode, data in report.items():
+        print(f"{mode}: RSS {data['rss_mib']:.1f} MiB")
+        for name in ("coordinate", "status"):
+            stats = data[name]
+            print(
+                f"  {name:<10} mean={stats['mean_ms']:.2f}ms p50={stats['p50_ms']:.2f}ms "
+                f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+            )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Cost of the vehicle agent's depot scheduler with many vehicles, and the agent and central on top of it.
+
+Times, for ``--vehicles`` connected vehicles, connecting and disconnecting one
+vehicle and splitting one ``/control`` command with the heap scheduler, against
+a baseline that recomputes every vehicle's laxity and sorts them on each command
+(both are checked to allocate the same power to the same vehicles first). Then
+drives ``/control`` and ``PUT``/``DELETE /vehicles/{id}`` through the agent in
+process with ``DEPOT_MODE=true`` and runs central coordination cycles against
+it. Run from the repository root::
+
+    python -m benchmarks.bench_depot --vehicles 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks._agents import API_KEY, in_process_agents
+from services.vehicle_agent.app.depot import Depot, DepotVehicle
+
+CYCLE_S = 3600.0
+
+
+def _vehicles(count: int, now: float, seed: int) -> List[DepotVehicle]:
+    rng = random.Random(seed)
+    vehicles = []
+    for index in range(count):
+        capacity = rng.choice((40.0, 60.0, 75.0, 100.0))
+        vehicles.append(
+            DepotVehicle(
+                vehicle_id=f"ev-{index}",
+                capacity_kwh=capacity,
+                state_of_charge_kwh=rng.uniform(0.1, 0.9) * capacity,
+                target_kwh=rng.uniform(0.6, 1.0) * capacity,
+                max_charge_rate_kw=rng.choice((7.0, 11.0, 22.0)),
+                max_discharge_rate_kw=rng.choice((0.0, 7.0, 11.0)),
+                departure=now + rng.uniform(0.5, 14.0) * CYCLE_S,
+            )
+        )
+    return vehicles
+
+
+def _fresh(vehicles: List[DepotVehicle]) -> List[DepotVehicle]:
+    return [DepotVehicle(**{**vehicle.__dict__, "generation": 0}) for vehicle in vehicles]
+
+
+def _sorted_dispatch(vehicles: List[DepotVehicle], mode: str, power_kw: float, now: float) -> List[str]:
+    """The same policy without heaps: rank every vehicle by latest start time on each command."""
+    charging = mode == "charge"
+    ranked = []
+    for vehicle in vehicles:
+        missing = vehicle.target_kwh - vehicle.state_of_charge_kwh
+        latest_start = vehicle.departure - missing / vehicle.max_charge_rate_kw * CYCLE_S
+        if charging and vehicle.state_of_charge_kwh < vehicle.capacity_kwh:
+            ranked.append((min(latest_start, vehicle.departure), vehicle))
+        elif not charging and vehicle.state_of_charge_kwh > 0 and vehicle.max_discharge_rate_kw > 0:
+            ranked.append((-latest_start, vehicle))
+    ranked.sort(key=lambda item: item[0])
+    remaining, served = power_kw, []
+    for key, vehicle in ranked:
+        if remaining <= 0:
+            break
+        if charging:
+            energy = min(remaining, vehicle.max_charge_rate_kw, vehicle.capacity_kwh - vehicle.state_of_charge_kwh)
+        else:
+            spare = vehicle.max_charge_rate_kw * ((-key - now) / CYCLE_S - 1.0)
+            energy = min(remaining, vehicle.max_discharge_rate_kw, vehicle.state_of_charge_kwh, spare)
+        if energy <= 0:
+            break
+        vehicle.state_of_charge_kwh += energy if charging else -energy
+        remaining -= energy
+        served.append(vehicle.vehicle_id)
+    return served
+
+
+def scheduler(count: int, commands: int, powers: List[float], seed: int) -> Dict[str, Any]:
+    now = time.time()
+    vehicles = _vehicles(count, now, seed)
+    depot = Depot(CYCLE_S)
+    started = time.perf_counter()
+    for vehicle in _fresh(vehicles):
+        depot.connect(vehicle)
+    report: Dict[str, Any] = {"connect_us": (time.perf_counter() - started) / count * 1e6}
+
+    churn = _fresh(vehicles[: min(count, 1000)])
+    started = time.perf_counter()
+    for vehicle in churn:
+        depot.disconnect(vehicle.vehicle_id)
+        depot.connect(vehicle)
+    report["disconnect_and_connect_us"] = (time.perf_counter() - started) / len(churn) * 1e6
+
+    for power in powers:
+        for mode in ("charge", "discharge"):
+            heap_depot, baseline = Depot(CYCLE_S), _fresh(vehicles)
+            for vehicle in _fresh(vehicles):
+                heap_depot.connect(vehicle)
+            heap_depot.dispatch(mode, power, now)
+            served = [vehicle.vehicle_id for vehicle in heap_depot._active]
+            if served != _sorted_dispatch(baseline, mode, power, now):
+                raise AssertionError(f"heap and sorted schedulers disagree for {mode} {power} kW")
+            started = time.perf_counter()
+            for _ in range(commands):
+                heap_depot.dispatch(mode, power, now)
+            heap_us = (time.perf_counter() - started) / commands * 1e6
+            started = time.perf_counter()
+            for _ in range(commands):
+                _sorted_dispatch(baseline, mode, power, now)
+            sorted_us = (time.perf_counter() - started) / commands * 1e6
+            report[f"{mode} {power:g} kW"] = {
+                "first_command_vehicles": len(served),
+                "heap_us": heap_us,
+                "sorted_us": sorted_us,
+            }
+    return report
+
+
+async def agent(count: int, requests: int, seed: int) -> Dict[str, Any]:
+    from services.vehicle_agent.app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-API-Key": API_KEY}
+    departure = datetime.utcnow()
+    rng = random.Random(seed)
+    bodies = [
+        {
+            "capacity_kwh": 60.0,
+            "state_of_charge_kwh": rng.uniform(5.0, 55.0),
+            "departure": (departure + timedelta(hours=rng.uniform(0.5, 14.0))).isoformat(),
+        }
+        for _ in range(count)
+    ]
+    report: Dict[str, Any] = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://vehicle", headers=headers) as client:
+        started = time.perf_counter()
+        for index, body in enumerate(bodies):
+            (await client.put(f"/vehicles/ev-{index}", json=body)).raise_for_status()
+        report["connect_per_s"] = count / (time.perf_counter() - started)
+        started = time.perf_counter()
+        for index in range(requests):
+            mode = "charge" if index % 2 else "discharge"
+            (await client.post("/control", json={"mode": mode, "power_kw": 50.0})).raise_for_status()
+        report["control_per_s"] = requests / (time.perf_counter() - started)
+        started = time.perf_counter()
+        for index in range(requests):
+            vehicle = index % count
+            (await client.delete(f"/vehicles/ev-{vehicle}")).raise_for_status()
+            (await client.put(f"/vehicles/ev-{vehicle}", json=bodies[vehicle])).raise_for_status()
+        report["reconnect_per_s"] = requests / (time.perf_counter() - started)
+    return report
+
+
+async def central_cycles(cycles: int) -> Dict[str, Any]:
+    transports = in_process_agents()
+    from services.central.app import main as central
+
+    applied = 0.0
+    async with central.build_http_client(transports=transports) as client:
+        started = time.perf_counter()
+        for index in range(cycles):
+            payload = central.CoordinationPayload(
+                solar={"production_kw": 40.0 if index % 2 else 0.0},
+                load={"critical_load_kw": 20.0, "flexible_load_kw": 5.0},
+            )
+            agents = central.site_agents()
+            await central.push_measurements(payload, client, agents)
+            status = await central.fetch_statuses(client, agents)
+            response = await central.execute_plan(central.plan_actions(status), status, client, agents)
+            applied += response.actions.vehicle.applied_power_kw or 0.0
+        elapsed = time.perf_counter() - started
+    return {"cycle_ms": elapsed / cycles * 1e3, "vehicle_kw_per_cycle": applied / cycles}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--commands", type=int, default=2000, help="commands timed per scheduler case")
+    parser.add_argument("--power", type=float, nargs="+", default=[22.0, 500.0, 5000.0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["DEPOT_MODE"] = "true"
+    os.environ["STATE_BACKEND"] = "memory"
+    report = {
+        "scheduler": scheduler(args.vehicles, args.commands, args.power, args.seed),
+        "agent": asyncio.run(agent(args.vehicles, args.requests, args.seed)),
+        "central": asyncio.run(central_cycles(args.cycles)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
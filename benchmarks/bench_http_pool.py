@@ -0,0 +1,66 @@
+"""Compare central's status fan-out with a per-call AsyncClient against the pooled client.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_http_pool --iterations 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks._agents import running_agents, summarize_ms
+
+
+async def _per_call_client(central, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        async with httpx.AsyncClient(
+            timeout=central.settings.http_timeout,
+            headers={central.API_KEY_HEADER_NAME: central.settings.api_key},
+        ) as client:
+            await central.fetch_statuses(client)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def _pooled_client(central, iterations: int) -> list[float]:
+    samples = []
+    async with central.build_http_client() as client:
+        await central.fetch_statuses(client)
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await central.fetch_statuses(client)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _print(label: str, samples: list[float]) -> None:
+    stats = summarize_ms(samples)
+    print(
+        f"{label:<18} mean={stats['mean_ms']:.2f}ms p50={stats['p50_ms']:.2f}ms "
+        f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    with running_agents():
+        from services.central.app import main as central
+
+        per_call = asyncio.run(_per_call_client(central, args.iterations))
+        pooled = asyncio.run(_pooled_client(central, args.iterations))
+
+    _print("client per call", per_call)
+    _print("pooled client", pooled)
+
+
+if __name__ == "__main__":
+    main()
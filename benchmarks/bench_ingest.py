@@ -0,0 +1,87 @@
+"""Streaming ingestion (``POST /ingest``) against one ``POST /coordinate`` per reading.
+
+Both modes feed the same sequence of solar/load readings to the central agent, with
+the four agents running in-process (ASGI transport, no sockets), and report readings
+per second and how many requests reached the agents. Run from the repository root::
+
+    python -m benchmarks.bench_ingest --readings 5000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Dict, List
+
+import httpx
+
+from benchmarks._agents import API_KEY, in_process_agents
+
+
+def _readings(count: int) -> List[Dict[str, Dict[str, float]]]:
+    return [
+        {
+            "solar": {"production_kw": 4.0 + (index % 50) / 10},
+            "load": {"critical_load_kw": 3.0, "flexible_load_kw": 2.0 + (index % 7) / 10},
+        }
+        for index in range(count)
+    ]
+
+
+async def run(readings: int, flush_rate_hz: float) -> Dict[str, Dict[str, float]]:
+    transports = in_process_agents()
+    os.environ["INGEST_FLUSH_RATE_HZ"] = str(flush_rate_hz)
+    from services.central.app import main as central
+
+    central.app.state.agent_transports = transports
+    payloads = _readings(readings)
+    results = {}
+    async with central.app.router.lifespan_context(central.app):
+        agent_requests = 0
+
+        async def count_request(request: httpx.Request) -> None:
+            nonlocal agent_requests
+            agent_requests += 1
+
+        central.app.state.http_client.event_hooks["request"].append(count_request)
+        transport = httpx.ASGITransport(app=central.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://central", headers={"X-API-Key": API_KEY}, timeout=None
+        ) as client:
+            started = time.perf_counter()
+            for payload in payloads:
+                (await client.post("/coordinate", json=payload)).raise_for_status()
+            elapsed = time.perf_counter() - started
+            results["coordinate"] = {"readings_per_s": readings / elapsed, "agent_requests": agent_requests}
+
+            agent_requests = 0
+
+            async def body() -> AsyncIterator[bytes]:
+                for payload in payloads:
+                    yield (json.dumps(payload) + "\n").encode()
+
+            started = time.perf_counter()
+            response = await client.post("/ingest", content=body(), headers={"Content-Type": "application/x-ndjson"})
+            response.raise_for_status()
+            await central.app.state.ingestor.flush()
+            elapsed = time.perf_counter() - started
+            results["ingest"] = {"readings_per_s": readings / elapsed, "agent_requests": agent_requests}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=5000)
+    parser.add_argument("--flush-rate-hz", type=float, default=2.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.readings, args.flush_rate_hz))
+    print(f"{'mode':<12} {'readings/s':>14} {'agent requests':>16}")
+    for mode, stats in results.items():
+        print(f"{mode:<12} {stats['readings_per_s']:>14,.0f} {stats['agent_requests']:>16,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Cost of the load agent's appliance registry with tens of thousands of flexible loads.
+
+For each ``--appliances`` size, times registering the appliances and resolving a
+sequence of ``/shed`` targets (clock advancing ``--tick`` seconds each, so minimum
+on/off times come into play) with the indexed registry, against a baseline that
+rescans and sorts every appliance on each target; the two must leave the same
+appliances off after every target. Then drives ``POST /appliances`` and ``/shed``
+through the agent in process with ``LOAD_REGISTRY=true``. Run from the repository
+root::
+
+    python -m benchmarks.bench_load_registry --appliances 10000 50000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks._agents import API_KEY
+from services.load_agent.app.appliances import Appliance, ApplianceRegistry
+
+_EPSILON_KW = 1e-9
+
+
+def _appliances(count: int, seed: int) -> List[Appliance]:
+    rng = random.Random(seed)
+    # Unique priorities so both schedulers have a single valid order; half-kW powers keep the sums exact.
+    priorities = rng.sample(range(10 * count), count)
+    return [
+        Appliance(
+            appliance_id=f"load-{index}",
+            power_kw=rng.choice((0.5, 1.0, 1.5, 2.0, 3.0)),
+            priority=priorities[index],
+            min_on_s=rng.choice((0.0, 300.0, 900.0)),
+            min_off_s=rng.choice((0.0, 300.0, 900.0)),
+        )
+        for index in range(count)
+    ]
+
+
+def _copy(appliances: List[Appliance]) -> List[Appliance]:
+    return [Appliance(**{**appliance.__dict__, "generation": 0}) for appliance in appliances]
+
+
+def _scan_shed(appliances: List[Appliance], target_kw: float, now: float) -> float:
+    """The same policy without an index: rescan and sort the appliances free to switch."""
+    shed = sum(appliance.power_kw for appliance in appliances if not appliance.on)
+    free = [appliance for appliance in appliances if appliance.unlocks_at <= now]
+    if target_kw > shed + _EPSILON_KW:
+        for appliance in sorted((item for item in free if item.on), key=lambda item: item.priority):
+            if shed >= target_kw - _EPSILON_KW:
+                break
+            appliance.on, appliance.switched_at = False, now
+            shed += appliance.power_kw
+    else:
+        for appliance in sorted((item for item in free if not item.on), key=lambda item: -item.priority):
+            if shed - appliance.power_kw < target_kw - _EPSILON_KW:
+                break
+            appliance.on, appliance.switched_at = True, now
+            shed -= appliance.power_kw
+    return shed
+
+
+def _targets(flexible_kw: float, count: int, walk: float, seed: int) -> List[float]:
+    rng = random.Random(seed + 1)
+    # A random walk of shed targets, as a deficit grows and recedes.
+    targets, target = [], 0.0
+    for _ in range(count):
+        target = min(max(target + rng.gauss(0.0, walk * flexible_kw), 0.0), 0.8 * flexible_kw)
+        targets.append(target)
+    return targets
+
+
+def registry(count: int, sheds: int, tick: float, walk: float, seed: int) -> Dict[str, Any]:
+    appliances = _appliances(count, seed)
+    flexible = sum(appliance.power_kw for appliance in appliances)
+    targets = _targets(flexible, sheds, walk, seed)
+    start = time.time()
+
+    indexed = ApplianceRegistry()
+    started = time.perf_counter()
+    for appliance in _copy(appliances):
+        indexed.register(appliance, start)
+    report: Dict[str, Any] = {"register_us": (time.perf_counter() - started) / count * 1e6}
+
+    switches = 0
+    started = time.perf_counter()
+    for step, target in enumerate(targets):
+        before = indexed.shed_kw
+        indexed.shed_to(target, start + step * tick)
+        switches += indexed.shed_kw != before
+    report["indexed_shed_us"] = (time.perf_counter() - started) / sheds * 1e6
+
+    scanned = _copy(appliances)
+    started = time.perf_counter()
+    for step, target in enumerate(targets):
+        _scan_shed(scanned, target, start + step * tick)
+    report["scan_shed_us"] = (time.perf_counter() - started) / sheds * 1e6
+
+    # Same decisions: replay both side by side and compare the appliances that are off.
+    check, baseline = ApplianceRegistry(), _copy(appliances)
+    for appliance in _copy(appliances):
+        check.register(appliance, start)
+    previous: set = set()
+    switched = 0
+    for step, target in enumerate(targets[: min(sheds, 200)]):
+        now = start + step * tick
+        if check.shed_to(target, now) != _scan_shed(baseline, target, now):
+            raise AssertionError(f"indexed and scanning registries disagree at target {step}")
+        off = {appliance.appliance_id for appliance in check.appliances.values() if not appliance.on}
+        if off != {appliance.appliance_id for appliance in baseline if not appliance.on}:
+            raise AssertionError(f"indexed and scanning registries shed different loads at target {step}")
+        switched += len(off ^ previous)
+        previous = off
+    report["targets_that_switched"] = switches
+    report["appliances_switched_per_target"] = switched / min(sheds, 200)
+    return report
+
+
+async def agent(count: int, sheds: int, walk: float, seed: int) -> Dict[str, Any]:
+    from services.load_agent.app.main import app
+
+    rng = random.Random(seed)
+    batch = {
+        "appliances": [
+            {"appliance_id": f"load-{index}", "power_kw": rng.choice((0.5, 1.0, 2.0)), "priority": rng.randrange(100)}
+            for index in range(count)
+        ]
+    }
+    report: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-API-Key": API_KEY}
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", headers=headers) as client:
+        started = time.perf_counter()
+        flexible = (await client.post("/appliances", json=batch)).raise_for_status().json()["flexible_load_kw"]
+        report["register_batch_ms"] = (time.perf_counter() - started) * 1e3
+        targets = _targets(flexible, sheds, walk, seed)
+        started = time.perf_counter()
+        for target in targets:
+            (await client.post("/shed", json={"shed_kw": target})).raise_for_status()
+        report["shed_per_s"] = sheds / (time.perf_counter() - started)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appliances", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--sheds", type=int, default=1000, help="shed targets per size")
+    parser.add_argument("--tick", type=float, default=30.0, help="seconds between shed targets")
+    parser.add_argument("--walk", type=float, default=0.02, help="shed target step, fraction of the flexible load")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    os.environ["LOAD_REGISTRY"] = "true"
+    os.environ["STATE_BACKEND"] = "memory"
+    report = {
+        "registry": {
+            str(count): registry(count, args.sheds, args.tick, args.walk, args.seed) for count in args.appliances
+        },
+        "agent": asyncio.run(agent(max(args.appliances), args.sheds, args.walk, args.seed)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Cost of the Prometheus instrumentation on the request path.
+
+Times ``HistogramSeries.observe`` and ``CounterSeries.inc`` on their own, then calls a
+trivial route of two otherwise identical FastAPI apps (with and without
+``instrument_app``) directly through ASGI, so the HTTP client does not hide the
+difference, and finally the battery agent's ``GET /status``. Run from the
+repository root::
+
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict
+
+from fastapi import FastAPI
+
+from benchmarks._agents import API_KEY
+from services.common.metrics import MetricsRegistry, instrument_app
+
+
+def per_call_ns(function, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def primitives(iterations: int) -> Dict[str, float]:
+    registry = MetricsRegistry()
+    series = registry.histogram("bench_seconds", "bench", ("route",)).labels("/status")
+    counter = registry.counter("bench_total", "bench", ("route",)).labels("/status")
+    family = registry.histogram("bench_lookup_seconds", "bench", ("agent", "operation"))
+    family.labels("battery", "status")
+    return {
+        "observe_ns": per_call_ns(lambda: series.observe(0.0042), iterations),
+        "inc_ns": per_call_ns(counter.inc, iterations),
+        "labels_and_observe_ns": per_call_ns(lambda: family.labels("battery", "status").observe(0.0042), iterations),
+    }
+
+
+async def asgi_request_us(app, path: str, requests: int, headers=()) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), *headers], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    if instrumented:
+        instrument_app(app, MetricsRegistry())
+    return app
+
+
+async def requests_cost(requests: int) -> Dict[str, float]:
+    from services.battery_agent.app.main import app as battery
+
+    plain = await asgi_request_us(build_app(False), "/ping", requests)
+    instrumented = await asgi_request_us(build_app(True), "/ping", requests)
+    status = await asgi_request_us(battery, "/status", requests, headers=[(b"x-api-key", API_KEY.encode())])
+    return {
+        "plain_route_us": plain,
+        "instrumented_route_us": instrumented,
+        "middleware_overhead_us": instrumented - plain,
+        "battery_status_us": status,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    results = {"primitives": primitives(args.iterations), "requests": asyncio.run(requests_cost(args.requests))}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Re-solve time of the horizon (MPC) planner, and its dispatch against the greedy rules.
+
+The timing part rolls a 24-hour, 15-minute-step plan forward over synthetic solar/load
+series and reports the solve time and ADMM iterations per step, starting every solve
+from the previous solution (warm) and from zero (cold). The closed-loop part runs both
+planners over the same series, with a perfect forecast for the horizon planner, through
+the agents' physics, and compares unserved energy, shed load, exported surplus and the
+energy left in the storage. Run from the repository root::
+
+    python -m benchmarks.bench_mpc --days 2 --horizon 96 --step-hours 0.25
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+from benchmarks._agents import summarize_ms
+from benchmarks.bench_simulator import synthetic_series
+from services.battery_agent.app import physics as battery_physics
+from services.central.app.models import (
+    BatteryMode,
+    BatteryStatus,
+    HorizonForecast,
+    LoadStatus,
+    SolarStatus,
+    SystemStatus,
+    VehicleMode,
+    VehicleStatus,
+)
+from services.central.app.mpc import MPCPlanner, first_step_actions
+from services.load_agent.app import physics as load_physics
+from services.simulator import SiteParameters, simulate
+from services.vehicle_agent.app import physics as vehicle_physics
+
+
+def _status(series: Dict[str, np.ndarray], step: int, soc: float, vehicle_soc: float, shed: float) -> SystemStatus:
+    p = SiteParameters()
+    critical = float(series["critical_load_kw"][step, 0])
+    flexible = float(series["flexible_load_kw"][step, 0])
+    shed, nominal, consumption = load_physics.recompute_totals(critical, flexible, shed)
+    return SystemStatus(
+        solar=SolarStatus(production_kw=float(series["production_kw"][step, 0])),
+        battery=BatteryStatus(
+            capacity_kwh=p.battery_capacity_kwh, state_of_charge_kwh=soc, min_state_of_charge_kwh=p.battery_min_soc_kwh,
+            max_charge_rate_kw=p.battery_max_charge_kw, max_discharge_rate_kw=p.battery_max_discharge_kw,
+            mode=BatteryMode.idle, power_kw=0.0,
+        ),
+        vehicle=VehicleStatus(
+            connected=bool(series["vehicle_connected"][step, 0]), capacity_kwh=p.vehicle_capacity_kwh,
+            state_of_charge_kwh=vehicle_soc, max_charge_rate_kw=p.vehicle_max_charge_kw,
+            max_discharge_rate_kw=p.vehicle_max_discharge_kw, mode=VehicleMode.idle, power_kw=0.0,
+        ),
+        load=LoadStatus(
+            critical_load_kw=critical, flexible_load_kw=flexible, shed_kw=float(shed),
+            total_nominal_load_kw=float(nominal), total_consumption_kw=float(consumption),
+        ),
+    )
+
+
+def _forecast(series: Dict[str, np.ndarray], step: int, horizon: int) -> HorizonForecast:
+    window = slice(step, step + horizon)
+    return HorizonForecast(
+        production_kw=series["production_kw"][window, 0].tolist(),
+        critical_load_kw=series["critical_load_kw"][window, 0].tolist(),
+        flexible_load_kw=series["flexible_load_kw"][window, 0].tolist(),
+        vehicle_connected=series["vehicle_connected"][window, 0].tolist(),
+    )
+
+
+def run_mpc(series: Dict[str, np.ndarray], steps: int, horizon: int, step_hours: float, warm: bool) -> Dict[str, Any]:
+    """Closed loop of the horizon planner; the agents' physics applied per step as in ``simulate``."""
+    p = SiteParameters()
+    planner = MPCPlanner(horizon, step_hours)
+    soc, vehicle_soc, shed = p.battery_soc_kwh, p.vehicle_soc_kwh, 0.0
+    totals = dict.fromkeys(("unserved", "shed", "exported"), 0.0)
+    solve_seconds, iterations, not_converged = [], [], 0
+    for step in range(steps):
+        status = _status(series, step, soc, vehicle_soc, shed)
+        solution = planner.solve(status, _forecast(series, step, horizon), warm=warm)
+        solve_seconds.append(solution.solve_seconds)
+        iterations.append(solution.iterations)
+        not_converged += not solution.converged
+        actions = first_step_actions(status, solution)
+
+        def energy(action, mode) -> float:
+            return action.requested_power_kw * step_hours if action.mode == mode else 0.0
+
+        battery_applied, soc = battery_physics.apply_control(
+            soc, p.battery_capacity_kwh, p.battery_min_soc_kwh, p.battery_max_charge_kw * step_hours,
+            p.battery_max_discharge_kw * step_hours, energy(actions.battery, BatteryMode.charge),
+            energy(actions.battery, BatteryMode.discharge),
+        )
+        battery_flow = battery_applied if actions.battery.mode == BatteryMode.charge else -battery_applied
+        vehicle_applied, vehicle_soc = vehicle_physics.apply_control(
+            vehicle_soc, p.vehicle_capacity_kwh, p.vehicle_max_charge_kw * step_hours,
+            p.vehicle_max_discharge_kw * step_hours, energy(actions.vehicle, VehicleMode.charge),
+            energy(actions.vehicle, VehicleMode.discharge),
+        )
+        vehicle_flow = vehicle_applied if actions.vehicle.mode == VehicleMode.charge else -vehicle_applied
+        shed, nominal, consumption = load_physics.recompute_totals(
+            status.load.critical_load_kw, status.load.flexible_load_kw, actions.load.shed_target_kw
+        )
+        residual = (status.solar.production_kw - consumption) * step_hours - battery_flow - vehicle_flow
+        totals["unserved"] += max(-residual, 0.0)
+        totals["exported"] += max(residual, 0.0)
+        totals["shed"] += (nominal - consumption) * step_hours
+        soc, vehicle_soc, shed = float(soc), float(vehicle_soc), float(shed)
+    return {
+        "totals_kwh": totals,
+        "final_soc_kwh": {"battery": soc, "vehicle": vehicle_soc},
+        "solve": {
+            **summarize_ms(solve_seconds[1:] or solve_seconds),
+            "first_ms": solve_seconds[0] * 1e3,
+            "iterations_p50": float(np.median(iterations)),
+            "iterations_max": int(max(iterations)),
+            "not_converged": not_converged,
+        },
+    }
+
+
+def run_greedy(series: Dict[str, np.ndarray], steps: int, step_hours: float) -> Dict[str, Any]:
+    window = {name: values[:steps] for name, values in series.items()}
+    result = simulate(**window, step_hours=step_hours)
+    battery, vehicle = result.final_soc_kwh
+    return {
+        "totals_kwh": {name: float(result.totals_kwh[name][0]) for name in ("unserved", "shed", "exported")},
+        "final_soc_kwh": {"battery": float(battery[0]), "vehicle": float(vehicle[0])},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=2.0)
+    parser.add_argument("--horizon", type=int, default=96, help="planning steps")
+    parser.add_argument("--step-hours", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    steps = int(args.days * 24 / args.step_hours)
+    # The forecast window of the last steps runs past the simulated period.
+    series = synthetic_series(steps + args.horizon, 1, args.step_hours, seed=args.seed)
+    started = time.perf_counter()
+    warm = run_mpc(series, steps, args.horizon, args.step_hours, warm=True)
+    cold = run_mpc(series, steps, args.horizon, args.step_hours, warm=False)
+    report = {
+        "steps": steps,
+        "horizon": args.horizon,
+        "step_hours": args.step_hours,
+        "solve_warm": warm["solve"],
+        "solve_cold": cold["solve"],
+        "mpc": {key: warm[key] for key in ("totals_kwh", "final_soc_kwh")},
+        "greedy": run_greedy(series, steps, args.step_hours),
+        "seconds": time.perf_counter() - started,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Throughput of the dispatch decision logic, without any HTTP I/O.
+
+Measures decisions per second of:
+
+* ``planner.plan_actions``: the scalar planner used by ``/coordinate``;
+* ``dispatch.allocate``: the vectorized planner used by ``/coordinate/batch``.
+
+Both are first checked to take the same decisions on the synthetic set.
+Run from the repository root::
+
+    python -m benchmarks.bench_planner --count 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("SERVICE_API_KEY", "bench-key")
+
+from benchmarks._synthetic import synthetic_statuses  # noqa: E402
+from services.central.app import dispatch  # noqa: E402
+from services.central.app.main import _site_columns  # noqa: E402
+from services.central.app.planner import plan_actions  # noqa: E402
+
+_MODE_CODES = {"idle": dispatch.MODE_IDLE, "charge": dispatch.MODE_CHARGE, "discharge": dispatch.MODE_DISCHARGE}
+
+
+def check_consistency(statuses, plans, vectorized: dispatch.DispatchPlan) -> None:
+    battery_modes = np.array([_MODE_CODES[plan.battery.mode.value] for plan in plans], dtype=np.int8)
+    vehicle_modes = np.array([_MODE_CODES[plan.vehicle.mode.value] for plan in plans], dtype=np.int8)
+    battery_power = np.array([plan.battery.requested_power_kw for plan in plans])
+    vehicle_power = np.array([plan.vehicle.requested_power_kw for plan in plans])
+    shed_target = np.array([plan.load.shed_target_kw for plan in plans])
+    assert np.array_equal(battery_modes, vectorized.battery_mode), "battery modes differ"
+    assert np.array_equal(vehicle_modes, vectorized.vehicle_mode), "vehicle modes differ"
+    assert np.array_equal(battery_power, vectorized.battery_power_kw), "battery power differs"
+    assert np.array_equal(vehicle_power, vectorized.vehicle_power_kw), "vehicle power differs"
+    assert np.array_equal(shed_target, vectorized.shed_target_kw), "shed targets differ"
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100_000, help="synthetic statuses per run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    statuses = synthetic_statuses(args.count, args.seed)
+    columns = _site_columns(statuses)
+    check_consistency(statuses, [plan_actions(status) for status in statuses], dispatch.allocate(columns))
+
+    results = {
+        "count": args.count,
+        "plan_actions": args.count / best_of(args.repeat, lambda: [plan_actions(status) for status in statuses]),
+        "allocate": args.count / best_of(args.repeat, lambda: dispatch.allocate(columns)),
+        "allocate_with_columns": args.count
+        / best_of(args.repeat, lambda: dispatch.allocate(_site_columns(statuses))),
+    }
+    for name in ("plan_actions", "allocate", "allocate_with_columns"):
+        print(f"{name:<24} {results[name]:>16,.0f} decisions/s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
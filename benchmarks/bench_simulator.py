@@ -0,0 +1,145 @@
+"""Throughput of the offline simulator, and a replay check against the running services.
+
+The throughput part simulates synthetic solar/load series at 15-minute resolution for
+an increasing number of scenarios and reports scenario-steps per second; small batches
+run the scalar path, checked to match the vectorized one step for step. The check
+part drives the same series through ``POST /coordinate`` with the five apps running
+in-process and verifies that the simulator reproduces the battery and vehicle SoC
+and the shed of every step. Run from the repository root::
+
+    python -m benchmarks.bench_simulator --steps 35040 --scenarios 1 10 100 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from benchmarks._agents import API_KEY, in_process_agents
+from services.simulator import energy_balance_error, simulate
+from services.simulator.engine import SCALAR_SCENARIOS
+
+
+def synthetic_series(steps: int, scenarios: int, step_hours: float, seed: int = 0) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    hours = (np.arange(steps) * step_hours % 24)[:, None]
+    peak = rng.uniform(4, 12, scenarios)
+    daylight = np.clip(np.sin(np.pi * (hours - 6) / 12), 0, None)
+    return {
+        "production_kw": daylight * peak * rng.uniform(0.6, 1.0, (steps, scenarios)),
+        "critical_load_kw": rng.uniform(1.0, 4.0, (steps, scenarios)),
+        "flexible_load_kw": rng.uniform(0.0, 3.0, (steps, scenarios)),
+        "vehicle_connected": (hours < 8) | (hours >= 18) | (rng.random((steps, scenarios)) < 0.2),
+    }
+
+
+def throughput(steps: int, scenario_counts: List[int], step_hours: float) -> List[Dict[str, Any]]:
+    results = []
+    for scenarios in scenario_counts:
+        series = synthetic_series(steps, scenarios, step_hours)
+        started = time.perf_counter()
+        result = simulate(**series, step_hours=step_hours, record_every=4)
+        elapsed = time.perf_counter() - started
+        errors = energy_balance_error(result)
+        results.append({
+            "scenarios": scenarios,
+            "steps": steps,
+            "seconds": elapsed,
+            "steps_per_s": steps * scenarios / elapsed,
+            "max_balance_error_kwh": max(float(np.abs(gap).max()) for gap in errors.values()),
+            "mean_shed_kwh": float(result.totals_kwh["shed"].mean()),
+            "mean_unserved_kwh": float(result.totals_kwh["unserved"].mean()),
+        })
+    return results
+
+
+async def _replay(series: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    transports = in_process_agents()
+    from services.central.app import main as central
+
+    central.app.state.agent_transports = transports
+    observed = []
+    async with central.app.router.lifespan_context(central.app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=central.app), base_url="http://central", headers={"X-API-Key": API_KEY}
+        ) as client:
+            for step in range(len(series["production_kw"])):
+                payload = {
+                    "solar": {"production_kw": float(series["production_kw"][step, 0])},
+                    "load": {
+                        "critical_load_kw": float(series["critical_load_kw"][step, 0]),
+                        "flexible_load_kw": float(series["flexible_load_kw"][step, 0]),
+                    },
+                }
+                response = await client.post("/coordinate", json=payload)
+                response.raise_for_status()
+                status = response.json()["status"]
+                observed.append({
+                    "battery": status["battery"]["state_of_charge_kwh"],
+                    "vehicle": status["vehicle"]["state_of_charge_kwh"],
+                    "shed": status["load"]["shed_kw"],
+                })
+    return observed
+
+
+def scalar_check(steps: int, step_hours: float) -> Dict[str, Any]:
+    """The scalar path against the vectorized one, which a batch wider than ``SCALAR_SCENARIOS`` takes."""
+    series = synthetic_series(steps, 1, step_hours, seed=2)
+    single = simulate(**series, step_hours=step_hours)
+    batch = simulate(
+        **{name: np.repeat(values, SCALAR_SCENARIOS + 1, axis=1) for name, values in series.items()},
+        step_hours=step_hours,
+    )
+    mismatched = [
+        name for name, values in single.totals_kwh.items() if not np.array_equal(values, batch.totals_kwh[name][:1])
+    ]
+    mismatched += [
+        name for name in ("battery_soc_kwh", "vehicle_soc_kwh", "shed_kw")
+        if not np.array_equal(getattr(single, name), getattr(batch, name)[:, :1])
+    ]
+    assert not mismatched, f"scalar and vectorized simulations differ in {mismatched}"
+    return {"steps": steps, "identical": True}
+
+
+def replay_check(steps: int) -> Dict[str, Any]:
+    # The services treat each command as one hour of energy, so step_hours=1.
+    series = synthetic_series(steps, 1, 1.0, seed=1)
+    series.pop("vehicle_connected")
+    observed = asyncio.run(_replay(series))
+    result = simulate(**series)
+    gaps = {
+        "battery": np.abs(result.battery_soc_kwh[:, 0] - [row["battery"] for row in observed]).max(),
+        "vehicle": np.abs(result.vehicle_soc_kwh[:, 0] - [row["vehicle"] for row in observed]).max(),
+        "shed": np.abs(result.shed_kw[:, 0] - [row["shed"] for row in observed]).max(),
+    }
+    return {"steps": steps, "max_abs_difference": {name: float(gap) for name, gap in gaps.items()}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=35_040, help="default: one year at 15 minutes")
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--step-hours", type=float, default=0.25)
+    parser.add_argument("--check-steps", type=int, default=500, help="steps replayed through the services (0: skip)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "throughput": throughput(args.steps, args.scenarios, args.step_hours),
+        "scalar_check": scalar_check(min(args.steps, 10_000), args.step_hours),
+    }
+    if args.check_steps:
+        results["replay_check"] = replay_check(args.check_steps)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
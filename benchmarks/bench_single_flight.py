@@ -0,0 +1,148 @@
+"""Central's single-flight ``/status`` and merged ``/coordinate``, against one fan-out and one cycle per call.
+
+Central and the agents run in process; every agent call gets ``--agent-latency``
+seconds of simulated network delay, so concurrent calls overlap as they would in
+a deployment. For each ``SINGLE_FLIGHT`` setting and ``--concurrency`` level it
+reports ``/status`` throughput, latency and agent requests per call, and, for
+bursts of concurrent ``/coordinate`` calls, the cycles run, the most cycles in
+flight at once and the control commands sent to the agents per burst. Run from
+the repository root::
+
+    python -m benchmarks.bench_single_flight --concurrency 1 8 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks._agents import API_KEY, in_process_agents, summarize_ms
+
+COMMAND_PATHS = ("/control", "/shed")
+
+
+class _DelayedTransport(httpx.AsyncBaseTransport):
+    """An agent transport with a fixed delay per request, counting the requests by path."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, delay: float, counts: Counter) -> None:
+        self._inner = inner
+        self._delay = delay
+        self._counts = counts
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._counts[request.url.path] += 1
+        await asyncio.sleep(self._delay)
+        return await self._inner.handle_async_request(request)
+
+
+def _payload(index: int) -> Dict[str, Any]:
+    return {
+        "solar": {"production_kw": 2.0 + index % 8},
+        "load": {"critical_load_kw": 3.0, "flexible_load_kw": 1.0 + index % 3},
+    }
+
+
+async def _status(client: httpx.AsyncClient, counts: Counter, requests: int, concurrency: int) -> Dict[str, Any]:
+    remaining = iter(range(requests))
+    latencies: List[float] = []
+
+    async def worker() -> None:
+        for _ in remaining:
+            started = time.perf_counter()
+            (await client.get("/status")).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    counts.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests_per_s": requests / elapsed,
+        **summarize_ms(latencies),
+        "agent_requests_per_call": counts["/status"] / requests,
+    }
+
+
+async def _coordinate(central, client: httpx.AsyncClient, counts: Counter, bursts: int, concurrency: int):
+    in_flight = peak = cycles = 0
+    run_cycle = central.run_coordination_cycle
+
+    async def instrumented(*args, **kwargs):
+        nonlocal in_flight, peak, cycles
+        in_flight += 1
+        cycles += 1
+        peak = max(peak, in_flight)
+        try:
+            return await run_cycle(*args, **kwargs)
+        finally:
+            in_flight -= 1
+
+    central.run_coordination_cycle = instrumented
+    latencies: List[float] = []
+
+    async def call(index: int) -> None:
+        started = time.perf_counter()
+        (await client.post("/coordinate", json=_payload(index))).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+    counts.clear()
+    try:
+        started = time.perf_counter()
+        for burst in range(bursts):
+            await asyncio.gather(*(call(burst * concurrency + index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        central.run_coordination_cycle = run_cycle
+    return {
+        "calls_per_s": bursts * concurrency / elapsed,
+        **summarize_ms(latencies),
+        "cycles_per_burst": cycles / bursts,
+        "max_cycles_in_flight": peak,
+        "commands_per_burst": sum(counts[path] for path in COMMAND_PATHS) / bursts,
+    }
+
+
+async def run(levels: List[int], requests: int, bursts: int, latency: float) -> Dict[str, Any]:
+    counts: Counter = Counter()
+    transports = {
+        url: _DelayedTransport(transport, latency, counts) for url, transport in in_process_agents().items()
+    }
+    from services.central.app import main as central
+
+    central.app.state.agent_transports = transports
+    report: Dict[str, Any] = {}
+    async with central.app.router.lifespan_context(central.app):
+        transport = httpx.ASGITransport(app=central.app)
+        headers = {"X-API-Key": API_KEY}
+        async with httpx.AsyncClient(transport=transport, base_url="http://central", headers=headers) as client:
+            for single_flight in (False, True):
+                central.settings.single_flight = single_flight
+                label = "single_flight" if single_flight else "per_call"
+                report[label] = {
+                    f"c={concurrency}": {
+                        "status": await _status(client, counts, requests, concurrency),
+                        "coordinate": await _coordinate(central, client, counts, bursts, concurrency),
+                    }
+                    for concurrency in levels
+                }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=640, help="/status calls per level")
+    parser.add_argument("--bursts", type=int, default=20, help="/coordinate bursts per level")
+    parser.add_argument("--agent-latency", type=float, default=0.005, help="seconds added to each agent call")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.concurrency, args.requests, args.bursts, args.agent_latency))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
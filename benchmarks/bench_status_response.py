@@ -0,0 +1,96 @@
+"""Requests per second of the agents' ``GET /status`` and of central's status fan-out.
+
+Each agent is driven in process through its ASGI app (handler and serialization cost
+only) and the battery agent also as a uvicorn subprocess with ``--concurrency``
+clients. ``fetch_statuses`` is then timed against the in-process agents, with and
+without ``If-None-Match`` revalidation, which covers decoding and validating the
+replies in central. Run from the repository root::
+
+    python -m benchmarks.bench_status_response --requests 3000 --concurrency 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import time
+from typing import Dict
+
+import httpx
+
+from benchmarks._agents import AGENT_MODULES, API_KEY, in_process_agents, uvicorn_services
+
+HEADERS = {"X-API-Key": API_KEY}
+
+
+async def _drive(client: httpx.AsyncClient, requests: int, concurrency: int) -> float:
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in remaining:
+            response = await client.get("/status", headers=HEADERS)
+            response.raise_for_status()
+
+    await client.get("/status", headers=HEADERS)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+async def in_process(requests: int) -> Dict[str, float]:
+    results = {}
+    for name, module in AGENT_MODULES.items():
+        module_name, attribute = module.split(":")
+        app = getattr(importlib.import_module(module_name), attribute)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=f"http://{name}") as client:
+            results[name] = await _drive(client, requests, 1)
+    return results
+
+
+async def over_http(url: str, requests: int, concurrency: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits) as client:
+        return await _drive(client, requests, concurrency)
+
+
+async def fan_out(requests: int) -> Dict[str, float]:
+    transports = in_process_agents()
+    from services.central.app import main as central
+
+    results = {}
+    async with central.build_http_client(transports=transports) as client:
+        for label, revalidate in (("fetch_statuses_per_s", False), ("fetch_statuses_revalidated_per_s", True)):
+            central.status_cache.invalidate()
+            await central.fetch_statuses(client)
+            started = time.perf_counter()
+            for _ in range(requests):
+                if not revalidate:
+                    central.status_cache.invalidate()
+                await central.fetch_statuses(client)
+            results[label] = requests / (time.perf_counter() - started)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = {"in_process_per_s": asyncio.run(in_process(args.requests))}
+    with uvicorn_services({"battery": AGENT_MODULES["battery"]}) as services:
+        report["uvicorn_battery_per_s"] = asyncio.run(
+            over_http(services.urls["battery"], args.requests, args.concurrency)
+        )
+    report["central"] = asyncio.run(fan_out(args.requests // 4))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Bytes on the wire and encode/decode CPU of agent replies, JSON against the binary slot encoding.
+
+Runs ``--cycles`` coordination cycles (push measurements, fetch statuses, plan,
+execute) against the in-process agents once per ``AGENT_WIRE_FORMAT`` and counts the
+status-bearing replies and their header and body bytes. Then times, for each agent,
+building one reply from its state (the agent's side, once per state version) and
+turning it into the central model (central's side), and weights those costs by the
+replies seen per cycle. Run from the repository root::
+
+    python -m benchmarks.bench_wire_format --cycles 300
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import time
+from collections import Counter
+from typing import Any, Callable, Dict
+
+import httpx
+import orjson
+
+from benchmarks._agents import AGENT_MODULES, in_process_agents
+from services.common.state_layout import STATE_SLOTS_MEDIA_TYPE, SlotCodec
+
+FORMATS = ("json", "slots")
+
+
+def _payload(index: int) -> Dict[str, Any]:
+    return {
+        "solar": {"production_kw": 2.0 + (index % 80) / 10},
+        "load": {"critical_load_kw": 3.0, "flexible_load_kw": 1.0 + (index % 30) / 10},
+        "battery": {"state_of_charge_kwh": 2.0 + (index % 60) / 10},
+        "vehicle": {"connected": True, "state_of_charge_kwh": 10.0 + index % 40},
+    }
+
+
+async def _cycles(central, transports, cycles: int) -> Dict[str, Any]:
+    agent_of = {url: name for name, url in central._agent_urls(central.site_agents()).items()}
+    replies: Counter = Counter()
+    header_bytes = body_bytes = 0
+
+    async def count(response: httpx.Response) -> None:
+        nonlocal header_bytes, body_bytes
+        await response.aread()
+        url = f"{response.url.scheme}://{response.url.netloc.decode()}"
+        if response.url.path == "/layout" or response.status_code != 200:
+            return
+        replies[agent_of[url]] += 1
+        header_bytes += sum(len(key) + len(value) + 4 for key, value in response.headers.raw)
+        body_bytes += len(response.content)
+
+    central.status_cache.invalidate()
+    central.state_layouts.clear()
+    async with central.build_http_client(transports=transports) as client:
+        client.event_hooks["response"].append(count)
+        started = time.perf_counter()
+        for index in range(cycles):
+            payload = central.CoordinationPayload(**_payload(index))
+            agents = central.site_agents()
+            await central.push_measurements(payload, client, agents)
+            status = await central.fetch_statuses(client, agents)
+            await central.execute_plan(central.plan_actions(status), status, client, agents)
+        elapsed = time.perf_counter() - started
+    return {
+        "cycle_ms": elapsed / cycles * 1e3,
+        "replies_per_cycle": {name: replies[name] / cycles for name in AGENT_MODULES},
+        "header_bytes_per_cycle": header_bytes / cycles,
+        "body_bytes_per_cycle": body_bytes / cycles,
+    }
+
+
+def _time_us(function: Callable[[], Any], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def _codec_costs(central, repeat: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    central_models = {
+        "solar": central.SolarStatus,
+        "battery": central.BatteryStatus,
+        "vehicle": central.VehicleStatus,
+        "load": central.LoadStatus,
+    }
+    costs: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, module in AGENT_MODULES.items():
+        agent = importlib.import_module(module.split(":")[0])
+        cache = agent.status_response
+        data = agent.state.snapshot()
+        model = central_models[name]
+        json_body = cache.body()[0]
+        slots_body = cache.body(STATE_SLOTS_MEDIA_TYPE)[0]
+        reader = SlotCodec.from_description(cache.codec.describe())
+        costs[name] = {
+            "json": {
+                "encode_us": _time_us(lambda: cache._model(**data).model_dump_json().encode(), repeat),
+                "decode_us": _time_us(lambda: model.model_validate(orjson.loads(json_body)), repeat),
+                "bytes": len(json_body),
+            },
+            "slots": {
+                "encode_us": _time_us(lambda: cache.codec.pack(data), repeat),
+                "decode_us": _time_us(lambda: model.model_validate(reader.unpack(slots_body)), repeat),
+                "bytes": len(slots_body),
+            },
+        }
+    return costs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20_000, help="iterations of each encode/decode timing")
+    args = parser.parse_args()
+
+    transports = in_process_agents()
+    from services.central.app import main as central
+
+    report: Dict[str, Any] = {}
+    for wire_format in FORMATS:
+        central.settings.agent_wire_format = central.AgentWireFormat(wire_format)
+        report[wire_format] = asyncio.run(_cycles(central, transports, args.cycles))
+    costs = _codec_costs(central, args.repeat)
+    report["per_reply"] = costs
+    for wire_format in FORMATS:
+        replies = report[wire_format]["replies_per_cycle"]
+        for side in ("encode_us", "decode_us"):
+            report[wire_format][f"{side}_per_cycle"] = sum(
+                replies[name] * costs[name][wire_format][side] for name in AGENT_MODULES
+            )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""End-to-end load test of the five-service topology.
+
+Starts the four agents and the central agent either in this process (ASGI
+transports, no sockets) or as local uvicorn subprocesses, then drives
+``POST /coordinate`` and ``GET /status`` at each concurrency level. For every run it
+reports client-side p50/p95/p99 latency and requests per second, the duration of
+each coordination phase, and a per-hop breakdown of the agent calls made by
+``push_measurements``, ``fetch_statuses`` and the plan execution (see
+``benchmarks/_instrumented_central.py``). Run from the repository root::
+
+    python -m benchmarks.load_test --mode uvicorn --concurrency 1 8 32 --requests 1000 --output load.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List
+
+import httpx
+
+from benchmarks._agents import AGENT_MODULES, AGENT_URL_ENV, API_KEY, in_process_agents, summarize_ms, uvicorn_services
+
+CENTRAL_MODULE = "benchmarks._instrumented_central:app"
+
+
+def _payload(index: int) -> Dict[str, Any]:
+    return {
+        "solar": {"production_kw": 2.0 + (index % 80) / 10},
+        "load": {"critical_load_kw": 3.0, "flexible_load_kw": 1.0 + (index % 30) / 10},
+    }
+
+
+async def _send(client: httpx.AsyncClient, endpoint: str, index: int) -> httpx.Response:
+    if endpoint == "coordinate":
+        return await client.post("/coordinate", json=_payload(index))
+    return await client.get("/status")
+
+
+async def drive(
+    client: httpx.AsyncClient, endpoint: str, requests: int, concurrency: int, warmup: int
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one(index: int, record: bool) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await _send(client, endpoint, index)
+                failure = None if response.status_code < 400 else f"HTTP {response.status_code}"
+            except httpx.HTTPError as exc:
+                failure = type(exc).__name__
+            elapsed = time.perf_counter() - started
+        if not record:
+            return
+        if failure is None:
+            samples.append(elapsed)
+        else:
+            errors[failure] = errors.get(failure, 0) + 1
+
+    await asyncio.gather(*(one(index, False) for index in range(warmup)))
+    (await client.post("/bench/timings/reset")).raise_for_status()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index, True) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    timings = (await client.get("/bench/timings")).json()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_s": len(samples) / elapsed,
+        **(summarize_ms(samples) if samples else {}),
+        **timings,
+    }
+
+
+@asynccontextmanager
+async def in_process_central() -> AsyncIterator[httpx.AsyncClient]:
+    transports = in_process_agents()
+    from benchmarks._instrumented_central import app
+
+    app.state.agent_transports = transports
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://central", headers={"X-API-Key": API_KEY},
+            timeout=None,
+        ) as client:
+            yield client
+
+
+@contextmanager
+def uvicorn_topology(central_env: Dict[str, str]) -> Iterator[str]:
+    with uvicorn_services(AGENT_MODULES) as agents:
+        env = {**central_env, **{AGENT_URL_ENV[name]: url for name, url in agents.urls.items()}}
+        with uvicorn_services({"central": CENTRAL_MODULE}, env=env) as central:
+            yield central.urls["central"]
+
+
+async def run_levels(client: httpx.AsyncClient, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for endpoint in args.endpoints:
+        for concurrency in args.concurrency:
+            result = await drive(client, endpoint, args.requests, concurrency, args.warmup)
+            results.append(result)
+            print(
+                f"{endpoint:<11} c={concurrency:<4} {result['requests_per_s']:>9.1f} req/s"
+                f"  p50 {result.get('p50_ms', 0):7.2f} ms  p95 {result.get('p95_ms', 0):7.2f} ms"
+                f"  p99 {result.get('p99_ms', 0):7.2f} ms  errors {sum(result['errors'].values())}",
+                flush=True,
+            )
+    return results
+
+
+async def run_in_process(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    async with in_process_central() as client:
+        return await run_levels(client, args)
+
+
+async def run_against(url: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    concurrency = max(args.concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, headers={"X-API-Key": API_KEY}, limits=limits, timeout=60.0) as client:
+        return await run_levels(client, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="uvicorn")
+    parser.add_argument("--endpoints", nargs="+", choices=["coordinate", "status"], default=["coordinate", "status"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per run")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument(
+        "--central-env", nargs="*", default=[], metavar="NAME=VALUE",
+        help="extra settings for the central agent, e.g. DISPATCH_MODE=concurrent",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    central_env = dict(item.split("=", 1) for item in args.central_env)
+    if args.mode == "inprocess":
+        os.environ.update(central_env)
+        results = asyncio.run(run_in_process(args))
+    else:
+        with uvicorn_topology(central_env) as url:
+            results = asyncio.run(run_against(url, args))
+
+    report = {"mode": args.mode, "central_env": central_env, "runs": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
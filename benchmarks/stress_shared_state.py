@@ -0,0 +1,100 @@
+"""Throughput of parallel ``/control`` against the battery agent with several workers.
+
+The agent runs under uvicorn with ``--workers`` processes, on the shared memory
+backend and, for contrast, on the memory backend (where each worker has its own
+state). With ``--optimistic`` every control carries the ``expected_version`` of the
+latest reply seen and is retried on ``409``, and the conflicts are counted. The
+state invariants themselves are checked by ``tests/test_shared_state_concurrency.py``.
+Run from the repository root::
+
+    python -m benchmarks.stress_shared_state --workers 4 --requests 2000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict
+
+import httpx
+
+from benchmarks._agents import AGENT_MODULES, API_KEY, uvicorn_services
+
+
+async def _hammer(url: str, requests: int, concurrency: int, seed: int, optimistic: bool) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    controls = [
+        {"mode": rng.choice(["charge", "discharge"]), "power_kw": round(rng.uniform(0.0, 2.0), 3)}
+        for _ in range(requests)
+    ]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, headers={"X-API-Key": API_KEY}, limits=limits, timeout=30.0) as client:
+        reply = await client.post("/update", json={"state_of_charge_kwh": 5.0, "capacity_kwh": 10.0})
+        latest = int(reply.headers["X-State-Version"])
+        semaphore = asyncio.Semaphore(concurrency)
+        conflicts = 0
+
+        async def send(control: Dict[str, Any]) -> None:
+            nonlocal latest, conflicts
+            async with semaphore:
+                while True:
+                    body = {**control, "expected_version": latest} if optimistic else control
+                    response = await client.post("/control", json=body)
+                    latest = max(latest, int(response.headers["X-State-Version"]))
+                    if response.status_code != 409:
+                        response.raise_for_status()
+                        return
+                    conflicts += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(control) for control in controls))
+        elapsed = time.perf_counter() - started
+    return {"requests": requests, "requests_per_s": requests / elapsed, "conflicts": conflicts}
+
+
+def run(backend: str, workers: int, requests: int, concurrency: int, seed: int, optimistic: bool) -> Dict[str, Any]:
+    shm_name = f"stress-battery-{os.getpid()}-{backend}"
+    env = {"STATE_BACKEND": backend, "STATE_SHM_NAME": shm_name}
+    try:
+        with uvicorn_services(
+            {"battery": AGENT_MODULES["battery"]}, env=env, extra_args=("--workers", str(workers))
+        ) as services:
+            result = asyncio.run(_hammer(services.urls["battery"], requests, concurrency, seed, optimistic))
+    finally:
+        if backend == "shared":
+            for segment_name in (shm_name, f"{shm_name}-history", f"{shm_name}-forecast"):
+                try:
+                    SharedMemory(name=segment_name).unlink()
+                except FileNotFoundError:
+                    pass
+            try:
+                os.remove(os.path.join(tempfile.gettempdir(), f"{shm_name}.lock"))
+            except FileNotFoundError:
+                pass
+    return {"backend": backend, "workers": workers, **result}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-memory", action="store_true", help="only run the shared memory backend")
+    parser.add_argument("--optimistic", action="store_true", help="send expected_version and retry on 409")
+    args = parser.parse_args()
+
+    backends = ["shared"] if args.skip_memory else ["shared", "memory"]
+    results = [
+        run(backend, args.workers, args.requests, args.concurrency, args.seed, args.optimistic) for backend in backends
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,29 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Security, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from services.battery_agent.app import physics
+from services.common.agent_state import (
+    CONFLICT_RESPONSE,
+    NOT_MODIFIED_RESPONSE,
+    StateBackend,
+    check_expected_version,
+    create_agent_state,
+    not_modified,
+)
+from services.common.history import HistoryResponse, create_state_history
+from services.common.journal import durability_dependency, open_state_journal
+from services.common.metrics import MetricsRegistry, instrument_agent_state, instrument_app
+from services.common.state_stream import StateStream
+from services.common.status_response import StatusResponseCache
+
 
 class BatteryMode(str, Enum):
     charge = "charge"
@@ -24,6 +40,9 @@ class BatteryMeasurement(BaseModel):
 class BatteryControl(BaseModel):
     mode: BatteryMode
     power_kw: float = Field(..., ge=0)
+    expected_version: Optional[int] = Field(
+        None, ge=0, description="Apply only if the state is still at this version; 409 otherwise"
+    )
 
 
 class BatteryStatus(BaseModel):
@@ -41,6 +60,12 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="")
 
     api_key: str = Field(..., validation_alias="SERVICE_API_KEY")
+    state_backend: StateBackend = Field(default="memory", validation_alias="STATE_BACKEND")
+    state_shm_name: str = Field(default="battery-agent-state", validation_alias="STATE_SHM_NAME")
+    history_horizon: int = Field(default=65_536, gt=0, validation_alias="HISTORY_HORIZON")
+    state_dir: Optional[str] = Field(default=None, validation_alias="STATE_DIR")
+    state_wal_sync: bool = Field(default=True, validation_alias="STATE_WAL_SYNC")
+    state_snapshot_every: int = Field(default=10_000, gt=0, validation_alias="STATE_SNAPSHOT_EVERY")
 
 
 settings = Settings()
@@ -48,7 +73,7 @@ API_KEY_HEADER_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_HEADER_NAME, auto_error=False)
 
 
-def require_api_key(api_key: str = Security(api_key_header)) -> str:
+async def require_api_key(api_key: str = Security(api_key_header)) -> str:
     if api_key is None or api_key != settings.api_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
     return api_key
@@ -66,15 +91,28 @@ DEFAULTS: Dict[str, float | datetime | BatteryMode] = {
 }
 
 
-state: Dict[str, float | datetime | BatteryMode] = DEFAULTS.copy()
+state = create_agent_state(DEFAULTS, settings.state_backend, settings.state_shm_name)
+state_stream = StateStream(state)
+status_response = StatusResponseCache(state, BatteryStatus)
+history = create_state_history(state, settings.history_horizon)
+journal = open_state_journal(
+    state, settings.state_dir, "battery", sync=settings.state_wal_sync, snapshot_every=settings.state_snapshot_every
+)
+durable_commit = durability_dependency(journal)
 app = FastAPI(title="Residential Battery Agent", version="1.0.0")
+metrics = MetricsRegistry()
+instrument_app(app, metrics)
+instrument_agent_state(metrics, state)
 
 
 def clamp_state_of_charge() -> None:
-    min_soc = float(state["min_state_of_charge_kwh"])
-    capacity = float(state["capacity_kwh"])
-    soc = float(state["state_of_charge_kwh"])
-    state["state_of_charge_kwh"] = max(min(soc, capacity), min_soc)
+    state["state_of_charge_kwh"] = float(
+        physics.clamp_state_of_charge(
+            float(state["state_of_charge_kwh"]),
+            float(state["capacity_kwh"]),
+            float(state["min_state_of_charge_kwh"]),
+        )
+    )
 
 
 @app.get("/health")
@@ -82,51 +120,70 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.get("/status", response_model=BatteryStatus)
-def get_status(_: str = Depends(require_api_key)) -> BatteryStatus:
-    return BatteryStatus(**state)
-
-
-@app.post("/update", response_model=BatteryStatus)
-def update_measurement(measurement: BatteryMeasurement, _: str = Depends(require_api_key)) -> BatteryStatus:
-    if measurement.capacity_kwh:
-        state["capacity_kwh"] = measurement.capacity_kwh
-    state["state_of_charge_kwh"] = measurement.state_of_charge_kwh
-    clamp_state_of_charge()
-    state["last_updated"] = datetime.utcnow()
-    return BatteryStatus(**state)
-
-
-@app.post("/control", response_model=BatteryStatus)
-def apply_control(control: BatteryControl, _: str = Depends(require_api_key)) -> BatteryStatus:
-    state["mode"] = control.mode
-    effective_power = 0.0
-    soc = float(state["state_of_charge_kwh"])
-    min_soc = float(state["min_state_of_charge_kwh"])
-    capacity = float(state["capacity_kwh"])
-    if control.mode == BatteryMode.charge:
-        available_room = capacity - soc
-        if available_room <= 0:
-            effective_power = 0.0
-        else:
-            effective_power = min(control.power_kw, float(state["max_charge_rate_kw"]), available_room)
-            state["state_of_charge_kwh"] = soc + effective_power
-    elif control.mode == BatteryMode.discharge:
-        available_energy = max(soc - min_soc, 0.0)
-        if available_energy <= 0:
-            effective_power = 0.0
-        else:
-            effective_power = min(control.power_kw, float(state["max_discharge_rate_kw"]), available_energy)
-            state["state_of_charge_kwh"] = soc - effective_power
-    elif control.mode == BatteryMode.idle:
-        effective_power = 0.0
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported mode")
-
-    state["power_kw"] = effective_power
-    clamp_state_of_charge()
-    state["last_updated"] = datetime.utcnow()
-    return BatteryStatus(**state)
+@app.get("/status", response_model=BatteryStatus, responses=NOT_MODIFIED_RESPONSE)
+async def get_status(
+    request: Request, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    unchanged = not_modified(request, state)
+    if unchanged is not None:
+        return unchanged
+    return status_response.response(accept)
+
+
+@app.post("/update", response_model=BatteryStatus, dependencies=[Depends(durable_commit)])
+async def update_measurement(
+    measurement: BatteryMeasurement, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    with state.transaction():
+        if measurement.capacity_kwh:
+            state["capacity_kwh"] = measurement.capacity_kwh
+        state["state_of_charge_kwh"] = measurement.state_of_charge_kwh
+        clamp_state_of_charge()
+        state.commit()
+        return status_response.response(accept)
+
+
+@app.post("/control", response_model=BatteryStatus, responses=CONFLICT_RESPONSE, dependencies=[Depends(durable_commit)])
+async def apply_control(
+    control: BatteryControl, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    with state.transaction():
+        check_expected_version(state, control.expected_version)
+        state["mode"] = control.mode
+        effective_power, soc = physics.apply_control(
+            float(state["state_of_charge_kwh"]),
+            float(state["capacity_kwh"]),
+            float(state["min_state_of_charge_kwh"]),
+            float(state["max_charge_rate_kw"]),
+            float(state["max_discharge_rate_kw"]),
+            control.power_kw if control.mode == BatteryMode.charge else 0.0,
+            control.power_kw if control.mode == BatteryMode.discharge else 0.0,
+        )
+        state["state_of_charge_kwh"] = float(soc)
+        state["power_kw"] = float(effective_power)
+        state.commit()
+        return status_response.response(accept)
+
+
+@app.get("/layout")
+async def get_layout(_: str = Depends(require_api_key)) -> Dict[str, Any]:
+    """Slot layout of the ``application/x-state-slots`` status encoding."""
+    return status_response.codec.describe()
+
+
+@app.get("/history", response_model=HistoryResponse)
+def get_history(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    step: float = Query(60.0, gt=0, description="Bucket width in seconds"),
+    _: str = Depends(require_api_key),
+) -> HistoryResponse:
+    return history.query(start, end, step)
+
+
+@app.get("/subscribe", response_class=StreamingResponse)
+async def subscribe(request: Request, _: str = Depends(require_api_key)) -> StreamingResponse:
+    return state_stream.response(request)
 
 
 __all__ = ["app"]
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import Tuple, TypeVar
+
+import numpy as np
+
+Value = TypeVar("Value", float, np.ndarray)
+
+
+def _extrema(value: Value):
+    # Builtins on scalars, where the ufuncs cost ~1 us a call; ufuncs on arrays.
+    return (np.minimum, np.maximum) if isinstance(value, np.ndarray) else (min, max)
+
+
+def clamp_state_of_charge(soc: Value, capacity: Value, min_soc: Value) -> Value:
+    minimum, maximum = _extrema(soc)
+    return maximum(minimum(soc, capacity), min_soc)
+
+
+def apply_control(
+    soc: Value,
+    capacity: Value,
+    min_soc: Value,
+    max_charge_rate: Value,
+    max_discharge_rate: Value,
+    charge_kw: Value,
+    discharge_kw: Value,
+) -> Tuple[Value, Value]:
+    # Battery response to one /control step, returning (applied power, new SoC).
+    # Works on floats and on arrays alike (one element per battery), so the
+    # agent and the offline simulator share the same rules. Only one of
+    # ``charge_kw``/``discharge_kw`` is non-zero for a given battery. ``soc``
+    # decides between scalar and array arithmetic.
+    minimum, maximum = _extrema(soc)
+    room = maximum(capacity - soc, 0.0)
+    available = maximum(soc - min_soc, 0.0)
+    charged = minimum(minimum(charge_kw, max_charge_rate), room)
+    discharged = minimum(minimum(discharge_kw, max_discharge_rate), available)
+    soc = clamp_state_of_charge(soc + charged - discharged, capacity, min_soc)
+    return charged + discharged, soc
+
+
+__all__ = ["apply_control", "clamp_state_of_charge"]
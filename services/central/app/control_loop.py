@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Deque, Optional
+
+from services.central.app.models import ControlLoopStats, TickTimings
+
+logger = logging.getLogger(__name__)
+
+
+def _timings(samples: Deque[float]) -> Optional[TickTimings]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return TickTimings(
+        mean_ms=1e3 * sum(ordered) / len(ordered),
+        p50_ms=1e3 * ordered[round(0.5 * last)],
+        p95_ms=1e3 * ordered[round(0.95 * last)],
+        max_ms=1e3 * ordered[-1],
+    )
+
+
+class ControlLoop:
+    """Run ``tick`` at a fixed rate, on a schedule anchored at the start so delays do not accumulate.
+
+    Tick ``n`` is due at ``start + n / rate_hz``. A tick that overruns makes
+    the loop skip the deadlines it missed and wait for the next one instead
+    of running late ticks back to back. Changing the rate re-anchors the
+    schedule at once, even in the middle of a wait. Durations and lateness
+    (start after the due time) of the last ``window`` ticks are kept for
+    ``stats``.
+    """
+
+    def __init__(
+        self,
+        tick: Callable[[], Awaitable[object]],
+        rate_hz: float,
+        window: int = 256,
+        on_tick: Callable[[str, float], None] = lambda outcome, seconds: None,
+        on_skip: Callable[[int], None] = lambda count: None,
+    ) -> None:
+        self._tick = tick
+        self.rate_hz = rate_hz
+        self._on_tick = on_tick
+        self._on_skip = on_skip
+        self._task: Optional[asyncio.Task] = None
+        self._retuned = asyncio.Event()
+        self._durations: Deque[float] = deque(maxlen=window)
+        self._lateness: Deque[float] = deque(maxlen=window)
+        self.ticks = 0
+        self.skipped = 0
+        self.errors = 0
+        self._last_tick_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def retune(self, rate_hz: float) -> None:
+        self.rate_hz = rate_hz
+        self._retuned.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        rate = 0.0
+        anchor = 0.0
+        index = 0
+        while True:
+            self._retuned.clear()
+            if self.rate_hz != rate:
+                rate, anchor, index = self.rate_hz, loop.time(), 0
+            due = anchor + index / rate
+            wait = due - loop.time()
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self._retuned.wait(), wait)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            started = loop.time()
+            self._lateness.append(max(started - due, 0.0))
+            self._last_tick_at = datetime.utcnow()
+            outcome = "ok"
+            try:
+                await self._tick()
+            except Exception:
+                outcome = "error"
+                self.errors += 1
+                logger.exception("Control loop tick failed")
+            finished = loop.time()
+            self.ticks += 1
+            self._durations.append(finished - started)
+            self._on_tick(outcome, finished - started)
+            index += 1
+            # Deadlines already gone by are skipped, not run late.
+            missed = int((finished - anchor) * rate) - index + 1
+            if missed > 0:
+                index += missed
+                self.skipped += missed
+                self._on_skip(missed)
+
+    def stats(self) -> ControlLoopStats:
+        return ControlLoopStats(
+            running=self.running,
+            tick_rate_hz=self.rate_hz,
+            ticks=self.ticks,
+            skipped_ticks=self.skipped,
+            errors=self.errors,
+            last_tick_at=self._last_tick_at,
+            duration=_timings(self._durations),
+            lateness=_timings(self._lateness),
+        )
+
+
+__all__ = ["ControlLoop"]
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+MODE_IDLE = 0
+MODE_CHARGE = 1
+MODE_DISCHARGE = 2
+
+
+class SiteColumns(NamedTuple):
+    production_kw: np.ndarray
+    consumption_kw: np.ndarray
+    battery_capacity_kwh: np.ndarray
+    battery_soc_kwh: np.ndarray
+    battery_min_soc_kwh: np.ndarray
+    battery_max_charge_kw: np.ndarray
+    battery_max_discharge_kw: np.ndarray
+    vehicle_connected: np.ndarray
+    vehicle_capacity_kwh: np.ndarray
+    vehicle_soc_kwh: np.ndarray
+    vehicle_max_charge_kw: np.ndarray
+    vehicle_max_discharge_kw: np.ndarray
+    flexible_load_kw: np.ndarray
+    shed_kw: np.ndarray
+
+
+class DispatchPlan(NamedTuple):
+    battery_mode: np.ndarray
+    battery_power_kw: np.ndarray
+    vehicle_mode: np.ndarray
+    vehicle_power_kw: np.ndarray
+    shed_target_kw: np.ndarray
+    shed_changed: np.ndarray
+
+
+def allocate(columns: SiteColumns) -> DispatchPlan:
+    # Same rules as the sequential /coordinate cycle, evaluated for every site at
+    # once: surplus charges the battery then the vehicle; deficit discharges the
+    # battery, then the vehicle, then sheds flexible load. Agents apply exactly
+    # the requested power when it respects their limits, so the requested power
+    # stands in for the applied power between the steps.
+    c = columns
+    net = c.production_kw - c.consumption_kw
+    surplus = net > 0
+    deficit_sites = net < 0
+
+    battery_room = np.maximum(c.battery_capacity_kwh - c.battery_soc_kwh, 0.0)
+    battery_charge = np.where(
+        surplus & (battery_room > 0),
+        np.minimum(np.minimum(net, c.battery_max_charge_kw), battery_room),
+        0.0,
+    )
+    remaining_surplus = net - battery_charge
+
+    vehicle_room = np.maximum(c.vehicle_capacity_kwh - c.vehicle_soc_kwh, 0.0)
+    vehicle_charge = np.where(
+        surplus & (remaining_surplus > 0) & c.vehicle_connected & (vehicle_room > 0),
+        np.minimum(np.minimum(remaining_surplus, c.vehicle_max_charge_kw), vehicle_room),
+        0.0,
+    )
+
+    deficit = np.where(deficit_sites, -net, 0.0)
+    battery_available = np.maximum(c.battery_soc_kwh - c.battery_min_soc_kwh, 0.0)
+    battery_discharge = np.where(
+        deficit_sites & (battery_available > 0),
+        np.minimum(np.minimum(deficit, c.battery_max_discharge_kw), battery_available),
+        0.0,
+    )
+    deficit = np.maximum(deficit - battery_discharge, 0.0)
+
+    vehicle_discharge = np.where(
+        deficit_sites & (deficit > 0) & c.vehicle_connected & (c.vehicle_soc_kwh > 0),
+        np.minimum(np.minimum(deficit, c.vehicle_max_discharge_kw), c.vehicle_soc_kwh),
+        0.0,
+    )
+    deficit = np.maximum(deficit - vehicle_discharge, 0.0)
+
+    max_additional_shed = np.maximum(c.flexible_load_kw - c.shed_kw, 0.0)
+    shed_target = np.where(
+        deficit_sites & (deficit > 0),
+        np.minimum(c.shed_kw + np.minimum(deficit, max_additional_shed), c.flexible_load_kw),
+        c.shed_kw,
+    )
+
+    battery_mode = np.full(net.shape, MODE_IDLE, dtype=np.int8)
+    battery_mode[battery_charge > 0] = MODE_CHARGE
+    battery_mode[battery_discharge > 0] = MODE_DISCHARGE
+    vehicle_mode = np.full(net.shape, MODE_IDLE, dtype=np.int8)
+    vehicle_mode[vehicle_charge > 0] = MODE_CHARGE
+    vehicle_mode[vehicle_discharge > 0] = MODE_DISCHARGE
+
+    return DispatchPlan(
+        battery_mode=battery_mode,
+        battery_power_kw=battery_charge + battery_discharge,
+        vehicle_mode=vehicle_mode,
+        vehicle_power_kw=vehicle_charge + vehicle_discharge,
+        shed_target_kw=shed_target,
+        shed_changed=shed_target != c.shed_kw,
+    )
+
+
+__all__ = [
+    "DispatchPlan",
+    "MODE_CHARGE",
+    "MODE_DISCHARGE",
+    "MODE_IDLE",
+    "SiteColumns",
+    "allocate",
+]
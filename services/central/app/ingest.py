@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from pydantic import BaseModel
+
+from services.central.app.models import CoordinationPayload, IngestStats
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENT_KINDS = ("solar", "load", "battery", "vehicle")
+
+PushMeasurements = Callable[[str, CoordinationPayload], Awaitable[None]]
+
+
+class MeasurementIngestor:
+    """Coalesce streamed measurements and push the latest one per source at a fixed rate.
+
+    Readings go through a bounded queue: when it is full, ``offer`` waits, so a
+    streaming client is slowed down instead of memory growing. Queued readings
+    are folded into a ``(site, kind) -> latest measurement`` map, and every
+    ``flush_interval`` seconds the map is pushed to the agents, one
+    ``push_measurements`` per site. A push that is still running delays the
+    next one, while readings keep replacing each other in the map. Readings of
+    a failed push are kept for the next one unless a newer value arrived.
+    """
+
+    def __init__(self, push: PushMeasurements, flush_interval: float, queue_size: int) -> None:
+        self._push = push
+        self._flush_interval = flush_interval
+        self._queue: asyncio.Queue[Tuple[str, CoordinationPayload]] = asyncio.Queue(queue_size)
+        self._pending: Dict[Tuple[str, str], BaseModel] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._received = 0
+        self._coalesced = 0
+        self._pushed = 0
+        self._batches = 0
+        self._push_errors = 0
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._coalesce()), asyncio.create_task(self._flush_periodically())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            self._merge(*self._queue.get_nowait())
+        await self.flush()
+
+    async def offer(self, site_id: str, payload: CoordinationPayload) -> None:
+        await self._queue.put((site_id, payload))
+
+    def _merge(self, site_id: str, payload: CoordinationPayload) -> None:
+        self._received += 1
+        for kind in MEASUREMENT_KINDS:
+            measurement = getattr(payload, kind)
+            if measurement is None:
+                continue
+            key = (site_id, kind)
+            if key in self._pending:
+                self._coalesced += 1
+            self._pending[key] = measurement
+
+    async def _coalesce(self) -> None:
+        while True:
+            self._merge(*await self._queue.get())
+
+    async def _flush_periodically(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Pushing ingested measurements failed")
+            await asyncio.sleep(max(self._flush_interval - (loop.time() - started), 0.0))
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        sites: Dict[str, Dict[str, BaseModel]] = {}
+        for (site_id, kind), measurement in batch.items():
+            sites.setdefault(site_id, {})[kind] = measurement
+        results = await asyncio.gather(
+            *(self._push(site_id, CoordinationPayload(**readings)) for site_id, readings in sites.items()),
+            return_exceptions=True,
+        )
+        self._batches += 1
+        for (site_id, readings), result in zip(sites.items(), results):
+            if isinstance(result, BaseException):
+                self._push_errors += 1
+                logger.warning("Pushing measurements of site %s failed: %r", site_id, result)
+                for kind, measurement in readings.items():
+                    self._pending.setdefault((site_id, kind), measurement)
+            else:
+                self._pushed += len(readings)
+
+    def stats(self) -> IngestStats:
+        return IngestStats(
+            received=self._received,
+            coalesced=self._coalesced,
+            pushed=self._pushed,
+            batches=self._batches,
+            push_errors=self._push_errors,
+            queue_depth=self._queue.qsize(),
+            queue_size=self._queue.maxsize,
+            pending_sources=len(self._pending),
+            flush_rate_hz=1.0 / self._flush_interval,
+        )
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a streamed body into its non-empty lines as they arrive."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+__all__ = ["MEASUREMENT_KINDS", "MeasurementIngestor", "ndjson_lines"]
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from services.central.app.status_cache import StatusCache, parse_etag
+
+logger = logging.getLogger(__name__)
+
+
+class _Resync(Exception):
+    pass
+
+
+class LiveStatusStream:
+    """Follow each agent's ``/subscribe`` stream and keep ``cache`` current.
+
+    On connect the agent sends a full snapshot, so every reconnect is also a
+    resync. A delta that does not follow the cached version forces a reconnect.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        agent_urls: List[str],
+        cache: StatusCache,
+        read_timeout: float = 30.0,
+        reconnect_min: float = 0.5,
+        reconnect_max: float = 10.0,
+    ) -> None:
+        self._client = client
+        self._agent_urls = agent_urls
+        self._cache = cache
+        self._timeout = httpx.Timeout(client.timeout.connect, read=read_timeout)
+        self._reconnect_min = reconnect_min
+        self._reconnect_max = reconnect_max
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._follow(url)) for url in self._agent_urls]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _follow(self, agent_url: str) -> None:
+        delay = self._reconnect_min
+        while True:
+            try:
+                async with self._client.stream("GET", f"{agent_url}/subscribe", timeout=self._timeout) as response:
+                    response.raise_for_status()
+                    delay = self._reconnect_min
+                    await self._consume(agent_url, response)
+            except (httpx.HTTPError, _Resync, ValueError) as exc:
+                logger.warning("State stream from %s interrupted: %r", agent_url, exc)
+            finally:
+                self._cache.set_live(agent_url, False)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self._reconnect_max)
+
+    async def _consume(self, agent_url: str, response: httpx.Response) -> None:
+        event: Optional[str] = None
+        event_id: Optional[str] = None
+        data: List[str] = []
+        async for line in response.aiter_lines():
+            if not line:
+                if event is not None and data:
+                    self._apply(agent_url, event, event_id, json.loads("\n".join(data)))
+                event, event_id, data = None, None, []
+            elif line.startswith(":"):
+                continue
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("id:"):
+                event_id = line[len("id:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+
+    def _apply(self, agent_url: str, event: str, event_id: Optional[str], payload: Dict[str, Any]) -> None:
+        etag = f'"{event_id}"'
+        if event == "snapshot":
+            self._cache.store(agent_url, etag, payload["state"])
+            self._cache.set_live(agent_url, True)
+            return
+        if event != "delta":
+            return
+        epoch, version = parse_etag(etag)
+        entry = self._cache.get(agent_url)
+        if entry is None or entry.epoch != epoch:
+            raise _Resync(f"delta {event_id} without a matching snapshot")
+        if version <= entry.version:
+            return
+        if version > entry.version + 1:
+            raise _Resync(f"missed versions {entry.version + 1}..{version - 1}")
+        self._cache.store(agent_url, etag, {**entry.data, **payload["changes"]})
+
+
+__all__ = ["LiveStatusStream"]
@@ -1,14 +1,93 @@
 from __future__ import annotations
 
 import asyncio
-from enum import Enum
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
 import httpx
-from fastapi import Depends, FastAPI, HTTPException, Security, status
+import numpy as np
+import orjson
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Request,
+    Response,
+    Security,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from starlette.concurrency import run_in_threadpool
+
+from services.central.app import dispatch
+from services.central.app.control_loop import ControlLoop
+from services.central.app.ingest import MeasurementIngestor, ndjson_lines
+from services.central.app.live_status import LiveStatusStream
+from services.central.app.mpc import MPCPlanner
+from services.central.app.models import (
+    AgentWireFormat,
+    BatchCoordinateResponse,
+    BatchCoordinationPayload,
+    BatteryAction,
+    BatteryMode,
+    BatteryStatus,
+    ControlLoopStats,
+    ControlLoopUpdate,
+    CoordinateResponse,
+    CoordinationActions,
+    CoordinationPayload,
+    DispatchMode,
+    DispatchReport,
+    HorizonForecast,
+    IngestStats,
+    IngestSummary,
+    LoadAction,
+    LoadStatus,
+    MeasurementReading,
+    PlannerMode,
+    SolarStatus,
+    StaleStatus,
+    SystemStatus,
+    VehicleAction,
+    VehicleMode,
+    VehicleStatus,
+)
+from services.central.app.planner import plan_actions
+from services.central.app.resilience import CircuitBreakers, Deadline, gather_within, hedged
+from services.central.app.single_flight import CoordinationQueue, SingleFlight
+from services.central.app.status_cache import CachedStatus, StatusCache
+from services.common.metrics import MetricsRegistry, instrument_app, preallocate
+from services.common.state_layout import STATE_SLOTS_MEDIA_TYPE, SlotCodec
+
+DEFAULT_SITE_ID = "default"
+
+# Agent endpoint -> operation label of the central's per-agent metrics.
+AGENT_OPERATIONS = {
+    "/status": "status",
+    "/production": "update",
+    "/update": "update",
+    "/control": "control",
+    "/shed": "shed",
+}
+AGENT_OPERATION_LABELS = {
+    "solar": ("status", "update", "forecast"),
+    "battery": ("status", "update", "control"),
+    "vehicle": ("status", "update", "control"),
+    "load": ("status", "update", "shed", "forecast"),
+}
+COORDINATION_PHASES = ("push_measurements", "fetch_statuses", "plan", "execute")
+
+
+class SiteAgents(BaseModel):
+    solar_agent_url: str
+    battery_agent_url: str
+    vehicle_agent_url: str
+    load_agent_url: str
 
 
 class Settings(BaseSettings):
@@ -27,181 +106,423 @@ class Settings(BaseSettings):
         default="http://load-agent:8004", validation_alias="LOAD_AGENT_URL"
     )
     http_timeout: float = Field(default=5.0, validation_alias="HTTP_CLIENT_TIMEOUT")
+    http_max_connections_per_host: int = Field(
+        default=20, ge=1, validation_alias="HTTP_MAX_CONNECTIONS_PER_HOST"
+    )
+    http_max_keepalive_connections: int = Field(
+        default=10, ge=0, validation_alias="HTTP_MAX_KEEPALIVE_CONNECTIONS"
+    )
+    http_keepalive_expiry: float = Field(default=30.0, ge=0, validation_alias="HTTP_KEEPALIVE_EXPIRY")
+    http2: bool = Field(default=False, validation_alias="HTTP2_ENABLED")
+    sites: Dict[str, SiteAgents] = Field(default_factory=dict, validation_alias="SITE_AGENTS")
+    status_cache_max_staleness: float = Field(default=0.0, ge=0, validation_alias="STATUS_CACHE_MAX_STALENESS")
+    status_streaming: bool = Field(default=False, validation_alias="STATUS_STREAMING")
+    status_stream_reconnect_max: float = Field(default=10.0, gt=0, validation_alias="STATUS_STREAM_RECONNECT_MAX")
+    dispatch_mode: DispatchMode = Field(default=DispatchMode.sequential, validation_alias="DISPATCH_MODE")
+    dispatch_reconciliation_passes: int = Field(
+        default=2, ge=0, validation_alias="DISPATCH_RECONCILIATION_PASSES"
+    )
+    ingest_flush_rate_hz: float = Field(default=2.0, gt=0, validation_alias="INGEST_FLUSH_RATE_HZ")
+    ingest_queue_size: int = Field(default=1024, ge=1, validation_alias="INGEST_QUEUE_SIZE")
+    coordinate_deadline: float = Field(default=2.0, ge=0, validation_alias="COORDINATE_DEADLINE")
+    status_hedge_delay: float = Field(default=0.1, ge=0, validation_alias="STATUS_HEDGE_DELAY")
+    circuit_failure_threshold: int = Field(default=3, ge=1, validation_alias="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_reset_timeout: float = Field(default=5.0, gt=0, validation_alias="CIRCUIT_RESET_TIMEOUT")
+    planner_mode: PlannerMode = Field(default=PlannerMode.greedy, validation_alias="PLANNER_MODE")
+    mpc_horizon_steps: int = Field(default=96, ge=1, validation_alias="MPC_HORIZON_STEPS")
+    mpc_step_hours: float = Field(default=0.25, gt=0, validation_alias="MPC_STEP_HOURS")
+    mpc_max_iterations: int = Field(default=1000, ge=1, validation_alias="MPC_MAX_ITERATIONS")
+    mpc_time_limit: float = Field(default=0.05, gt=0, validation_alias="MPC_TIME_LIMIT")
+    # Fill series the payload does not forecast from the solar and load agents' /forecast.
+    mpc_agent_forecasts: bool = Field(default=True, validation_alias="MPC_AGENT_FORECASTS")
+    agent_wire_format: AgentWireFormat = Field(default=AgentWireFormat.json, validation_alias="AGENT_WIRE_FORMAT")
+    single_flight: bool = Field(default=True, validation_alias="SINGLE_FLIGHT")
+    control_loop_enabled: bool = Field(default=False, validation_alias="CONTROL_LOOP_ENABLED")
+    control_loop_rate_hz: float = Field(default=1.0, gt=0, le=1000, validation_alias="CONTROL_LOOP_RATE_HZ")
     api_key: str = Field(..., validation_alias="SERVICE_API_KEY")
 
 
 settings = Settings()
-app = FastAPI(title="Central Coordination Agent", version="1.0.0")
+status_cache = StatusCache(max_staleness=settings.status_cache_max_staleness)
+circuit_breakers = CircuitBreakers(settings.circuit_failure_threshold, settings.circuit_reset_timeout)
+# Slot layout of each agent's binary status, fetched from its /layout on first use.
+state_layouts: Dict[str, SlotCodec] = {}
+mpc_planner: Optional[MPCPlanner] = None
+if settings.planner_mode == PlannerMode.mpc:
+    mpc_planner = MPCPlanner(
+        settings.mpc_horizon_steps,
+        settings.mpc_step_hours,
+        max_iterations=settings.mpc_max_iterations,
+        time_limit=settings.mpc_time_limit,
+    )
 API_KEY_HEADER_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_HEADER_NAME, auto_error=False)
 
 
-def require_api_key(api_key: str = Security(api_key_header)) -> str:
-    if api_key is None or api_key != settings.api_key:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
-    return api_key
-
-
-class SolarMeasurement(BaseModel):
-    production_kw: float = Field(..., ge=0)
-
-
-class LoadMeasurement(BaseModel):
-    critical_load_kw: float = Field(..., ge=0)
-    flexible_load_kw: float = Field(..., ge=0)
-
-
-class BatteryMeasurement(BaseModel):
-    state_of_charge_kwh: float = Field(..., ge=0)
-    capacity_kwh: Optional[float] = Field(None, gt=0)
-
-
-class VehicleMeasurement(BaseModel):
-    connected: Optional[bool] = None
-    state_of_charge_kwh: float = Field(..., ge=0)
-    capacity_kwh: Optional[float] = Field(None, gt=0)
-
-
-class CoordinationPayload(BaseModel):
-    solar: Optional[SolarMeasurement] = None
-    load: Optional[LoadMeasurement] = None
-    battery: Optional[BatteryMeasurement] = None
-    vehicle: Optional[VehicleMeasurement] = None
-
-
-class BatteryMode(str, Enum):
-    charge = "charge"
-    discharge = "discharge"
-    idle = "idle"
-
-
-class VehicleMode(str, Enum):
-    charge = "charge"
-    discharge = "discharge"
-    idle = "idle"
-
-
-class SolarStatus(BaseModel):
-    production_kw: float
-
-
-class BatteryStatus(BaseModel):
-    capacity_kwh: float
-    state_of_charge_kwh: float
-    min_state_of_charge_kwh: float
-    max_charge_rate_kw: float
-    max_discharge_rate_kw: float
-    mode: BatteryMode
-    power_kw: float
-
+def site_agents(site_id: str = DEFAULT_SITE_ID) -> SiteAgents:
+    if site_id in settings.sites:
+        return settings.sites[site_id]
+    if site_id == DEFAULT_SITE_ID:
+        return SiteAgents(
+            solar_agent_url=settings.solar_agent_url,
+            battery_agent_url=settings.battery_agent_url,
+            vehicle_agent_url=settings.vehicle_agent_url,
+            load_agent_url=settings.load_agent_url,
+        )
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown site '{site_id}'")
 
-class VehicleStatus(BaseModel):
-    connected: bool
-    capacity_kwh: float
-    state_of_charge_kwh: float
-    max_charge_rate_kw: float
-    max_discharge_rate_kw: float
-    mode: VehicleMode
-    power_kw: float
 
+def _agent_urls(agents: SiteAgents) -> Dict[str, str]:
+    return {
+        "solar": agents.solar_agent_url,
+        "battery": agents.battery_agent_url,
+        "vehicle": agents.vehicle_agent_url,
+        "load": agents.load_agent_url,
+    }
 
-class LoadStatus(BaseModel):
-    critical_load_kw: float
-    flexible_load_kw: float
-    shed_kw: float
-    total_nominal_load_kw: float
-    total_consumption_kw: float
 
+def _agent_base_urls() -> List[str]:
+    urls = []
+    for agents in [site_agents(), *settings.sites.values()]:
+        urls.extend(
+            [agents.solar_agent_url, agents.battery_agent_url, agents.vehicle_agent_url, agents.load_agent_url]
+        )
+    return list(dict.fromkeys(urls))
 
-class SystemStatus(BaseModel):
-    solar: SolarStatus
-    battery: BatteryStatus
-    vehicle: VehicleStatus
-    load: LoadStatus
 
+def _mount_key(url: str) -> str:
+    parsed = httpx.URL(url)
+    if parsed.port is None:
+        return f"{parsed.scheme}://{parsed.host}"
+    return f"{parsed.scheme}://{parsed.host}:{parsed.port}"
 
-class BatteryAction(BaseModel):
-    mode: BatteryMode = BatteryMode.idle
-    requested_power_kw: float = 0.0
-    applied_power_kw: float = 0.0
 
+def build_http_client(transports: Optional[Dict[str, httpx.AsyncBaseTransport]] = None) -> httpx.AsyncClient:
+    # One transport (and therefore one connection pool) per agent host, so the
+    # connection limits apply per host instead of being shared by all agents.
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections_per_host,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    mounts: Dict[str, httpx.AsyncBaseTransport] = {
+        _mount_key(url): httpx.AsyncHTTPTransport(limits=limits, http2=settings.http2)
+        for url in _agent_base_urls()
+    }
+    if transports:
+        mounts.update({_mount_key(url): transport for url, transport in transports.items()})
+    headers = {API_KEY_HEADER_NAME: settings.api_key}
+    if settings.agent_wire_format == AgentWireFormat.slots:
+        headers["Accept"] = f"{STATE_SLOTS_MEDIA_TYPE}, application/json"
+    return httpx.AsyncClient(
+        timeout=settings.http_timeout,
+        headers=headers,
+        limits=limits,
+        http2=settings.http2,
+        mounts=mounts,
+    )
 
-class VehicleAction(BaseModel):
-    mode: VehicleMode = VehicleMode.idle
-    requested_power_kw: float = 0.0
-    applied_power_kw: float = 0.0
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # A host process may route agents through custom transports (for example the
+    # in-process ASGI transports of the edge deployment) via app.state.
+    client = build_http_client(transports=getattr(app.state, "agent_transports", None))
+    app.state.http_client = client
+    stream = None
+    if settings.status_streaming:
+        stream = LiveStatusStream(
+            client, _agent_base_urls(), status_cache, reconnect_max=settings.status_stream_reconnect_max
+        )
+        stream.start()
 
-class LoadAction(BaseModel):
-    shed_target_kw: float = 0.0
+    async def push_site_measurements(site_id: str, payload: CoordinationPayload) -> None:
+        _raise_undelivered(await push_measurements(payload, client, site_agents(site_id)))
 
+    ingestor = MeasurementIngestor(
+        push_site_measurements, 1.0 / settings.ingest_flush_rate_hz, settings.ingest_queue_size
+    )
+    app.state.ingestor = ingestor
+    ingestor.start()
+    app.state.status_flight = SingleFlight()
+    app.state.coordination_queue = CoordinationQueue(
+        lambda payload, merged_requests: run_coordination_cycle(payload, client, merged_requests)
+    )
 
-class CoordinationActions(BaseModel):
-    battery: BatteryAction
-    vehicle: VehicleAction
-    load: LoadAction
+    async def control_tick() -> None:
+        # No new measurements: decide on the agents' current state.
+        if settings.single_flight:
+            await app.state.coordination_queue.submit(CoordinationPayload())
+        else:
+            await run_coordination_cycle(CoordinationPayload(), client)
+
+    def record_tick(outcome: str, seconds: float) -> None:
+        control_ticks.labels(outcome).inc()
+        tick_duration.labels().observe(seconds)
+
+    control_loop = ControlLoop(
+        control_tick,
+        settings.control_loop_rate_hz,
+        on_tick=record_tick,
+        on_skip=lambda count: control_ticks.labels("skipped").inc(count),
+    )
+    app.state.control_loop = control_loop
+    if settings.control_loop_enabled:
+        control_loop.start()
+    try:
+        yield
+    finally:
+        await control_loop.stop()
+        await app.state.coordination_queue.stop()
+        await ingestor.stop()
+        if stream is not None:
+            await stream.stop()
+        await client.aclose()
+
+
+app = FastAPI(title="Central Coordination Agent", version="1.0.0", lifespan=lifespan)
+metrics = MetricsRegistry()
+instrument_app(app, metrics)
+agent_latency = metrics.histogram(
+    "central_agent_request_duration_seconds", "Latency of calls to the agents.", ("agent", "operation")
+)
+agent_errors = metrics.counter(
+    "central_agent_request_errors_total", "Failed calls to the agents by error type.", ("agent", "operation", "type")
+)
+phase_duration = metrics.histogram(
+    "central_coordination_phase_duration_seconds", "Duration of each /coordinate phase.", ("phase",)
+)
+status_hedges = metrics.counter(
+    "central_status_hedges_total", "Second /status requests sent because the first was slow.", ("agent",)
+)
+coalesced_requests = metrics.counter(
+    "central_coalesced_requests_total", "Calls answered by another call's fetch or cycle.", ("endpoint",)
+)
+control_ticks = metrics.counter(
+    "central_control_loop_ticks_total", "Control loop ticks by outcome (ok, error, skipped).", ("outcome",)
+)
+tick_duration = metrics.histogram("central_control_loop_tick_duration_seconds", "Duration of each control loop tick.")
+metrics.gauge(
+    "central_open_circuits", "Agents whose circuit breaker is open or half-open.", circuit_breakers.open_count
+)
+preallocate(
+    agent_latency,
+    [(agent, operation) for agent, operations in AGENT_OPERATION_LABELS.items() for operation in operations],
+)
+preallocate(phase_duration, [(phase,) for phase in COORDINATION_PHASES])
+preallocate(coalesced_requests, [("status",), ("coordinate",)])
+preallocate(control_ticks, [("ok",), ("error",), ("skipped",)])
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
 
 
-class CoordinateResponse(BaseModel):
-    actions: CoordinationActions
-    status: SystemStatus
+def require_api_key(api_key: str = Security(api_key_header)) -> str:
+    if api_key is None or api_key != settings.api_key:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+    return api_key
 
 
-async def _raise_on_transport_error(call):
+async def _raise_on_transport_error(call, agent: str, operation: str):
+    started = time.perf_counter()
     try:
         response = await call
-        response.raise_for_status()
+        if response.status_code != status.HTTP_304_NOT_MODIFIED:
+            response.raise_for_status()
         return response
     except httpx.RequestError as exc:
+        agent_errors.labels(agent, operation, type(exc).__name__).inc()
         raise HTTPException(status_code=503, detail=f"Error contacting remote service: {exc}") from exc
     except httpx.HTTPStatusError as exc:
+        agent_errors.labels(agent, operation, f"http_{exc.response.status_code}").inc()
         raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text) from exc
+    finally:
+        agent_latency.labels(agent, operation).observe(time.perf_counter() - started)
+
+
+async def _call_agent(
+    agent: str, agent_url: str, operation: str, request: Callable[[], Awaitable[httpx.Response]]
+) -> httpx.Response:
+    # Transport errors, 5xx replies and calls cut by the cycle deadline count
+    # against the agent's breaker; 4xx replies mean the agent is up.
+    breaker = circuit_breakers.get(agent_url)
+    if not breaker.allow():
+        agent_errors.labels(agent, operation, "circuit_open").inc()
+        raise HTTPException(status_code=503, detail=f"Circuit open for the {agent} agent at {agent_url}")
+    try:
+        response = await _raise_on_transport_error(request(), agent, operation)
+    except HTTPException as exc:
+        if exc.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except asyncio.CancelledError:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return response
+
+
+async def _decode_status(
+    client: httpx.AsyncClient, agent: str, agent_url: str, response: httpx.Response
+) -> Dict[str, Any]:
+    # Agents that predate the slot encoding, or were asked for JSON, answer JSON.
+    if not response.headers.get("content-type", "").startswith(STATE_SLOTS_MEDIA_TYPE):
+        return orjson.loads(response.content)
+    try:
+        codec = state_layouts.get(agent_url)
+        if codec is None or codec.fingerprint != SlotCodec.peek_fingerprint(response.content):
+            layout = await _call_agent(agent, agent_url, "status", lambda: client.get(f"{agent_url}/layout"))
+            codec = state_layouts[agent_url] = SlotCodec.from_description(layout.json())
+        return codec.unpack(response.content)
+    except (ValueError, KeyError) as exc:
+        agent_errors.labels(agent, "status", "bad_layout").inc()
+        raise HTTPException(status_code=502, detail=f"Undecodable status from the {agent} agent: {exc}") from exc
+
+
+async def _fetch_agent_status(client: httpx.AsyncClient, agent: str, agent_url: str) -> CachedStatus:
+    cached = status_cache.fresh(agent_url)
+    if cached is not None:
+        return cached
+    cached = status_cache.get(agent_url)
+    headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else None
+    hedge = status_hedges.labels(agent).inc
+    response = await _call_agent(
+        agent,
+        agent_url,
+        "status",
+        lambda: hedged(lambda: client.get(f"{agent_url}/status", headers=headers), settings.status_hedge_delay, hedge),
+    )
+    if response.status_code == status.HTTP_304_NOT_MODIFIED:
+        return status_cache.revalidated(agent_url)
+    data = await _decode_status(client, agent, agent_url, response)
+    return status_cache.store(agent_url, response.headers.get("ETag"), data)
+
+
+async def _post_to_agent(
+    client: httpx.AsyncClient, agent: str, agent_url: str, path: str, body: Dict[str, Any]
+) -> CachedStatus:
+    # Every mutating endpoint answers with the agent's new status, so the reply
+    # also refreshes the status cache.
+    response = await _call_agent(
+        agent, agent_url, AGENT_OPERATIONS[path], lambda: client.post(f"{agent_url}{path}", json=body)
+    )
+    data = await _decode_status(client, agent, agent_url, response)
+    return status_cache.store(agent_url, response.headers.get("ETag"), data)
 
 
-async def fetch_statuses(client: httpx.AsyncClient) -> SystemStatus:
-    responses = await asyncio.gather(
-        _raise_on_transport_error(client.get(f"{settings.solar_agent_url}/status")),
-        _raise_on_transport_error(client.get(f"{settings.battery_agent_url}/status")),
-        _raise_on_transport_error(client.get(f"{settings.vehicle_agent_url}/status")),
-        _raise_on_transport_error(client.get(f"{settings.load_agent_url}/status")),
+def _failure_reason(error: BaseException) -> str:
+    if isinstance(error, HTTPException):
+        return f"HTTP {error.status_code}: {error.detail}"
+    return str(error) or type(error).__name__
+
+
+async def fetch_statuses(
+    client: httpx.AsyncClient, agents: Optional[SiteAgents] = None, timeout: Optional[float] = None
+) -> SystemStatus:
+    # An agent that fails or misses ``timeout`` is replaced by its last known
+    # status, flagged in ``stale``; only an agent never seen fails the call.
+    urls = _agent_urls(agents or site_agents())
+    entries, failures = await gather_within(
+        {agent: _fetch_agent_status(client, agent, url) for agent, url in urls.items()}, timeout
     )
-    solar_data, battery_data, vehicle_data, load_data = [response.json() for response in responses]
+    stale = {}
+    for agent, error in failures.items():
+        last_known = status_cache.get(urls[agent])
+        if last_known is None:
+            if isinstance(error, asyncio.TimeoutError):
+                raise HTTPException(status_code=504, detail=f"No status from the {agent} agent: {error}")
+            raise error
+        entries[agent] = last_known
+        stale[agent] = StaleStatus(age_s=last_known.age, reason=_failure_reason(error))
+    # Each reply is validated once when it is stored; a 304 reuses its models.
     return SystemStatus(
-        solar=SolarStatus(**solar_data),
-        battery=BatteryStatus(**battery_data),
-        vehicle=VehicleStatus(**vehicle_data),
-        load=LoadStatus(**load_data),
+        solar=entries["solar"].model(SolarStatus),
+        battery=entries["battery"].model(BatteryStatus),
+        vehicle=entries["vehicle"].model(VehicleStatus),
+        load=entries["load"].model(LoadStatus),
+        stale=stale,
     )
 
 
-async def push_measurements(payload: CoordinationPayload, client: httpx.AsyncClient) -> None:
-    tasks = []
+def _measurement_updates(
+    payload: CoordinationPayload, client: httpx.AsyncClient, agents: SiteAgents
+) -> Dict[str, Awaitable[Dict[str, Any]]]:
+    updates = {}
     if payload.solar:
-        tasks.append(
-            _raise_on_transport_error(
-                client.post(f"{settings.solar_agent_url}/production", json=payload.solar.model_dump())
-            )
+        updates["solar"] = _post_to_agent(
+            client, "solar", agents.solar_agent_url, "/production", payload.solar.model_dump()
         )
     if payload.load:
-        tasks.append(
-            _raise_on_transport_error(
-                client.post(f"{settings.load_agent_url}/update", json=payload.load.model_dump())
-            )
-        )
+        updates["load"] = _post_to_agent(client, "load", agents.load_agent_url, "/update", payload.load.model_dump())
     if payload.battery:
-        tasks.append(
-            _raise_on_transport_error(
-                client.post(f"{settings.battery_agent_url}/update", json=payload.battery.model_dump())
-            )
+        updates["battery"] = _post_to_agent(
+            client, "battery", agents.battery_agent_url, "/update", payload.battery.model_dump()
         )
     if payload.vehicle:
-        tasks.append(
-            _raise_on_transport_error(
-                client.post(f"{settings.vehicle_agent_url}/update", json=payload.vehicle.model_dump())
-            )
+        updates["vehicle"] = _post_to_agent(
+            client, "vehicle", agents.vehicle_agent_url, "/update", payload.vehicle.model_dump()
         )
-    if tasks:
-        await asyncio.gather(*tasks)
+    return updates
+
+
+async def push_measurements(
+    payload: CoordinationPayload,
+    client: httpx.AsyncClient,
+    agents: Optional[SiteAgents] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, BaseException]:
+    # Measurements that could not be delivered (an error, or no reply within
+    # ``timeout``), by agent; each caller decides whether that fails it.
+    _, undelivered = await gather_within(_measurement_updates(payload, client, agents or site_agents()), timeout)
+    return undelivered
+
+
+def _raise_undelivered(undelivered: Dict[str, BaseException]) -> None:
+    if undelivered:
+        raise next(iter(undelivered.values()))
+
+
+# Forecast series each agent's /forecast provides, by agent.
+AGENT_FORECAST_SERIES = {"solar": ("production_kw",), "load": ("critical_load_kw", "flexible_load_kw")}
+
+
+async def fetch_forecast(
+    forecast: Optional[HorizonForecast],
+    client: httpx.AsyncClient,
+    agents: SiteAgents,
+    horizon: int,
+    timeout: Optional[float] = None,
+) -> HorizonForecast:
+    # ``forecast`` with the series it leaves out taken from the agents' own
+    # forecasts over ``horizon`` planning steps. A series whose agent fails or
+    # misses ``timeout`` stays out, and the planner falls back to persistence.
+    forecast = forecast or HorizonForecast()
+    urls = _agent_urls(agents)
+    params = {"horizon": horizon, "step": settings.mpc_step_hours * 3600}
+
+    def request(url: str) -> Callable[[], Awaitable[httpx.Response]]:
+        return lambda: client.get(f"{url}/forecast", params=params)
+
+    calls = {
+        agent: _call_agent(agent, urls[agent], "forecast", request(urls[agent]))
+        for agent, fields in AGENT_FORECAST_SERIES.items()
+        if any(getattr(forecast, field) is None for field in fields)
+    }
+    replies, _ = await gather_within(calls, timeout)
+    update = {}
+    for agent, reply in replies.items():
+        try:
+            series = orjson.loads(reply.content)["series"]
+        except (ValueError, KeyError, TypeError):
+            agent_errors.labels(agent, "forecast", "bad_forecast").inc()
+            continue
+        for field in AGENT_FORECAST_SERIES[agent]:
+            if getattr(forecast, field) is None and field in series:
+                update[field] = series[field]["values"]
+    return forecast.model_copy(update=update) if update else forecast
 
 
 @app.get("/health")
@@ -209,138 +530,441 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+async def _status_body(client: httpx.AsyncClient) -> str:
+    # Built from validated models already; skip the response_model round trip.
+    system_status = await fetch_statuses(client, timeout=settings.coordinate_deadline or None)
+    return system_status.model_dump_json()
+
+
 @app.get("/status", response_model=SystemStatus)
-async def get_status(_: str = Depends(require_api_key)) -> SystemStatus:
-    async with httpx.AsyncClient(
-        timeout=settings.http_timeout, headers={API_KEY_HEADER_NAME: settings.api_key}
-    ) as client:
-        return await fetch_statuses(client)
+async def get_status(
+    request: Request, _: str = Depends(require_api_key), client: httpx.AsyncClient = Depends(get_http_client)
+) -> Response:
+    if settings.single_flight:
+        # Concurrent calls share one fan-out to the agents.
+        body, shared = await request.app.state.status_flight.do("status", lambda: _status_body(client))
+        if shared:
+            coalesced_requests.labels("status").inc()
+    else:
+        body = await _status_body(client)
+    return Response(content=body, media_type="application/json")
+
+
+async def _command_battery(
+    client: httpx.AsyncClient, agents: SiteAgents, mode: BatteryMode, power_kw: float
+) -> BatteryStatus:
+    entry = await _post_to_agent(
+        client, "battery", agents.battery_agent_url, "/control", {"mode": mode.value, "power_kw": power_kw}
+    )
+    return entry.model(BatteryStatus)
+
+
+async def _command_vehicle(
+    client: httpx.AsyncClient, agents: SiteAgents, mode: VehicleMode, power_kw: float
+) -> VehicleStatus:
+    entry = await _post_to_agent(
+        client, "vehicle", agents.vehicle_agent_url, "/control", {"mode": mode.value, "power_kw": power_kw}
+    )
+    return entry.model(VehicleStatus)
+
+
+async def _command_shed(client: httpx.AsyncClient, agents: SiteAgents, shed_kw: float) -> LoadStatus:
+    entry = await _post_to_agent(client, "load", agents.load_agent_url, "/shed", {"shed_kw": shed_kw})
+    return entry.model(LoadStatus)
+
+
+async def execute_plan(
+    plan: CoordinationActions,
+    status: SystemStatus,
+    client: httpx.AsyncClient,
+    agents: Optional[SiteAgents] = None,
+) -> CoordinateResponse:
+    agents = agents or site_agents()
+    actions = plan.model_copy(deep=True)
+
+    if plan.battery.mode != BatteryMode.idle:
+        updated_battery = await _command_battery(
+            client, agents, plan.battery.mode, plan.battery.requested_power_kw
+        )
+        status = status.copy(update={"battery": updated_battery})
+        actions.battery = BatteryAction(
+            mode=updated_battery.mode,
+            requested_power_kw=plan.battery.requested_power_kw,
+            applied_power_kw=updated_battery.power_kw,
+        )
+
+    if plan.vehicle.mode != VehicleMode.idle:
+        updated_vehicle = await _command_vehicle(
+            client, agents, plan.vehicle.mode, plan.vehicle.requested_power_kw
+        )
+        status = status.copy(update={"vehicle": updated_vehicle})
+        actions.vehicle = VehicleAction(
+            mode=updated_vehicle.mode,
+            requested_power_kw=plan.vehicle.requested_power_kw,
+            applied_power_kw=updated_vehicle.power_kw,
+        )
+
+    if plan.load.shed_target_kw != status.load.shed_kw:
+        status = status.copy(update={"load": await _command_shed(client, agents, plan.load.shed_target_kw)})
+
+    return CoordinateResponse(actions=actions, status=status)
+
+
+_RECONCILIATION_TOLERANCE_KW = 1e-9
+
+
+async def execute_plan_concurrently(
+    plan: CoordinationActions,
+    status: SystemStatus,
+    client: httpx.AsyncClient,
+    agents: Optional[SiteAgents] = None,
+) -> CoordinateResponse:
+    agents = agents or site_agents()
+    surplus = status.solar.production_kw - status.load.total_consumption_kw > 0
+    battery_direction = BatteryMode.charge if surplus else BatteryMode.discharge
+    vehicle_direction = VehicleMode.charge if surplus else VehicleMode.discharge
+    initial_shed = status.load.shed_kw
+
+    battery_power = plan.battery.requested_power_kw if plan.battery.mode != BatteryMode.idle else 0.0
+    vehicle_power = plan.vehicle.requested_power_kw if plan.vehicle.mode != VehicleMode.idle else 0.0
+    shed_target = plan.load.shed_target_kw
+    planned_total = battery_power + vehicle_power + (shed_target - initial_shed)
+    applied_battery = 0.0
+    applied_vehicle = 0.0
+    battery_saturated = False
+    vehicle_saturated = False
+    passes = 0
+
+    while True:
+        commands = {}
+        if battery_power > 0:
+            commands["battery"] = _command_battery(client, agents, battery_direction, battery_power)
+        if vehicle_power > 0:
+            commands["vehicle"] = _command_vehicle(client, agents, vehicle_direction, vehicle_power)
+        if shed_target != status.load.shed_kw:
+            commands["load"] = _command_shed(client, agents, shed_target)
+        results = dict(zip(commands, await asyncio.gather(*commands.values())))
+        status = status.copy(update=results)
+        if "battery" in results:
+            applied_battery += results["battery"].power_kw
+            battery_saturated = results["battery"].power_kw < battery_power
+        if "vehicle" in results:
+            applied_vehicle += results["vehicle"].power_kw
+            vehicle_saturated = results["vehicle"].power_kw < vehicle_power
+
+        residual = planned_total - applied_battery - applied_vehicle - (status.load.shed_kw - initial_shed)
+        if residual <= _RECONCILIATION_TOLERANCE_KW or passes >= settings.dispatch_reconciliation_passes:
+            break
+
+        # Reconciliation: hand the shortfall to whatever still has headroom within
+        # this cycle's rate limits, in the planner's battery -> vehicle -> shed order.
+        # An agent that applied less than it was asked is not asked again.
+        battery, vehicle = status.battery, status.vehicle
+        if surplus:
+            battery_headroom = min(
+                battery.max_charge_rate_kw - applied_battery, battery.capacity_kwh - battery.state_of_charge_kwh
+            )
+            vehicle_headroom = min(
+                vehicle.max_charge_rate_kw - applied_vehicle, vehicle.capacity_kwh - vehicle.state_of_charge_kwh
+            )
+            shed_headroom = 0.0
+        else:
+            battery_headroom = min(
+                battery.max_discharge_rate_kw - applied_battery,
+                battery.state_of_charge_kwh - battery.min_state_of_charge_kwh,
+            )
+            vehicle_headroom = min(vehicle.max_discharge_rate_kw - applied_vehicle, vehicle.state_of_charge_kwh)
+            shed_headroom = status.load.flexible_load_kw - status.load.shed_kw
+        if battery_saturated:
+            battery_headroom = 0.0
+        if vehicle_saturated or not vehicle.connected:
+            vehicle_headroom = 0.0
+
+        battery_power = min(residual, max(battery_headroom, 0.0))
+        residual -= battery_power
+        vehicle_power = min(residual, max(vehicle_headroom, 0.0))
+        residual -= vehicle_power
+        shed_target = status.load.shed_kw + min(residual, max(shed_headroom, 0.0))
+        if battery_power <= 0 and vehicle_power <= 0 and shed_target == status.load.shed_kw:
+            break
+        passes += 1
+
+    actions = CoordinationActions(
+        battery=BatteryAction(
+            mode=battery_direction if applied_battery > 0 else plan.battery.mode,
+            requested_power_kw=plan.battery.requested_power_kw,
+            applied_power_kw=applied_battery,
+        ),
+        vehicle=VehicleAction(
+            mode=vehicle_direction if applied_vehicle > 0 else plan.vehicle.mode,
+            requested_power_kw=plan.vehicle.requested_power_kw,
+            applied_power_kw=applied_vehicle,
+        ),
+        load=LoadAction(shed_target_kw=status.load.shed_kw),
+    )
+    report = DispatchReport(
+        mode=DispatchMode.concurrent,
+        reconciliation_passes=passes,
+        planned_battery_kw=plan.battery.requested_power_kw,
+        applied_battery_kw=applied_battery,
+        planned_vehicle_kw=plan.vehicle.requested_power_kw,
+        applied_vehicle_kw=applied_vehicle,
+        planned_shed_kw=plan.load.shed_target_kw - initial_shed,
+        applied_shed_kw=status.load.shed_kw - initial_shed,
+        unbalanced_kw=max(residual, 0.0),
+    )
+    return CoordinateResponse(actions=actions, status=status, dispatch=report)
+
+
+async def run_coordination_cycle(
+    payload: CoordinationPayload, client: httpx.AsyncClient, merged_requests: int = 1
+) -> CoordinateResponse:
+    # Each phase gets a share of the cycle deadline. Measurements that could not
+    # be delivered and agents that did not answer in time are reported in
+    # ``status.stale``; the plan then uses their last known status.
+    deadline = Deadline(settings.coordinate_deadline)
+    agents = site_agents()
+    with phase_duration.labels("push_measurements").time():
+        undelivered = await push_measurements(payload, client, agents, deadline.budget("push_measurements"))
+    forecast = payload.forecast
+    with phase_duration.labels("fetch_statuses").time():
+        budget = deadline.budget("fetch_statuses")
+        if mpc_planner is not None and settings.mpc_agent_forecasts:
+            status, forecast = await asyncio.gather(
+                fetch_statuses(client, agents, budget),
+                fetch_forecast(forecast, client, agents, mpc_planner.horizon, budget),
+            )
+        else:
+            status = await fetch_statuses(client, agents, budget)
+    for agent, error in undelivered.items():
+        if agent not in status.stale:
+            last_known = status_cache.get(_agent_urls(agents)[agent])
+            status.stale[agent] = StaleStatus(
+                age_s=last_known.age if last_known is not None else 0.0,
+                reason=f"measurement not delivered: {_failure_reason(error)}",
+            )
+    schedule = None
+    with phase_duration.labels("plan").time():
+        if mpc_planner is not None:
+            # Tens of milliseconds of NumPy at worst: off the event loop.
+            plan, schedule = await run_in_threadpool(mpc_planner.plan, status, forecast)
+        else:
+            plan = plan_actions(status)
+    # The concurrent executor reconciles in the greedy planner's directions, so
+    # horizon plans, which may charge during a deficit, run sequentially.
+    execute = execute_plan
+    if settings.dispatch_mode == DispatchMode.concurrent and mpc_planner is None:
+        execute = execute_plan_concurrently
+    with phase_duration.labels("execute").time():
+        try:
+            response = await asyncio.wait_for(execute(plan, status, client, agents), deadline.budget("execute"))
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Coordination deadline exceeded while executing the plan")
+    response.schedule = schedule
+    response.merged_requests = merged_requests
+    if merged_requests > 1:
+        coalesced_requests.labels("coordinate").inc(merged_requests - 1)
+    return response
 
 
 @app.post("/coordinate", response_model=CoordinateResponse)
-async def coordinate(payload: CoordinationPayload, _: str = Depends(require_api_key)) -> CoordinateResponse:
-    async with httpx.AsyncClient(
-        timeout=settings.http_timeout, headers={API_KEY_HEADER_NAME: settings.api_key}
-    ) as client:
-        await push_measurements(payload, client)
-        status = await fetch_statuses(client)
-
-        actions = CoordinationActions(
+async def coordinate(
+    payload: CoordinationPayload,
+    request: Request,
+    _: str = Depends(require_api_key),
+    client: httpx.AsyncClient = Depends(get_http_client),
+) -> CoordinateResponse:
+    if settings.single_flight:
+        # One cycle at a time; calls arriving meanwhile are merged into the next one.
+        return await request.app.state.coordination_queue.submit(payload)
+    return await run_coordination_cycle(payload, client)
+
+
+def _site_columns(statuses: List[SystemStatus]) -> dispatch.SiteColumns:
+    count = len(statuses)
+
+    def column(getter, dtype=float):
+        return np.fromiter((getter(item) for item in statuses), dtype=dtype, count=count)
+
+    return dispatch.SiteColumns(
+        production_kw=column(lambda s: s.solar.production_kw),
+        consumption_kw=column(lambda s: s.load.total_consumption_kw),
+        battery_capacity_kwh=column(lambda s: s.battery.capacity_kwh),
+        battery_soc_kwh=column(lambda s: s.battery.state_of_charge_kwh),
+        battery_min_soc_kwh=column(lambda s: s.battery.min_state_of_charge_kwh),
+        battery_max_charge_kw=column(lambda s: s.battery.max_charge_rate_kw),
+        battery_max_discharge_kw=column(lambda s: s.battery.max_discharge_rate_kw),
+        vehicle_connected=column(lambda s: s.vehicle.connected, dtype=bool),
+        vehicle_capacity_kwh=column(lambda s: s.vehicle.capacity_kwh),
+        vehicle_soc_kwh=column(lambda s: s.vehicle.state_of_charge_kwh),
+        vehicle_max_charge_kw=column(lambda s: s.vehicle.max_charge_rate_kw),
+        vehicle_max_discharge_kw=column(lambda s: s.vehicle.max_discharge_rate_kw),
+        flexible_load_kw=column(lambda s: s.load.flexible_load_kw),
+        shed_kw=column(lambda s: s.load.shed_kw),
+    )
+
+
+_BATTERY_MODES = {
+    dispatch.MODE_IDLE: BatteryMode.idle,
+    dispatch.MODE_CHARGE: BatteryMode.charge,
+    dispatch.MODE_DISCHARGE: BatteryMode.discharge,
+}
+_VEHICLE_MODES = {
+    dispatch.MODE_IDLE: VehicleMode.idle,
+    dispatch.MODE_CHARGE: VehicleMode.charge,
+    dispatch.MODE_DISCHARGE: VehicleMode.discharge,
+}
+
+
+@app.post("/coordinate/batch", response_model=BatchCoordinateResponse)
+async def coordinate_batch(
+    payload: BatchCoordinationPayload,
+    _: str = Depends(require_api_key),
+    client: httpx.AsyncClient = Depends(get_http_client),
+) -> BatchCoordinateResponse:
+    site_ids = list(payload.sites)
+    agents = [site_agents(site_id) for site_id in site_ids]
+
+    for undelivered in await asyncio.gather(
+        *(push_measurements(payload.sites[site_id], client, site) for site_id, site in zip(site_ids, agents))
+    ):
+        _raise_undelivered(undelivered)
+    statuses = list(await asyncio.gather(*(fetch_statuses(client, site) for site in agents)))
+    plan = dispatch.allocate(_site_columns(statuses))
+
+    battery_sites = np.flatnonzero(plan.battery_mode != dispatch.MODE_IDLE).tolist()
+    vehicle_sites = np.flatnonzero(plan.vehicle_mode != dispatch.MODE_IDLE).tolist()
+    shed_sites = np.flatnonzero(plan.shed_changed).tolist()
+    battery_modes = plan.battery_mode.tolist()
+    vehicle_modes = plan.vehicle_mode.tolist()
+    battery_power = plan.battery_power_kw.tolist()
+    vehicle_power = plan.vehicle_power_kw.tolist()
+    shed_target = plan.shed_target_kw.tolist()
+
+    # Commands are grouped per agent kind; every site has at most one command per agent.
+    battery_updates, vehicle_updates, load_updates = await asyncio.gather(
+        asyncio.gather(
+            *(
+                _command_battery(client, agents[index], _BATTERY_MODES[battery_modes[index]], battery_power[index])
+                for index in battery_sites
+            )
+        ),
+        asyncio.gather(
+            *(
+                _command_vehicle(client, agents[index], _VEHICLE_MODES[vehicle_modes[index]], vehicle_power[index])
+                for index in vehicle_sites
+            )
+        ),
+        asyncio.gather(*(_command_shed(client, agents[index], shed_target[index]) for index in shed_sites)),
+    )
+
+    actions = [
+        CoordinationActions(
             battery=BatteryAction(mode=BatteryMode.idle),
             vehicle=VehicleAction(mode=VehicleMode.idle),
-            load=LoadAction(shed_target_kw=status.load.shed_kw),
+            load=LoadAction(shed_target_kw=shed_target[index]),
+        )
+        for index in range(len(site_ids))
+    ]
+    for index, updated_battery in zip(battery_sites, battery_updates):
+        statuses[index] = statuses[index].copy(update={"battery": updated_battery})
+        actions[index].battery = BatteryAction(
+            mode=updated_battery.mode,
+            requested_power_kw=battery_power[index],
+            applied_power_kw=updated_battery.power_kw,
         )
+    for index, updated_vehicle in zip(vehicle_sites, vehicle_updates):
+        statuses[index] = statuses[index].copy(update={"vehicle": updated_vehicle})
+        actions[index].vehicle = VehicleAction(
+            mode=updated_vehicle.mode,
+            requested_power_kw=vehicle_power[index],
+            applied_power_kw=updated_vehicle.power_kw,
+        )
+    for index, updated_load in zip(shed_sites, load_updates):
+        statuses[index] = statuses[index].copy(update={"load": updated_load})
+
+    return BatchCoordinateResponse(
+        sites={
+            site_id: CoordinateResponse(actions=actions[index], status=statuses[index])
+            for index, site_id in enumerate(site_ids)
+        }
+    )
 
-        net_power = status.solar.production_kw - status.load.total_consumption_kw
-
-        # Surplus scenario: charge battery then vehicle
-        if net_power > 0:
-            battery_capacity_room = max(status.battery.capacity_kwh - status.battery.state_of_charge_kwh, 0.0)
-            if battery_capacity_room > 0:
-                requested = min(net_power, status.battery.max_charge_rate_kw, battery_capacity_room)
-                if requested > 0:
-                    response = await _raise_on_transport_error(
-                        client.post(
-                            f"{settings.battery_agent_url}/control",
-                            json={"mode": BatteryMode.charge.value, "power_kw": requested},
-                        )
-                    )
-                    updated_battery = BatteryStatus(**response.json())
-                    status = status.copy(update={"battery": updated_battery})
-                    actions.battery = BatteryAction(
-                        mode=updated_battery.mode,
-                        requested_power_kw=requested,
-                        applied_power_kw=updated_battery.power_kw,
-                    )
-                    net_power -= updated_battery.power_kw
-
-            if net_power > 0 and status.vehicle.connected:
-                vehicle_capacity_room = max(status.vehicle.capacity_kwh - status.vehicle.state_of_charge_kwh, 0.0)
-                if vehicle_capacity_room > 0:
-                    requested = min(net_power, status.vehicle.max_charge_rate_kw, vehicle_capacity_room)
-                    if requested > 0:
-                        response = await _raise_on_transport_error(
-                            client.post(
-                                f"{settings.vehicle_agent_url}/control",
-                                json={"mode": VehicleMode.charge.value, "power_kw": requested},
-                            )
-                        )
-                        updated_vehicle = VehicleStatus(**response.json())
-                        status = status.copy(update={"vehicle": updated_vehicle})
-                        actions.vehicle = VehicleAction(
-                            mode=updated_vehicle.mode,
-                            requested_power_kw=requested,
-                            applied_power_kw=updated_vehicle.power_kw,
-                        )
-                    net_power -= updated_vehicle.power_kw
-
-        # Deficit scenario: discharge battery then vehicle, then shed load
-        if net_power < 0:
-            deficit = -net_power
-            available_battery = max(
-                status.battery.state_of_charge_kwh - status.battery.min_state_of_charge_kwh,
-                0.0,
-            )
-            if available_battery > 0:
-                requested = min(deficit, status.battery.max_discharge_rate_kw, available_battery)
-                if requested > 0:
-                    response = await _raise_on_transport_error(
-                        client.post(
-                            f"{settings.battery_agent_url}/control",
-                            json={"mode": BatteryMode.discharge.value, "power_kw": requested},
-                        )
-                    )
-                    updated_battery = BatteryStatus(**response.json())
-                    status = status.copy(update={"battery": updated_battery})
-                    actions.battery = BatteryAction(
-                        mode=updated_battery.mode,
-                        requested_power_kw=requested,
-                        applied_power_kw=updated_battery.power_kw,
-                    )
-                    deficit = max(deficit - updated_battery.power_kw, 0.0)
-                    net_power = -deficit
-
-            if deficit > 0 and status.vehicle.connected and status.vehicle.state_of_charge_kwh > 0:
-                available_vehicle = status.vehicle.state_of_charge_kwh
-                requested = min(deficit, status.vehicle.max_discharge_rate_kw, available_vehicle)
-                if requested > 0:
-                    response = await _raise_on_transport_error(
-                        client.post(
-                            f"{settings.vehicle_agent_url}/control",
-                            json={"mode": VehicleMode.discharge.value, "power_kw": requested},
-                        )
-                    )
-                    updated_vehicle = VehicleStatus(**response.json())
-                    status = status.copy(update={"vehicle": updated_vehicle})
-                    actions.vehicle = VehicleAction(
-                        mode=updated_vehicle.mode,
-                        requested_power_kw=requested,
-                        applied_power_kw=updated_vehicle.power_kw,
-                    )
-                    deficit = max(deficit - updated_vehicle.power_kw, 0.0)
-                    net_power = -deficit
-
-            if deficit > 0:
-                current_shed = status.load.shed_kw
-                max_additional = max(status.load.flexible_load_kw - current_shed, 0.0)
-                additional = min(deficit, max_additional)
-                target = current_shed + additional
-                if target != current_shed:
-                    response = await _raise_on_transport_error(
-                        client.post(
-                            f"{settings.load_agent_url}/shed",
-                            json={"shed_kw": target},
-                        )
-                    )
-                    updated_load = LoadStatus(**response.json())
-                    status = status.copy(update={"load": updated_load})
-                    actions.load = LoadAction(shed_target_kw=target)
-                else:
-                    actions.load = LoadAction(shed_target_kw=current_shed)
-            else:
-                actions.load = LoadAction(shed_target_kw=status.load.shed_kw)
-
-        return CoordinateResponse(actions=actions, status=status)
+
+def _parse_reading(line: bytes | str) -> MeasurementReading:
+    reading = MeasurementReading.model_validate_json(line)
+    if reading.site_id != DEFAULT_SITE_ID and reading.site_id not in settings.sites:
+        raise ValueError(f"Unknown site '{reading.site_id}'")
+    return reading
+
+
+@app.post("/ingest", response_model=IngestSummary)
+async def ingest(request: Request, _: str = Depends(require_api_key)) -> IngestSummary:
+    # The body is read line by line while it arrives; while the ingest queue is
+    # full no more of it is read, which pushes back on the sender.
+    ingestor: MeasurementIngestor = request.app.state.ingestor
+    summary = IngestSummary(accepted=0, rejected=0)
+    line_number = 0
+    async for line in ndjson_lines(request.stream()):
+        line_number += 1
+        try:
+            reading = _parse_reading(line)
+        except ValueError as exc:
+            summary.rejected += 1
+            if len(summary.errors) < 10:
+                summary.errors.append(f"line {line_number}: {exc}")
+            continue
+        await ingestor.offer(reading.site_id, reading)
+        summary.accepted += 1
+    return summary
+
+
+@app.websocket("/ingest/ws")
+async def ingest_websocket(websocket: WebSocket) -> None:
+    if websocket.headers.get(API_KEY_HEADER_NAME) != settings.api_key:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    ingestor: MeasurementIngestor = websocket.app.state.ingestor
+    try:
+        while True:
+            message = await websocket.receive_text()
+            for line in message.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    reading = _parse_reading(line)
+                except ValueError as exc:
+                    await websocket.send_json({"error": str(exc)})
+                    continue
+                await ingestor.offer(reading.site_id, reading)
+    except WebSocketDisconnect:
+        return
+
+
+@app.get("/ingest/stats", response_model=IngestStats)
+def ingest_stats(request: Request, _: str = Depends(require_api_key)) -> IngestStats:
+    return request.app.state.ingestor.stats()
+
+
+@app.get("/control-loop", response_model=ControlLoopStats)
+def control_loop_stats(request: Request, _: str = Depends(require_api_key)) -> ControlLoopStats:
+    return request.app.state.control_loop.stats()
+
+
+@app.post("/control-loop", response_model=ControlLoopStats)
+async def update_control_loop(
+    update: ControlLoopUpdate, request: Request, _: str = Depends(require_api_key)
+) -> ControlLoopStats:
+    """Start, stop or retune the control loop; omitted fields are left as they are."""
+    control_loop = request.app.state.control_loop
+    if update.tick_rate_hz is not None:
+        control_loop.retune(update.tick_rate_hz)
+    if update.running is True:
+        control_loop.start()
+    elif update.running is False:
+        await control_loop.stop()
+    return control_loop.stats()
 
 
 __all__ = ["app"]
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class SolarMeasurement(BaseModel):
+    production_kw: float = Field(..., ge=0)
+
+
+class LoadMeasurement(BaseModel):
+    critical_load_kw: float = Field(..., ge=0)
+    flexible_load_kw: float = Field(..., ge=0)
+
+
+class BatteryMeasurement(BaseModel):
+    state_of_charge_kwh: float = Field(..., ge=0)
+    capacity_kwh: Optional[float] = Field(None, gt=0)
+
+
+class VehicleMeasurement(BaseModel):
+    connected: Optional[bool] = None
+    state_of_charge_kwh: float = Field(..., ge=0)
+    capacity_kwh: Optional[float] = Field(None, gt=0)
+
+
+class HorizonForecast(BaseModel):
+    # One value per planning step, starting with the current one. Used by
+    # PLANNER_MODE=mpc; a missing series is taken as constant at the current reading.
+    production_kw: Optional[List[float]] = None
+    critical_load_kw: Optional[List[float]] = None
+    flexible_load_kw: Optional[List[float]] = None
+    vehicle_connected: Optional[List[bool]] = None
+
+
+class CoordinationPayload(BaseModel):
+    solar: Optional[SolarMeasurement] = None
+    load: Optional[LoadMeasurement] = None
+    battery: Optional[BatteryMeasurement] = None
+    vehicle: Optional[VehicleMeasurement] = None
+    forecast: Optional[HorizonForecast] = None
+
+
+class BatteryMode(str, Enum):
+    charge = "charge"
+    discharge = "discharge"
+    idle = "idle"
+
+
+class VehicleMode(str, Enum):
+    charge = "charge"
+    discharge = "discharge"
+    idle = "idle"
+
+
+class SolarStatus(BaseModel):
+    production_kw: float
+
+
+class BatteryStatus(BaseModel):
+    capacity_kwh: float
+    state_of_charge_kwh: float
+    min_state_of_charge_kwh: float
+    max_charge_rate_kw: float
+    max_discharge_rate_kw: float
+    mode: BatteryMode
+    power_kw: float
+
+
+class VehicleStatus(BaseModel):
+    connected: bool
+    capacity_kwh: float
+    state_of_charge_kwh: float
+    max_charge_rate_kw: float
+    max_discharge_rate_kw: float
+    mode: VehicleMode
+    power_kw: float
+
+
+class LoadStatus(BaseModel):
+    critical_load_kw: float
+    flexible_load_kw: float
+    shed_kw: float
+    total_nominal_load_kw: float
+    total_consumption_kw: float
+
+
+class StaleStatus(BaseModel):
+    age_s: float
+    reason: str
+
+
+class SystemStatus(BaseModel):
+    solar: SolarStatus
+    battery: BatteryStatus
+    vehicle: VehicleStatus
+    load: LoadStatus
+    # Agents whose status is the last known one instead of a current reply.
+    stale: Dict[str, StaleStatus] = Field(default_factory=dict)
+
+
+class BatteryAction(BaseModel):
+    mode: BatteryMode = BatteryMode.idle
+    requested_power_kw: float = 0.0
+    applied_power_kw: float = 0.0
+
+
+class VehicleAction(BaseModel):
+    mode: VehicleMode = VehicleMode.idle
+    requested_power_kw: float = 0.0
+    applied_power_kw: float = 0.0
+
+
+class LoadAction(BaseModel):
+    shed_target_kw: float = 0.0
+
+
+class CoordinationActions(BaseModel):
+    battery: BatteryAction
+    vehicle: VehicleAction
+    load: LoadAction
+
+
+class DispatchMode(str, Enum):
+    sequential = "sequential"
+    concurrent = "concurrent"
+
+
+class PlannerMode(str, Enum):
+    greedy = "greedy"
+    mpc = "mpc"
+
+
+class AgentWireFormat(str, Enum):
+    # Encoding central asks the agents for; agents answer JSON unless asked otherwise.
+    json = "json"
+    slots = "slots"
+
+
+class Schedule(BaseModel):
+    # Horizon plan of the mpc planner; /coordinate executes its first step, or
+    # the greedy plan (``fallback``) when the solve hit its bound unconverged.
+    step_hours: float
+    iterations: int
+    converged: bool
+    fallback: bool = False
+    solve_ms: float
+    battery_kw: List[float]
+    vehicle_kw: List[float]
+    shed_kw: List[float]
+    unserved_kw: List[float]
+
+
+class DispatchReport(BaseModel):
+    mode: DispatchMode
+    reconciliation_passes: int = 0
+    planned_battery_kw: float = 0.0
+    applied_battery_kw: float = 0.0
+    planned_vehicle_kw: float = 0.0
+    applied_vehicle_kw: float = 0.0
+    planned_shed_kw: float = 0.0
+    applied_shed_kw: float = 0.0
+    unbalanced_kw: float = 0.0
+
+
+class CoordinateResponse(BaseModel):
+    actions: CoordinationActions
+    status: SystemStatus
+    dispatch: Optional[DispatchReport] = None
+    schedule: Optional[Schedule] = None
+    merged_requests: int = Field(1, description="/coordinate calls merged into this cycle")
+
+
+class BatchCoordinationPayload(BaseModel):
+    sites: Dict[str, CoordinationPayload]
+
+
+class BatchCoordinateResponse(BaseModel):
+    sites: Dict[str, CoordinateResponse]
+
+
+class MeasurementReading(CoordinationPayload):
+    # One line of the /ingest stream: any subset of the measurements of one site.
+    site_id: str = "default"
+
+
+class IngestSummary(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[str] = Field(default_factory=list)
+
+
+class IngestStats(BaseModel):
+    received: int
+    coalesced: int
+    pushed: int
+    batches: int
+    push_errors: int
+    queue_depth: int
+    queue_size: int
+    pending_sources: int
+    flush_rate_hz: float
+
+
+class TickTimings(BaseModel):
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+class ControlLoopStats(BaseModel):
+    running: bool
+    tick_rate_hz: float
+    ticks: int
+    skipped_ticks: int
+    errors: int
+    last_tick_at: Optional[datetime]
+    duration: Optional[TickTimings] = Field(None, description="Over the most recent ticks")
+    lateness: Optional[TickTimings] = Field(None, description="Start of each tick after its due time")
+
+
+class ControlLoopUpdate(BaseModel):
+    running: Optional[bool] = None
+    tick_rate_hz: Optional[float] = Field(None, gt=0, le=1000)
+
+
+__all__ = [
+    "AgentWireFormat",
+    "BatchCoordinateResponse",
+    "BatchCoordinationPayload",
+    "BatteryAction",
+    "BatteryMeasurement",
+    "BatteryMode",
+    "BatteryStatus",
+    "ControlLoopStats",
+    "ControlLoopUpdate",
+    "CoordinateResponse",
+    "CoordinationActions",
+    "CoordinationPayload",
+    "DispatchMode",
+    "DispatchReport",
+    "HorizonForecast",
+    "IngestStats",
+    "IngestSummary",
+    "LoadAction",
+    "LoadMeasurement",
+    "LoadStatus",
+    "MeasurementReading",
+    "PlannerMode",
+    "Schedule",
+    "SolarMeasurement",
+    "SolarStatus",
+    "StaleStatus",
+    "SystemStatus",
+    "TickTimings",
+    "VehicleAction",
+    "VehicleMeasurement",
+    "VehicleMode",
+    "VehicleStatus",
+]
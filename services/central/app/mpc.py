@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.central.app.models import (
+    BatteryAction,
+    BatteryMode,
+    CoordinationActions,
+    HorizonForecast,
+    LoadAction,
+    Schedule,
+    SystemStatus,
+    VehicleAction,
+    VehicleMode,
+)
+from services.central.app.planner import plan_actions
+
+# Decision variables per step, in the order of the blocks of the solution vector:
+# battery and vehicle energy stored since the start of the horizon, at the end
+# of the step (in kW x steps, so that a first difference is a power in kW), shed
+# load and unserved demand. Surplus that is neither stored nor consumed is
+# implied by the balance row: ``shed + unserved - battery_kw - vehicle_kw -
+# net_demand >= 0``. The other rows bound the battery and vehicle power, then
+# each variable.
+BLOCKS = ("battery_stored", "vehicle_stored", "shed", "unserved")
+# Commands below this power are sent as idle.
+_IDLE_KW = 1e-3
+# Rows with equal bounds (a disconnected vehicle's power, for one) get this many
+# times ``rho``, as OSQP does; at the plain ``rho`` they take thousands of iterations.
+EQUALITY_RHO_SCALE = 1e3
+# Linear systems kept per equality pattern, most recently used last.
+_KKT_CACHE_SIZE = 16
+
+
+class CostWeights(NamedTuple):
+    """Cost per kWh of each outcome; only their ratios matter.
+
+    Unserved demand is the most expensive, then shedding flexible load. Energy
+    left in the storage at the end of the horizon has a value, higher for the
+    vehicle, so surplus goes to the vehicle once the battery holds what the
+    horizon needs. Costs of step ``t`` are scaled by ``discount ** t``: the
+    forecast is less certain further out, and between otherwise equal
+    schedules the one that spends stored energy later wins.
+    """
+
+    unserved: float = 100.0
+    shed: float = 10.0
+    surplus: float = 0.5
+    battery_energy: float = 1.0
+    vehicle_energy: float = 2.0
+    discount: float = 0.995
+    # 0.5 * regularization * kW**2 per hour of battery, vehicle, shed and
+    # unserved power. Makes the problem strictly convex, so ties resolve to the
+    # flattest schedule, and keeps ADMM down to tens of iterations.
+    regularization: float = 1.0
+
+
+class Solution(NamedTuple):
+    battery_kw: np.ndarray
+    vehicle_kw: np.ndarray
+    shed_kw: np.ndarray
+    unserved_kw: np.ndarray
+    surplus_kw: np.ndarray
+    battery_soc_kwh: np.ndarray
+    vehicle_soc_kwh: np.ndarray
+    iterations: int
+    converged: bool
+    solve_seconds: float
+
+
+class HorizonSolver:
+    """ADMM solver (the OSQP iteration) for the dispatch QP over a fixed horizon.
+
+    Minimizes ``0.5 x'Px + q'x`` subject to ``lower <= Ax <= upper``. ``P``,
+    ``q`` and ``A`` depend only on the horizon, the step and the weights, so the
+    linear system of the iteration is inverted once; a solve only changes the
+    bounds. ``A`` is applied through first differences instead of a matrix
+    product. Each solve starts from the previous solution shifted by one step.
+    Rows whose bounds are equal take a larger ``rho``; the system for each such
+    pattern is derived from the base one by a low-rank (Woodbury) update and
+    cached. A solve stops after ``max_iterations`` or ``time_limit`` seconds,
+    unconverged.
+
+    Optimizing the state of charge rather than the power keeps every row of
+    ``A`` short (a power is a difference of two states, while a state would be
+    a sum of up to ``horizon`` powers), which is what lets ADMM converge in tens
+    of iterations.
+    """
+
+    def __init__(
+        self,
+        horizon: int,
+        step_hours: float,
+        weights: CostWeights = CostWeights(),
+        rho: float = 1.0,
+        sigma: float = 1e-6,
+        alpha: float = 1.6,
+        tolerance: float = 0.01,
+        max_iterations: int = 1000,
+        time_limit: Optional[float] = None,
+        check_every: int = 10,
+    ) -> None:
+        self.horizon = horizon
+        self.step_hours = step_hours
+        self.weights = weights
+        self.rho = rho
+        self.sigma = sigma
+        self.alpha = alpha
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+        self.check_every = check_every
+
+        h = horizon
+        discount = weights.discount ** np.arange(h) * step_hours
+        # The surplus cost is spread over the variables that make up the surplus;
+        # a power is a difference of states, so the state at step t gets the
+        # surplus weight of step t minus that of step t + 1. The last states also
+        # carry the terminal value of the stored energy.
+        storage_surplus = -weights.surplus * (discount - np.append(discount[1:], 0.0))
+        self._q = np.concatenate(
+            [
+                storage_surplus,
+                storage_surplus,
+                (weights.shed + weights.surplus) * discount,
+                (weights.unserved + weights.surplus) * discount,
+            ]
+        )
+        self._q[h - 1] -= weights.battery_energy * discount[-1]
+        self._q[2 * h - 1] -= weights.vehicle_energy * discount[-1]
+
+        difference = np.eye(h) - np.eye(h, k=-1)
+        identity = np.eye(h)
+        zero = np.zeros((h, h))
+        power_penalty = difference.T @ difference
+        self._p = weights.regularization * step_hours * np.block(
+            [
+                [power_penalty, zero, zero, zero],
+                [zero, power_penalty, zero, zero],
+                [zero, zero, identity, zero],
+                [zero, zero, zero, identity],
+            ]
+        )
+        self._a = np.block(
+            [
+                [-difference, -difference, identity, identity],
+                [difference, zero, zero, zero],
+                [zero, difference, zero, zero],
+                [np.eye(len(BLOCKS) * h)],
+            ]
+        )
+        self._solve_kkt = np.linalg.inv(self._p + sigma * np.eye(len(self._q)) + rho * self._a.T @ self._a)
+        self._equality_kkt: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._x: Optional[np.ndarray] = None
+        self._y: Optional[np.ndarray] = None
+
+    def _apply(self, x: np.ndarray, out: np.ndarray) -> np.ndarray:
+        h = self.horizon
+        storage = x[:2 * h].reshape(2, h)
+        powers = out[h:3 * h].reshape(2, h)
+        powers[:, 0] = storage[:, 0]
+        np.subtract(storage[:, 1:], storage[:, :-1], out=powers[:, 1:])
+        np.subtract(x[2 * h:3 * h] + x[3 * h:], powers[0] + powers[1], out=out[:h])
+        out[3 * h:] = x
+        return out
+
+    def _apply_transposed(self, w: np.ndarray, out: np.ndarray) -> np.ndarray:
+        h = self.horizon
+        balance = w[:h]
+        out[:] = w[3 * h:]
+        powers = w[h:3 * h].reshape(2, h) - balance
+        storage = out[:2 * h].reshape(2, h)
+        storage += powers
+        storage[:, :-1] -= powers[:, 1:]
+        out[2 * h:].reshape(2, h)[:] += balance
+        return out
+
+    def _kkt_inverse(self, equality: np.ndarray) -> np.ndarray:
+        # (P + sigma I + A' R A)^-1, where R is rho times EQUALITY_RHO_SCALE on the
+        # ``equality`` rows: a rank-k update of the inverse without them.
+        if not equality.any():
+            return self._solve_kkt
+        key = np.packbits(equality).tobytes()
+        inverse = self._equality_kkt.get(key)
+        if inverse is not None:
+            self._equality_kkt.move_to_end(key)
+            return inverse
+        rows = self._a[equality]
+        spread = self._solve_kkt @ rows.T
+        capacitance = np.eye(len(rows)) / ((EQUALITY_RHO_SCALE - 1.0) * self.rho) + rows @ spread
+        inverse = self._solve_kkt - spread @ np.linalg.solve(capacitance, spread.T)
+        if len(self._equality_kkt) >= _KKT_CACHE_SIZE:
+            self._equality_kkt.popitem(last=False)
+        self._equality_kkt[key] = inverse
+        return inverse
+
+    def reset(self) -> None:
+        """Forget the warm start; the next solve starts from zero."""
+        self._x = self._y = None
+
+    def _shift(self, vector: np.ndarray) -> np.ndarray:
+        blocks = vector.reshape(-1, self.horizon)
+        return np.concatenate([blocks[:, 1:], blocks[:, -1:]], axis=1).ravel()
+
+    def _shift_solution(self, x: np.ndarray) -> np.ndarray:
+        # The storage blocks count from the start of the horizon, which moves to
+        # the end of the first step.
+        shifted = self._shift(x)
+        shifted[:2 * self.horizon].reshape(2, self.horizon)[:] -= x[:2 * self.horizon:self.horizon, None]
+        return shifted
+
+    def solve(self, lower: np.ndarray, upper: np.ndarray, warm: bool = True) -> Tuple[np.ndarray, int, bool, float]:
+        """Solution projected onto the bounds (``z``), iterations, convergence and seconds taken.
+
+        ``lower`` and ``upper`` bound the rows of ``A``: the balance, the
+        battery and vehicle power, and the box of each variable.
+        """
+        started = time.perf_counter()
+        if not warm or self._x is None:
+            x, y = np.zeros(len(self._q)), np.zeros(len(lower))
+        else:
+            x, y = self._shift_solution(self._x), self._shift(self._y)
+        z = np.clip(self._apply(x, np.empty(len(lower))), lower, upper)
+        p, q, sigma, alpha = self._p, self._q, self.sigma, self.alpha
+        equality = upper - lower <= 1e-9
+        solve_kkt = self._kkt_inverse(equality)
+        rho = np.where(equality, EQUALITY_RHO_SCALE * self.rho, self.rho)
+        # Primal residuals are in kW; the dual one is relative to the largest cost.
+        dual_tolerance = self.tolerance * np.max(np.abs(q))
+        rhs = np.empty(len(x))
+        z_tilde = np.empty(len(z))
+        check = np.empty(len(z))
+        converged = False
+        iterations = 0
+        while iterations < self.max_iterations:
+            iterations += 1
+            self._apply_transposed(rho * z - y, rhs)
+            rhs += sigma * x - q
+            x_tilde = solve_kkt @ rhs
+            self._apply(x_tilde, z_tilde)
+            x = alpha * x_tilde + (1 - alpha) * x
+            z_relaxed = alpha * z_tilde + (1 - alpha) * z
+            z_next = np.clip(z_relaxed + y / rho, lower, upper)
+            y = y + rho * (z_relaxed - z_next)
+            z = z_next
+            if iterations % self.check_every == 0:
+                primal = np.max(np.abs(self._apply(x, check) - z))
+                dual = np.max(np.abs(p @ x + q + self._apply_transposed(y, rhs)))
+                if primal <= self.tolerance and dual <= dual_tolerance:
+                    converged = True
+                    break
+                if self.time_limit is not None and time.perf_counter() - started > self.time_limit:
+                    break
+        self._x, self._y = x, y
+        return z, iterations, converged, time.perf_counter() - started
+
+
+class MPCPlanner:
+    """Rolling-horizon planner: optimizes the whole horizon, then executes its first step.
+
+    Forecast series shorter than the horizon are extended with their last value
+    and missing ones with the current reading (persistence); without a forecast
+    of its connection the vehicle is assumed to stay as it is now. A solve that
+    hits its iteration or time bound is not executed: the greedy rules plan
+    that step instead. Solves are serialized, since each warm-starts the next,
+    and may run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        horizon: int,
+        step_hours: float,
+        weights: CostWeights = CostWeights(),
+        max_iterations: int = 1000,
+        time_limit: Optional[float] = None,
+    ) -> None:
+        self.solver = HorizonSolver(horizon, step_hours, weights, max_iterations=max_iterations, time_limit=time_limit)
+        self._lock = threading.Lock()
+
+    @property
+    def horizon(self) -> int:
+        return self.solver.horizon
+
+    def _series(self, values: Optional[Sequence[float]], current: float) -> np.ndarray:
+        if not values:
+            return np.full(self.horizon, float(current))
+        series = np.asarray(values[: self.horizon], dtype=float)
+        if len(series) < self.horizon:
+            series = np.concatenate([series, np.full(self.horizon - len(series), series[-1])])
+        return np.maximum(series, 0.0)
+
+    def bounds(
+        self, status: SystemStatus, forecast: Optional[HorizonForecast] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        h = self.horizon
+        step = self.solver.step_hours
+        forecast = forecast or HorizonForecast()
+        battery, vehicle, load = status.battery, status.vehicle, status.load
+        production = self._series(forecast.production_kw, status.solar.production_kw)
+        critical = self._series(forecast.critical_load_kw, load.critical_load_kw)
+        flexible = self._series(forecast.flexible_load_kw, load.flexible_load_kw)
+        # The vehicle can only be used while connected, and now only if it is.
+        connected = self._series(forecast.vehicle_connected, vehicle.connected) > 0
+        connected[0] = vehicle.connected
+
+        soc, vehicle_soc = battery.state_of_charge_kwh, vehicle.state_of_charge_kwh
+        lower = np.concatenate(
+            [
+                critical + flexible - production,
+                np.full(h, -battery.max_discharge_rate_kw),
+                np.where(connected, -vehicle.max_discharge_rate_kw, 0.0),
+                np.full(h, min(battery.min_state_of_charge_kwh - soc, 0.0) / step),
+                np.full(h, -vehicle_soc / step),
+                np.zeros(2 * h),
+            ]
+        )
+        upper = np.concatenate(
+            [
+                np.full(h, np.inf),
+                np.full(h, battery.max_charge_rate_kw),
+                np.where(connected, vehicle.max_charge_rate_kw, 0.0),
+                np.full(h, max(battery.capacity_kwh - soc, 0.0) / step),
+                np.full(h, max(vehicle.capacity_kwh - vehicle_soc, 0.0) / step),
+                flexible,
+                np.full(h, np.inf),
+            ]
+        )
+        return lower, upper
+
+    def solve(self, status: SystemStatus, forecast: Optional[HorizonForecast] = None, warm: bool = True) -> Solution:
+        lower, upper = self.bounds(status, forecast)
+        with self._lock:
+            z, iterations, converged, elapsed = self.solver.solve(lower, upper, warm=warm)
+        h = self.horizon
+        step = self.solver.step_hours
+        # z holds the rows projected onto their bounds, so the powers and the
+        # variables read from it respect the rate and capacity limits.
+        battery_kw, vehicle_kw = z[h:3 * h].reshape(2, h)
+        battery_stored, vehicle_stored, shed, unserved = z[3 * h:].reshape(len(BLOCKS), h)
+        return Solution(
+            battery_kw=battery_kw,
+            vehicle_kw=vehicle_kw,
+            shed_kw=shed,
+            unserved_kw=unserved,
+            surplus_kw=np.maximum(z[:h] - lower[:h], 0.0),
+            battery_soc_kwh=status.battery.state_of_charge_kwh + battery_stored * step,
+            vehicle_soc_kwh=status.vehicle.state_of_charge_kwh + vehicle_stored * step,
+            iterations=iterations,
+            converged=converged,
+            solve_seconds=elapsed,
+        )
+
+    def plan(
+        self, status: SystemStatus, forecast: Optional[HorizonForecast] = None
+    ) -> Tuple[CoordinationActions, Schedule]:
+        """Actions for the first step of the optimal schedule, and the schedule itself."""
+        solution = self.solve(status, forecast)
+        schedule = schedule_report(solution, self.solver.step_hours)
+        if not solution.converged:
+            schedule.fallback = True
+            return plan_actions(status), schedule
+        return first_step_actions(status, solution), schedule
+
+
+def first_step_actions(status: SystemStatus, solution: Solution) -> CoordinationActions:
+    vehicle, load = status.vehicle, status.load
+    battery_kw = float(solution.battery_kw[0])
+    vehicle_kw = float(solution.vehicle_kw[0]) if vehicle.connected else 0.0
+    battery_action = BatteryAction()
+    if battery_kw > _IDLE_KW:
+        battery_action = BatteryAction(mode=BatteryMode.charge, requested_power_kw=battery_kw)
+    elif battery_kw < -_IDLE_KW:
+        battery_action = BatteryAction(mode=BatteryMode.discharge, requested_power_kw=-battery_kw)
+    vehicle_action = VehicleAction()
+    if vehicle_kw > _IDLE_KW:
+        vehicle_action = VehicleAction(mode=VehicleMode.charge, requested_power_kw=vehicle_kw)
+    elif vehicle_kw < -_IDLE_KW:
+        vehicle_action = VehicleAction(mode=VehicleMode.discharge, requested_power_kw=-vehicle_kw)
+    shed = min(max(float(solution.shed_kw[0]), 0.0), load.flexible_load_kw)
+    if abs(shed - load.shed_kw) <= _IDLE_KW:
+        shed = load.shed_kw
+    return CoordinationActions(battery=battery_action, vehicle=vehicle_action, load=LoadAction(shed_target_kw=shed))
+
+
+def schedule_report(solution: Solution, step_hours: float) -> Schedule:
+    return Schedule(
+        step_hours=step_hours,
+        iterations=solution.iterations,
+        converged=solution.converged,
+        solve_ms=solution.solve_seconds * 1e3,
+        battery_kw=solution.battery_kw.tolist(),
+        vehicle_kw=solution.vehicle_kw.tolist(),
+        shed_kw=solution.shed_kw.tolist(),
+        unserved_kw=solution.unserved_kw.tolist(),
+    )
+
+
+__all__ = [
+    "BLOCKS",
+    "CostWeights",
+    "HorizonSolver",
+    "MPCPlanner",
+    "Solution",
+    "first_step_actions",
+    "schedule_report",
+]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+from services.central.app.models import (
+    BatteryAction,
+    BatteryMode,
+    CoordinationActions,
+    LoadAction,
+    SystemStatus,
+    VehicleAction,
+    VehicleMode,
+)
+
+
+# (battery mode, battery kW, vehicle mode, vehicle kW, extra kW to shed); the
+# extra shed is None when no deficit is left for the flexible load to cover.
+Decision = Tuple[BatteryMode, float, VehicleMode, float, Optional[float]]
+# The arguments of ``decide``, in order.
+DecisionInputs = Tuple[float, float, float, float, float, float, float, float, float, float, bool]
+
+
+def decision_inputs(status: SystemStatus) -> DecisionInputs:
+    battery = status.battery
+    vehicle = status.vehicle
+    load = status.load
+    battery_soc = battery.state_of_charge_kwh
+    vehicle_soc = vehicle.state_of_charge_kwh
+    return (
+        status.solar.production_kw - load.total_consumption_kw,
+        battery.capacity_kwh - battery_soc,
+        battery_soc - battery.min_state_of_charge_kwh,
+        battery.max_charge_rate_kw,
+        battery.max_discharge_rate_kw,
+        vehicle.capacity_kwh - vehicle_soc,
+        vehicle_soc,
+        vehicle.max_charge_rate_kw,
+        vehicle.max_discharge_rate_kw,
+        load.flexible_load_kw - load.shed_kw,
+        vehicle.connected,
+    )
+
+
+def decide(
+    net_power: float,
+    battery_room: float,
+    battery_available: float,
+    battery_max_charge: float,
+    battery_max_discharge: float,
+    vehicle_room: float,
+    vehicle_soc: float,
+    vehicle_max_charge: float,
+    vehicle_max_discharge: float,
+    shed_headroom: float,
+    vehicle_connected: bool,
+) -> Decision:
+    """The greedy rules on plain floats: surplus charges the battery then the vehicle;
+    deficit discharges the battery, then the vehicle, then sheds flexible load.
+    Room, reserve and headroom may be negative; they only count when positive."""
+    battery_mode, battery_power = BatteryMode.idle, 0.0
+    vehicle_mode, vehicle_power = VehicleMode.idle, 0.0
+    extra_shed: Optional[float] = None
+
+    # Surplus scenario: charge battery then vehicle
+    if net_power > 0:
+        if battery_room > 0:
+            requested = min(net_power, battery_max_charge, battery_room)
+            if requested > 0:
+                battery_mode, battery_power = BatteryMode.charge, requested
+                net_power -= requested
+
+        if net_power > 0 and vehicle_connected and vehicle_room > 0:
+            requested = min(net_power, vehicle_max_charge, vehicle_room)
+            if requested > 0:
+                vehicle_mode, vehicle_power = VehicleMode.charge, requested
+
+    # Deficit scenario: discharge battery then vehicle, then shed load
+    elif net_power < 0:
+        deficit = -net_power
+        if battery_available > 0:
+            requested = min(deficit, battery_max_discharge, battery_available)
+            if requested > 0:
+                battery_mode, battery_power = BatteryMode.discharge, requested
+                deficit = max(deficit - requested, 0.0)
+
+        if deficit > 0 and vehicle_connected and vehicle_soc > 0:
+            requested = min(deficit, vehicle_max_discharge, vehicle_soc)
+            if requested > 0:
+                vehicle_mode, vehicle_power = VehicleMode.discharge, requested
+                deficit = max(deficit - requested, 0.0)
+
+        if deficit > 0:
+            extra_shed = min(deficit, max(shed_headroom, 0.0))
+
+    return battery_mode, battery_power, vehicle_mode, vehicle_power, extra_shed
+
+
+def load_action(extra_shed_kw: Optional[float], status: SystemStatus) -> LoadAction:
+    load = status.load
+    if extra_shed_kw is None:
+        return LoadAction(shed_target_kw=load.shed_kw)
+    # Capped so rounding never asks the load agent for more than its flexible load.
+    return LoadAction(shed_target_kw=min(load.shed_kw + extra_shed_kw, load.flexible_load_kw))
+
+
+def decision_actions(decision: Decision, status: SystemStatus) -> CoordinationActions:
+    battery_mode, battery_power, vehicle_mode, vehicle_power, extra_shed = decision
+    return CoordinationActions(
+        battery=BatteryAction(mode=battery_mode, requested_power_kw=battery_power),
+        vehicle=VehicleAction(mode=vehicle_mode, requested_power_kw=vehicle_power),
+        load=load_action(extra_shed, status),
+    )
+
+
+def plan_actions(status: SystemStatus) -> CoordinationActions:
+    # Pure decision step of /coordinate: no I/O, no mutation of ``status``.
+    # Requested power is what each agent is expected to apply, so the plan
+    # carries applied_power_kw=0 until it is executed. The decision works on
+    # plain floats and the action models are built once at the end.
+    return decision_actions(decide(*decision_inputs(status)), status)
+
+
+__all__ = [
+    "Decision",
+    "DecisionInputs",
+    "decide",
+    "decision_actions",
+    "decision_inputs",
+    "load_action",
+    "plan_actions",
+]
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from enum import Enum
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Share of the remaining cycle deadline each /coordinate phase may use. A phase
+# that finishes early leaves its time to the later ones.
+PHASE_WEIGHTS = {"push_measurements": 1.0, "fetch_statuses": 1.0, "execute": 2.0}
+
+
+class CircuitState(str, Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one agent.
+
+    After ``failure_threshold`` failures in a row calls fail fast for
+    ``reset_timeout`` seconds; then a single probe is let through, which
+    closes the circuit on success and reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.closed
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return CircuitState.open
+        return CircuitState.half_open
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CircuitState.closed:
+            return True
+        if state == CircuitState.open or self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+
+class CircuitBreakers:
+    """One breaker per agent base URL, created on first use."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, agent_url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(agent_url)
+        if breaker is None:
+            breaker = self._breakers[agent_url] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def open_count(self) -> int:
+        return sum(breaker.state != CircuitState.closed for breaker in self._breakers.values())
+
+    def reset(self) -> None:
+        self._breakers.clear()
+
+
+class Deadline:
+    """Time budget of one coordination cycle, split across its phases by ``weights``."""
+
+    def __init__(self, seconds: float, weights: Mapping[str, float] = PHASE_WEIGHTS) -> None:
+        self._expires = time.monotonic() + seconds if seconds > 0 else None
+        self._weights = dict(weights)
+
+    def remaining(self) -> Optional[float]:
+        if self._expires is None:
+            return None
+        return max(self._expires - time.monotonic(), 0.0)
+
+    def budget(self, phase: str) -> Optional[float]:
+        """Seconds ``phase`` may take, or ``None`` without a deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        phases = list(self._weights)
+        later = sum(self._weights[name] for name in phases[phases.index(phase):])
+        return remaining * self._weights[phase] / later
+
+
+async def hedged(attempt: Callable[[], Awaitable[T]], delay: float, on_hedge: Callable[[], None] = lambda: None) -> T:
+    """Run ``attempt``; if it has not finished after ``delay`` seconds, start a second one.
+
+    The first successful result wins and the other attempt is cancelled. Only
+    for idempotent calls. An attempt that fails before ``delay`` is not retried.
+    """
+    if delay <= 0:
+        return await attempt()
+    tasks = [asyncio.ensure_future(attempt())]
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            on_hedge()
+            tasks.append(asyncio.ensure_future(attempt()))
+            pending = set(tasks)
+        while True:
+            if not done:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            failed = None
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                failed = task
+            if not pending:
+                return failed.result()
+            done = set()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def gather_within(
+    calls: Mapping[str, Awaitable[T]], timeout: Optional[float]
+) -> Tuple[Dict[str, T], Dict[str, BaseException]]:
+    """Run ``calls`` concurrently for at most ``timeout`` seconds.
+
+    Returns the results and the failures by key instead of raising; calls
+    still running at the deadline are cancelled and reported as
+    ``asyncio.TimeoutError``.
+    """
+    if not calls:
+        return {}, {}
+    tasks = {key: asyncio.ensure_future(call) for key, call in calls.items()}
+    _, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+    results: Dict[str, T] = {}
+    failures: Dict[str, BaseException] = {}
+    for key, task in tasks.items():
+        if task in pending:
+            failures[key] = asyncio.TimeoutError(f"no reply within {timeout:.3f} s")
+        elif task.exception() is not None:
+            failures[key] = task.exception()
+        else:
+            results[key] = task.result()
+    return results, failures
+
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitBreakers",
+    "CircuitState",
+    "Deadline",
+    "PHASE_WEIGHTS",
+    "gather_within",
+    "hedged",
+]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+from services.central.app.ingest import MEASUREMENT_KINDS
+from services.central.app.models import CoordinationPayload
+
+T = TypeVar("T")
+
+# Payload fields merged across queued /coordinate calls; the latest value of each wins.
+PAYLOAD_FIELDS = (*MEASUREMENT_KINDS, "forecast")
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # Waiters may all have gone away; do not log their result as never retrieved.
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight(Generic[T]):
+    """Share one in-flight call per key between everyone who asks for it meanwhile.
+
+    The call runs as its own task, so a caller that is cancelled (a client
+    that disconnects) does not cancel it for the others. Its result, or its
+    exception, goes to every caller; the next call after it finishes starts
+    a new flight.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """The result of ``call`` and whether it was shared with an earlier caller."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(call())
+            flight.add_done_callback(_retrieve)
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(flight), shared
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.fields: Dict[str, BaseModel] = {}
+        self.requests = 0
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(_retrieve)
+
+    def merge(self, payload: CoordinationPayload) -> None:
+        self.requests += 1
+        for name in PAYLOAD_FIELDS:
+            value = getattr(payload, name)
+            if value is not None:
+                self.fields[name] = value
+
+
+class CoordinationQueue(Generic[T]):
+    """Run coordination cycles one at a time, merging the calls that arrive meanwhile.
+
+    While a cycle runs, new payloads are merged field by field into a single
+    pending one (the latest reading of each source wins) and every caller
+    merged into it gets the result of the cycle that runs it next. There is
+    never more than one cycle in flight, so agents do not receive the
+    commands of two decisions taken on the same state, and a burst of calls
+    costs two cycles at most.
+    """
+
+    def __init__(self, run: Callable[[CoordinationPayload, int], Awaitable[T]]) -> None:
+        self._run = run
+        self._pending: Optional[_Batch] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.requests = 0
+
+    async def submit(self, payload: CoordinationPayload) -> T:
+        self.requests += 1
+        if self._pending is None:
+            self._pending = _Batch()
+        batch = self._pending
+        batch.merge(payload)
+        if self._worker is None:
+            self._worker = asyncio.ensure_future(self._drain())
+        return await asyncio.shield(batch.future)
+
+    async def _drain(self) -> None:
+        batch: Optional[_Batch] = None
+        try:
+            while self._pending is not None:
+                batch, self._pending = self._pending, None
+                self.cycles += 1
+                try:
+                    result = await self._run(CoordinationPayload(**batch.fields), batch.requests)
+                except Exception as error:
+                    batch.future.set_exception(error)
+                else:
+                    batch.future.set_result(result)
+        except asyncio.CancelledError:
+            # Shutting down: callers still waiting are cancelled rather than left hanging.
+            for waiting in (batch, self._pending):
+                if waiting is not None and not waiting.future.done():
+                    waiting.future.cancel()
+            self._pending = None
+            raise
+        finally:
+            self._worker = None
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+
+
+__all__ = ["CoordinationQueue", "PAYLOAD_FIELDS", "SingleFlight"]
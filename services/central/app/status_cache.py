@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def parse_etag(etag: Optional[str]) -> Tuple[Optional[str], int]:
+    """Split an agent ETag ``"<epoch>-<version>"`` into its epoch and state version."""
+    if not etag:
+        return None, -1
+    epoch, _, version = etag.strip('"').rpartition("-")
+    try:
+        return epoch, int(version)
+    except ValueError:
+        return None, -1
+
+
+@dataclass
+class CachedStatus:
+    etag: Optional[str]
+    data: Dict[str, Any]
+    fetched_at: float
+    epoch: Optional[str] = None
+    version: int = -1
+    models: Dict[type, BaseModel] = field(default_factory=dict, repr=False)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def model(self, cls: Type[ModelT]) -> ModelT:
+        """``data`` validated as ``cls``, once per stored reply; revalidated entries keep it."""
+        parsed = self.models.get(cls)
+        if parsed is None:
+            parsed = self.models[cls] = cls.model_validate(self.data)
+        return parsed  # type: ignore[return-value]
+
+
+class StatusCache:
+    """Last status body and ETag seen from each agent, keyed by agent base URL.
+
+    Entries of agents with a connected state stream are kept current by the
+    stream and count as fresh regardless of their age.
+    """
+
+    def __init__(self, max_staleness: float) -> None:
+        self.max_staleness = max_staleness
+        self._entries: Dict[str, CachedStatus] = {}
+        self._live: Set[str] = set()
+
+    def get(self, agent_url: str) -> Optional[CachedStatus]:
+        return self._entries.get(agent_url)
+
+    def fresh(self, agent_url: str) -> Optional[CachedStatus]:
+        entry = self._entries.get(agent_url)
+        if entry is not None and (agent_url in self._live or entry.age <= self.max_staleness):
+            return entry
+        return None
+
+    def store(self, agent_url: str, etag: Optional[str], data: Dict[str, Any]) -> CachedStatus:
+        epoch, version = parse_etag(etag)
+        current = self._entries.get(agent_url)
+        if current is not None and epoch is not None and current.epoch == epoch and current.version > version:
+            # Replies and stream events can arrive out of order; never go back in time.
+            return current
+        entry = CachedStatus(etag=etag, data=data, fetched_at=time.monotonic(), epoch=epoch, version=version)
+        self._entries[agent_url] = entry
+        return entry
+
+    def revalidated(self, agent_url: str) -> CachedStatus:
+        entry = self._entries[agent_url]
+        entry.fetched_at = time.monotonic()
+        return entry
+
+    def set_live(self, agent_url: str, live: bool) -> None:
+        if live:
+            self._live.add(agent_url)
+        else:
+            self._live.discard(agent_url)
+
+    def is_live(self, agent_url: str) -> bool:
+        return agent_url in self._live
+
+    def invalidate(self, agent_url: Optional[str] = None) -> None:
+        if agent_url is None:
+            self._entries.clear()
+            self._live.clear()
+        else:
+            self._entries.pop(agent_url, None)
+            self._live.discard(agent_url)
+
+
+__all__ = ["CachedStatus", "StatusCache", "parse_etag"]
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Literal, Mapping, MutableMapping, Optional, Set, Tuple
+from uuid import uuid4
+
+from fastapi import HTTPException, Request, Response, status
+
+STATE_VERSION_HEADER = "X-State-Version"
+
+StateListener = Callable[[int, Dict[str, Any]], None]
+StateBackend = Literal["memory", "shared"]
+
+
+class AgentState(MutableMapping[str, Any]):
+    """An agent's ``state`` dict plus a version that grows on every committed mutation.
+
+    Handlers mutate the state inside ``transaction()`` and finish with
+    ``commit()``; readers that need a consistent view use ``snapshot()``.
+    The mutating handlers are ``async`` and never await inside a transaction,
+    so the lock is only ever held for the few microseconds of one mutation.
+    """
+
+    def __init__(self, initial: Mapping[str, Any]) -> None:
+        self._data: Dict[str, Any] = dict(initial)
+        self._init_tracking()
+        self._version = 0
+        # Versions restart at 0 with the process, so ETags also carry a per-process
+        # epoch: a client holding an ETag from a previous run never gets a 304.
+        self._epoch = uuid4().hex[:12]
+
+    def _init_tracking(self) -> None:
+        self._dirty: Set[str] = set()
+        self._listeners: List[StateListener] = []
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._data or self._data[key] != value:
+            self._dirty.add(key)
+        self._data[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._data[key]
+        self._dirty.discard(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def epoch(self) -> str:
+        return self._epoch
+
+    def _next_version(self) -> int:
+        self._version += 1
+        return self._version
+
+    def _set_version(self, version: int) -> None:
+        self._version = version
+
+    @contextmanager
+    def transaction(self) -> Iterator["AgentState"]:
+        with self._lock:
+            yield self
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._data)
+
+    def versioned_snapshot(self) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """A copy of the state together with the version headers that describe it."""
+        with self._lock:
+            return dict(self._data), self.version_headers()
+
+    def restore(self, values: Mapping[str, Any], version: int) -> bool:
+        """Load persisted ``values`` at ``version`` unless the state is already that recent."""
+        with self.transaction():
+            if version <= self.version:
+                return False
+            for key, value in values.items():
+                self[key] = value
+            self._dirty.clear()
+            self._set_version(version)
+        return True
+
+    def add_listener(self, listener: StateListener) -> None:
+        """Call ``listener(version, changes)`` after every commit."""
+        self._listeners.append(listener)
+
+    def commit(self) -> int:
+        with self.transaction():
+            self["last_updated"] = datetime.utcnow()
+            version = self._next_version()
+            changes = {key: self[key] for key in self._dirty}
+            self._dirty.clear()
+            for listener in self._listeners:
+                listener(version, changes)
+        return version
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.epoch}-{self.version}"'
+
+    def version_headers(self, version: Optional[int] = None) -> Dict[str, str]:
+        if version is None:
+            version = self.version
+        return {"ETag": f'"{self.epoch}-{version}"', STATE_VERSION_HEADER: str(version)}
+
+
+def not_modified(request: Request, state: AgentState) -> Optional[Response]:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    if "*" in tags or state.etag in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=state.version_headers())
+    return None
+
+
+def check_expected_version(state: AgentState, expected: Optional[int]) -> None:
+    """Reject a mutation planned on a stale read: ``409`` unless ``expected`` is the current version.
+
+    Call inside the mutation's ``transaction()`` so no commit slips in between.
+    """
+    if expected is not None and expected != state.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"State is at version {state.version}, not the expected {expected}",
+            headers=state.version_headers(),
+        )
+
+
+def create_agent_state(initial: Mapping[str, Any], backend: StateBackend = "memory", name: str = "") -> AgentState:
+    """Process-local state, or state in the shared memory segment ``name`` used by every worker."""
+    if backend == "shared":
+        from services.common.shared_state import SharedAgentState
+
+        return SharedAgentState(name, initial)
+    return AgentState(initial)
+
+
+NOT_MODIFIED_RESPONSE = {status.HTTP_304_NOT_MODIFIED: {"description": "State unchanged since the given ETag"}}
+CONFLICT_RESPONSE = {status.HTTP_409_CONFLICT: {"description": "State moved past ``expected_version``"}}
+
+__all__ = [
+    "AgentState",
+    "CONFLICT_RESPONSE",
+    "NOT_MODIFIED_RESPONSE",
+    "STATE_VERSION_HEADER",
+    "StateBackend",
+    "StateListener",
+    "check_expected_version",
+    "create_agent_state",
+    "not_modified",
+]
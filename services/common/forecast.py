@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import atexit
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from services.common.agent_state import AgentState
+
+# Header slots: time of the last sample, samples seen, bins per day, columns.
+_LAST, _SAMPLES, _BINS, _COLUMNS = range(4)
+_HEADER_SLOTS = 4
+# Per column: the last value, its EWMA level, then the time-of-day profile and its weights.
+_VALUE, _LEVEL = range(2)
+_COLUMN_SLOTS = 2
+_DAY_S = 86_400.0
+
+
+def _bins(bin_seconds: float) -> int:
+    return max(1, round(_DAY_S / bin_seconds))
+
+
+class ForecastSeries(BaseModel):
+    level: float
+    seasonal: List[float]
+    values: List[float]
+
+
+class ForecastResponse(BaseModel):
+    start: Optional[datetime]
+    step_s: float
+    samples: int
+    series: Dict[str, ForecastSeries]
+
+
+class StateForecaster:
+    """Incremental short-term forecasts of numeric state fields, updated on every commit.
+
+    Each column keeps an exponentially weighted level with time constant
+    ``tau`` seconds and a time-of-day profile of ``bins`` buckets (UTC). The
+    profile is a time-weighted average of the value held in each bucket, a
+    running mean until a bucket has seen ``days`` days of data and an EWMA
+    over that window afterwards. Both are O(1) per sample; a forecast only
+    reads them. The current deviation from the profile decays with ``tau``,
+    so short horizons follow the level and longer ones the profile.
+    """
+
+    def __init__(
+        self,
+        state: AgentState,
+        columns: Sequence[str],
+        tau: float = 900.0,
+        bin_seconds: float = 900.0,
+        days: float = 7.0,
+        buffer: Optional[memoryview] = None,
+    ) -> None:
+        self._state = state
+        self.columns = list(columns)
+        self.tau = tau
+        self.bins = _bins(bin_seconds)
+        self.bin_seconds = _DAY_S / self.bins
+        self._window = days * self.bin_seconds
+        if buffer is None:
+            buffer = memoryview(bytearray(self.nbytes(len(self.columns), self.bins)))
+        count = _HEADER_SLOTS + len(self.columns) * (_COLUMN_SLOTS + 2 * self.bins)
+        flat = np.frombuffer(buffer, dtype=np.float64, count=count)
+        self._header = flat[:_HEADER_SLOTS]
+        blocks = flat[_HEADER_SLOTS:].reshape(len(self.columns), _COLUMN_SLOTS + 2 * self.bins)
+        self._scalars = blocks[:, :_COLUMN_SLOTS]
+        self._profile = blocks[:, _COLUMN_SLOTS:_COLUMN_SLOTS + self.bins]
+        self._weight = blocks[:, _COLUMN_SLOTS + self.bins:]
+        with state.transaction():
+            if self._header[_BINS] != self.bins or self._header[_COLUMNS] != len(self.columns):
+                flat[:] = 0.0
+                self._header[_BINS] = self.bins
+                self._header[_COLUMNS] = len(self.columns)
+        state.add_listener(self._record)
+
+    @staticmethod
+    def nbytes(columns: int, bins: int) -> int:
+        return (_HEADER_SLOTS + columns * (_COLUMN_SLOTS + 2 * bins)) * 8
+
+    def _bin(self, timestamp: float) -> int:
+        return int(timestamp % _DAY_S // self.bin_seconds)
+
+    def _record(self, version: int, changes: Dict[str, Any]) -> None:
+        # Called by ``commit()`` inside the state transaction.
+        now = time.time()
+        last = float(self._header[_LAST])
+        values = np.array([float(self._state[name]) for name in self.columns])
+        if self._header[_SAMPLES]:
+            dt = max(now - last, 0.0)
+            # The previous values held since the last sample; a long gap counts as one bucket.
+            held = min(dt, self.bin_seconds)
+            if held > 0:
+                bucket = self._bin(last)
+                weight = np.minimum(self._weight[:, bucket] + held, self._window)
+                self._profile[:, bucket] += (self._scalars[:, _VALUE] - self._profile[:, bucket]) * held / weight
+                self._weight[:, bucket] = weight
+            alpha = -math.expm1(-dt / self.tau)
+            self._scalars[:, _LEVEL] += (values - self._scalars[:, _LEVEL]) * alpha
+        else:
+            self._scalars[:, _LEVEL] = values
+        self._scalars[:, _VALUE] = values
+        self._header[_LAST] = max(now, last)
+        self._header[_SAMPLES] += 1
+
+    def forecast(self, horizon: int, step: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Levels and ``(columns, horizon)`` profile values and forecasts at the start of each step from now."""
+        with self._state.transaction():
+            if self._header[_SAMPLES]:
+                level = self._scalars[:, _LEVEL].copy()
+            else:
+                # Nothing recorded yet: persistence of the current values.
+                level = np.array([float(self._state[name]) for name in self.columns])
+            profile = self._profile.copy()
+            known = self._weight > 0
+        now = time.time()
+        offsets = np.arange(horizon) * step
+        buckets = ((now + offsets) % _DAY_S // self.bin_seconds).astype(np.intp)
+        # Buckets not seen yet fall back to the level, which already includes the
+        # current deviation; it only decays towards buckets with a profile.
+        seasonal = np.where(known, profile, level[:, None])
+        deviation = level - seasonal[:, self._bin(now)]
+        decay = np.exp(-offsets / self.tau)
+        seasonal = seasonal[:, buckets]
+        values = np.where(known[:, buckets], seasonal + deviation[:, None] * decay, seasonal)
+        return level, seasonal, np.maximum(values, 0.0)
+
+    def query(self, horizon: int, step: float) -> ForecastResponse:
+        level, seasonal, values = self.forecast(horizon, step)
+        samples = int(self._header[_SAMPLES])
+        return ForecastResponse(
+            start=datetime.utcnow() if samples else None,
+            step_s=step,
+            samples=samples,
+            series={
+                name: ForecastSeries(
+                    level=float(level[column]), seasonal=seasonal[column].tolist(), values=values[column].tolist()
+                )
+                for column, name in enumerate(self.columns)
+            },
+        )
+
+    def close(self) -> None:
+        self._header = self._scalars = self._profile = self._weight = None  # type: ignore[assignment]
+
+
+def create_state_forecaster(
+    state: AgentState, columns: Sequence[str], tau: float, bin_seconds: float, days: float
+) -> StateForecaster:
+    """Forecaster of ``columns``; kept in shared memory too when the state is shared between workers."""
+    attach_buffer = getattr(state, "attach_buffer", None)
+    if attach_buffer is None:
+        return StateForecaster(state, columns, tau, bin_seconds, days)
+    segment = attach_buffer("forecast", StateForecaster.nbytes(len(columns), _bins(bin_seconds)))
+    forecaster = StateForecaster(state, columns, tau, bin_seconds, days, segment.buf)
+
+    def close() -> None:
+        forecaster.close()
+        segment.close()
+
+    atexit.register(close)
+    return forecaster
+
+
+__all__ = ["ForecastResponse", "ForecastSeries", "StateForecaster", "create_state_forecaster"]
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import atexit
+import time
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from services.common.agent_state import AgentState
+
+# Header slots in front of the rows: next row to write, rows in use, row width, horizon.
+_NEXT, _USED, _WIDTH, _HORIZON = range(4)
+_HEADER_SLOTS = 4
+
+
+class HistorySeries(BaseModel):
+    min: List[float]
+    mean: List[float]
+    max: List[float]
+
+
+class HistoryResponse(BaseModel):
+    start: Optional[datetime]
+    end: datetime
+    step_s: float
+    timestamps: List[datetime]
+    count: List[int]
+    series: Dict[str, HistorySeries]
+
+
+def numeric_columns(values: Mapping[str, Any]) -> List[str]:
+    """State fields that can be charted: numbers and flags, not modes or timestamps."""
+    return [
+        name
+        for name, value in values.items()
+        if isinstance(value, (int, float)) and not isinstance(value, Enum)
+    ]
+
+
+def _timestamp(value: datetime) -> float:
+    # Agent timestamps are naive UTC (``datetime.utcnow()``).
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+class StateHistory:
+    """Fixed-size ring buffer with one ``[timestamp, *numeric fields]`` row per committed mutation.
+
+    All rows are preallocated, so memory use does not grow with uptime; once
+    ``horizon`` rows are written the oldest ones are overwritten.
+    """
+
+    def __init__(self, state: AgentState, horizon: int, buffer: Optional[memoryview] = None) -> None:
+        self._state = state
+        self.columns = numeric_columns(state.snapshot())
+        self.horizon = horizon
+        width = len(self.columns) + 1
+        if buffer is None:
+            buffer = memoryview(bytearray(self.nbytes(len(self.columns), horizon)))
+        flat = np.frombuffer(buffer, dtype=np.float64, count=_HEADER_SLOTS + horizon * width)
+        self._header = flat[:_HEADER_SLOTS]
+        self._rows = flat[_HEADER_SLOTS:].reshape(horizon, width)
+        with state.transaction():
+            if self._header[_WIDTH] != width or self._header[_HORIZON] != horizon:
+                self._header[:] = (0, 0, width, horizon)
+        state.add_listener(self._record)
+
+    @staticmethod
+    def nbytes(columns: int, horizon: int) -> int:
+        return (_HEADER_SLOTS + horizon * (columns + 1)) * 8
+
+    def _record(self, version: int, changes: Dict[str, Any]) -> None:
+        # Called by ``commit()`` inside the state transaction.
+        index = int(self._header[_NEXT])
+        used = int(self._header[_USED])
+        timestamp = time.time()
+        if used:
+            # Keep rows sorted even if the wall clock steps back.
+            timestamp = max(timestamp, self._rows[index - 1, 0])
+        row = self._rows[index]
+        row[0] = timestamp
+        for column, name in enumerate(self.columns, 1):
+            row[column] = self._state[name]
+        self._header[_NEXT] = (index + 1) % self.horizon
+        self._header[_USED] = min(used + 1, self.horizon)
+
+    def samples(self) -> np.ndarray:
+        """Copy of the recorded rows, oldest first."""
+        with self._state.transaction():
+            index = int(self._header[_NEXT])
+            used = int(self._header[_USED])
+            if used < self.horizon:
+                return self._rows[:used].copy()
+            return np.concatenate((self._rows[index:], self._rows[:index]))
+
+    def downsample(
+        self, start: Optional[datetime], end: Optional[datetime], step: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Bucket rows in ``[start, end]`` into ``step``-second buckets.
+
+        Returns the bucket start times, sample counts and the per-column min,
+        mean and max of every non-empty bucket.
+        """
+        rows = self.samples()
+        timestamps = rows[:, 0]
+        end_ts = time.time() if end is None else _timestamp(end)
+        if start is None:
+            start_ts = float(timestamps[0]) if len(timestamps) else end_ts
+        else:
+            start_ts = _timestamp(start)
+        low = np.searchsorted(timestamps, start_ts, side="left")
+        high = np.searchsorted(timestamps, end_ts, side="right")
+        rows = rows[low:high]
+        if not len(rows):
+            empty = np.empty((0, len(self.columns)))
+            return np.empty(0), np.empty(0, dtype=np.int64), empty, empty, empty
+        buckets = ((rows[:, 0] - start_ts) // step).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        counts = np.diff(np.r_[starts, len(rows)])
+        values = rows[:, 1:]
+        return (
+            start_ts + buckets[starts] * step,
+            counts,
+            np.minimum.reduceat(values, starts, axis=0),
+            np.add.reduceat(values, starts, axis=0) / counts[:, None],
+            np.maximum.reduceat(values, starts, axis=0),
+        )
+
+    def query(self, start: Optional[datetime], end: Optional[datetime], step: float) -> HistoryResponse:
+        bucket_starts, counts, minimum, mean, maximum = self.downsample(start, end, step)
+        return HistoryResponse(
+            start=start if start is not None else (_utc(bucket_starts[0]) if len(bucket_starts) else None),
+            end=end if end is not None else datetime.utcnow(),
+            step_s=step,
+            timestamps=[_utc(timestamp) for timestamp in bucket_starts.tolist()],
+            count=counts.tolist(),
+            series={
+                name: HistorySeries(
+                    min=minimum[:, column].tolist(),
+                    mean=mean[:, column].tolist(),
+                    max=maximum[:, column].tolist(),
+                )
+                for column, name in enumerate(self.columns)
+            },
+        )
+
+    def close(self) -> None:
+        self._header = self._rows = None  # type: ignore[assignment]
+
+
+def create_state_history(state: AgentState, horizon: int) -> StateHistory:
+    """History of ``state``; kept in shared memory too when the state is shared between workers."""
+    attach_buffer = getattr(state, "attach_buffer", None)
+    if attach_buffer is None:
+        return StateHistory(state, horizon)
+    columns = numeric_columns(state.snapshot())
+    segment = attach_buffer("history", StateHistory.nbytes(len(columns), horizon))
+    history = StateHistory(state, horizon, segment.buf)
+
+    def close() -> None:
+        # The NumPy views must go before the segment can be closed.
+        history.close()
+        segment.close()
+
+    atexit.register(close)
+    return history
+
+
+__all__ = ["HistoryResponse", "HistorySeries", "StateHistory", "create_state_history", "numeric_columns"]
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import atexit
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from services.common.agent_state import AgentState
+from services.common.state_layout import decode_value, encode_value, fields_from_defaults, layout_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_FILE_HEADER = struct.Struct("<4sII")  # magic, layout fingerprint, field count
+_LOG_MAGIC = b"AGWL"
+_SNAPSHOT_MAGIC = b"AGSN"
+_CRC = struct.Struct("<I")
+
+
+class StateJournal:
+    """Write-ahead log of an agent's state with periodic memory-mapped snapshots.
+
+    Every commit appends one fixed-size record ``[crc32, version, *values]``
+    holding the full state after the commit, so recovery only has to find the
+    valid record with the highest version. A background thread writes the
+    appended records and ``fdatasync``s them in groups: commits that arrive
+    while a sync is in flight share the next one. After ``snapshot_every``
+    records the state is written to the older of two slots of a memory-mapped
+    snapshot file and the log is truncated.
+
+    File operations take an ``flock`` on the log, so workers sharing state
+    (``STATE_BACKEND=shared``) can share one journal.
+    """
+
+    def __init__(
+        self,
+        state: AgentState,
+        directory: str,
+        name: str,
+        sync: bool = True,
+        snapshot_every: int = 10_000,
+    ) -> None:
+        self._state = state
+        self._fields = fields_from_defaults(state.snapshot())
+        self.sync = sync
+        self._snapshot_every = snapshot_every
+        self._body = struct.Struct(f"<Q{len(self._fields)}d")
+        self.record_size = _CRC.size + self._body.size
+        self._dtype = np.dtype([("crc", "<u4"), ("version", "<u8"), ("values", "<f8", (len(self._fields),))])
+        self._header = _FILE_HEADER.pack(_LOG_MAGIC, layout_fingerprint(self._fields), len(self._fields))
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, f"{name}.wal")
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot")
+
+        self._buffer = bytearray()
+        self._appended = 0
+        self._durable = 0
+        self._logged = 0
+        self._error: Optional[BaseException] = None
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+
+        self._fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        self._snapshot_fd = os.open(self.snapshot_path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._file_lock():
+            self._open_files()
+            self.recovered_version, self.recovery_seconds = self._recover()
+        state.add_listener(self._append)
+        self._thread = threading.Thread(target=self._run, name=f"{name}-journal", daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        # flock excludes other processes; threads of this one share the descriptor.
+        with self._io_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _open_files(self) -> None:
+        current = os.pread(self._fd, _FILE_HEADER.size, 0)
+        if current != self._header:
+            # New file, or written with another field layout: start over.
+            os.ftruncate(self._fd, 0)
+            os.write(self._fd, self._header)
+            os.fsync(self._fd)
+        snapshot_header = self._header.replace(_LOG_MAGIC, _SNAPSHOT_MAGIC, 1)
+        snapshot_size = _FILE_HEADER.size + 2 * self.record_size
+        if os.pread(self._snapshot_fd, _FILE_HEADER.size, 0) != snapshot_header:
+            os.ftruncate(self._snapshot_fd, 0)
+            os.ftruncate(self._snapshot_fd, snapshot_size)
+            os.pwrite(self._snapshot_fd, snapshot_header, 0)
+            os.fsync(self._snapshot_fd)
+        self._snapshot_map = mmap.mmap(self._snapshot_fd, snapshot_size)
+        self._logged = max(os.fstat(self._fd).st_size - _FILE_HEADER.size, 0) // self.record_size
+        logged_size = _FILE_HEADER.size + self._logged * self.record_size
+        if os.fstat(self._fd).st_size > logged_size:
+            # A torn trailing record: drop it, or every record appended after it would be misaligned.
+            os.ftruncate(self._fd, logged_size)
+            if self.sync:
+                os.fsync(self._fd)
+
+    def _latest(self, records: np.ndarray) -> Optional[Tuple[int, List[float]]]:
+        """The valid record with the highest version; torn or corrupt records are skipped."""
+        if not len(records):
+            return None
+        candidates = [int(np.argmax(records["version"]))]
+        candidates.extend(np.argsort(records["version"], kind="stable")[::-1].tolist())
+        for index in candidates:
+            record = records[index]
+            if zlib.crc32(record.tobytes()[_CRC.size :]) == record["crc"]:
+                return int(record["version"]), record["values"].tolist()
+        return None
+
+    def _recover(self) -> Tuple[int, float]:
+        started = time.perf_counter()
+        snapshots = np.frombuffer(self._snapshot_map, dtype=self._dtype, count=2, offset=_FILE_HEADER.size).copy()
+        logged = np.fromfile(self.log_path, dtype=self._dtype, count=self._logged, offset=_FILE_HEADER.size)
+        found = [latest for latest in (self._latest(snapshots), self._latest(logged)) if latest is not None]
+        if not found:
+            return 0, time.perf_counter() - started
+        version, raw = max(found, key=lambda latest: latest[0])
+        values = {field.name: decode_value(field, value) for field, value in zip(self._fields, raw)}
+        self._state.restore(values, version)
+        return version, time.perf_counter() - started
+
+    def _encode_state(self, version: int) -> bytes:
+        body = self._body.pack(version, *(encode_value(field, self._state[field.name]) for field in self._fields))
+        return _CRC.pack(zlib.crc32(body)) + body
+
+    def _append(self, version: int, changes: Dict[str, Any]) -> None:
+        # Called by ``commit()`` inside the state transaction.
+        record = self._encode_state(version)
+        with self._cond:
+            self._buffer += record
+            self._appended += 1
+            self._cond.notify_all()
+
+    def wait_durable(self) -> None:
+        """Block until every record appended so far is on disk (no-op without sync)."""
+        if not self.sync:
+            return
+        with self._cond:
+            target = self._appended
+            while self._durable < target and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise OSError("state journal is not writable") from self._error
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffer and not self._stopping:
+                    self._cond.wait()
+                if not self._buffer and self._stopping:
+                    return
+                pending, self._buffer = self._buffer, bytearray()
+                appended = self._appended
+            try:
+                with self._file_lock():
+                    os.write(self._fd, pending)
+                    os.fdatasync(self._fd)
+                    self._logged += len(pending) // self.record_size
+                    if self._logged >= self._snapshot_every:
+                        self._snapshot()
+            except OSError as exc:
+                logger.exception("Writing the state journal %s failed", self.log_path)
+                with self._cond:
+                    self._error = exc
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._durable = appended
+                self._cond.notify_all()
+
+    def _snapshot(self) -> None:
+        # Runs under the file lock after the log was synced, so every record in
+        # the log is older than the state captured here.
+        with self._state.transaction():
+            record = self._encode_state(self._state.version)
+        slots = np.frombuffer(self._snapshot_map, dtype=self._dtype, count=2, offset=_FILE_HEADER.size)
+        slot = int(np.argmin(slots["version"]))
+        del slots
+        offset = _FILE_HEADER.size + slot * self.record_size
+        self._snapshot_map[offset : offset + self.record_size] = record
+        self._snapshot_map.flush()
+        os.ftruncate(self._fd, _FILE_HEADER.size)
+        self._logged = 0
+
+    def snapshot(self) -> None:
+        with self._file_lock():
+            self._snapshot()
+
+    def close(self) -> None:
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._snapshot_map.close()
+        os.close(self._snapshot_fd)
+        os.close(self._fd)
+
+
+def open_state_journal(
+    state: AgentState, directory: Optional[str], name: str, sync: bool = True, snapshot_every: int = 10_000
+) -> Optional[StateJournal]:
+    """Restore ``state`` from ``directory`` and journal every later commit; ``None`` if persistence is off."""
+    if not directory:
+        return None
+    journal = StateJournal(state, directory, name, sync=sync, snapshot_every=snapshot_every)
+    if journal.recovered_version:
+        logger.info(
+            "Restored %s state version %d in %.1f ms", name, journal.recovered_version, journal.recovery_seconds * 1000
+        )
+    atexit.register(journal.close)
+    return journal
+
+
+def durability_dependency(journal: Optional[StateJournal]) -> Callable[[], AsyncIterator[None]]:
+    """FastAPI dependency that holds the response until the request's commit is durable."""
+
+    async def wait_durable() -> AsyncIterator[None]:
+        yield
+        if journal is not None and journal.sync:
+            await run_in_threadpool(journal.wait_durable)
+
+    return wait_durable
+
+
+__all__ = ["StateJournal", "durability_dependency", "open_state_journal"]
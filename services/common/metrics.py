@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.common.agent_state import AgentState
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers an in-process call (~100 µs) up to a request stuck on a timeout.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class HistogramSeries:
+    """One labelled histogram: counts live in a list allocated up front, one slot per bucket."""
+
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class CounterSeries:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.buckets)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for values, series in sorted(self._series.items()):
+            counts, total = series.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _label_text(self.label_names, values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for values, series in sorted(self._series.items()):
+            lines.append(f"{self.name}{_label_text(self.label_names, values)} {_number(series.value)}")
+        return lines
+
+
+class Gauge(_Family):
+    """Gauge read from a callback at scrape time, so the hot path pays nothing."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]) -> None:
+        super().__init__(name, documentation, ())
+        self._read = read
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name} {_number(self._read())}"]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._families: Dict[str, _Family] = {}
+
+    def _register(self, family: _Family) -> _Family:
+        if family.name in self._families:
+            raise ValueError(f"metric {family.name} already registered")
+        self._families[family.name] = family
+        return family
+
+    def histogram(
+        self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, documentation, read))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+def preallocate(family: _Family, label_values: Iterable[Sequence[str]]) -> None:
+    """Create the series up front, so they are exported (as zero) before the first observation."""
+    for values in label_values:
+        family.labels(*values)
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware recording latency and status codes per route template.
+
+    Requests that match no route share the ``other`` label, so unknown paths
+    cannot grow the number of series.
+    """
+
+    def __init__(self, app: ASGIApp, latency: Histogram, responses: Counter) -> None:
+        self.app = app
+        self._latency = latency
+        self._responses = responses
+        self._routes: Optional[Dict[object, str]] = None
+
+    def _route(self, scope: Scope) -> str:
+        if self._routes is None:
+            router = scope["app"].router if "app" in scope else None
+            self._routes = {getattr(route, "endpoint", None): route.path for route in getattr(router, "routes", [])}
+        return self._routes.get(scope.get("endpoint"), "other")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self._route(scope)
+            method = scope["method"]
+            self._latency.labels(method, route).observe(time.perf_counter() - started)
+            self._responses.labels(method, route, str(status_code)).inc()
+
+
+def instrument_app(app: FastAPI, registry: MetricsRegistry) -> None:
+    """Record per-route request metrics and expose ``registry`` at ``GET /metrics``."""
+    app.add_middleware(
+        RequestMetricsMiddleware,
+        latency=registry.histogram(
+            "http_request_duration_seconds", "Time spent handling HTTP requests.", ("method", "route")
+        ),
+        responses=registry.counter("http_responses_total", "HTTP responses sent.", ("method", "route", "status")),
+    )
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        return Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def instrument_agent_state(registry: MetricsRegistry, state: AgentState) -> None:
+    """Count state commits (``rate()`` gives the mutation rate) and export the state version."""
+    commits = registry.counter("agent_state_commits_total", "State mutations committed by this process.").labels()
+    state.add_listener(lambda version, changes: commits.inc())
+    # With STATE_BACKEND=shared the version is common to all workers, so its rate
+    # is the mutation rate of the whole agent even though scrapes hit one worker.
+    registry.gauge("agent_state_version", "Current state version.", lambda: state.version)
+
+
+__all__ = [
+    "Counter",
+    "CounterSeries",
+    "Gauge",
+    "Histogram",
+    "HistogramSeries",
+    "LATENCY_BUCKETS",
+    "MetricsRegistry",
+    "PROMETHEUS_CONTENT_TYPE",
+    "RequestMetricsMiddleware",
+    "instrument_agent_state",
+    "instrument_app",
+    "preallocate",
+]
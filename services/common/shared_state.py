@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import atexit
+import fcntl
+import os
+import secrets
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from services.common.agent_state import AgentState
+from services.common.state_layout import decode_value, encode_value, fields_from_defaults, layout_fingerprint
+
+# Header slots (uint64) in front of the float64 field slots.
+_SEQUENCE, _VERSION, _INITIALIZED, _EPOCH, _LAYOUT = range(5)
+_HEADER_SLOTS = 5
+_SLOT_SIZE = 8
+
+
+def _attach(name: str, size: int) -> SharedMemory:
+    for _ in range(100):
+        try:
+            return SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            pass
+        try:
+            segment = SharedMemory(name=name)
+        except (FileNotFoundError, ValueError):
+            # Another worker created the segment but has not sized it yet.
+            time.sleep(0.01)
+            continue
+        if segment.size >= size:
+            return segment
+        # Left over from a build with fewer fields: replace it.
+        segment.unlink()
+        segment.close()
+    raise RuntimeError(f"Could not attach to shared state segment {name!r}")
+
+
+class SharedAgentState(AgentState):
+    """``AgentState`` kept in a named shared memory segment, shared by every worker process.
+
+    Values live in fixed float64 slots. Writers are serialized across processes
+    with an ``flock`` on a lock file and bump a sequence counter around each
+    transaction (seqlock), so ``snapshot()`` readers never take the lock and
+    retry instead when they overlap a write. Version and epoch live in the
+    segment too, so every worker hands out the same ETag for the same state.
+    """
+
+    def __init__(self, name: str, initial: Mapping[str, Any], lock_dir: Optional[str] = None) -> None:
+        self._init_tracking()
+        self.name = name
+        self._fields = fields_from_defaults(initial)
+        self._slots = {field.name: index for index, field in enumerate(self._fields)}
+        size = (_HEADER_SLOTS + len(self._fields)) * _SLOT_SIZE
+        self._segment = _attach(name, size)
+        # Attaching registers the segment with this process's resource tracker, which
+        # would unlink it when the worker exits; it must outlive every single worker.
+        resource_tracker.unregister(self._segment._name, "shared_memory")  # type: ignore[attr-defined]
+        header_end = _HEADER_SLOTS * _SLOT_SIZE
+        self._views = [self._segment.buf[:header_end], self._segment.buf[header_end:size]]
+        self._header = self._views[0].cast("Q")
+        self._values = self._views[1].cast("d")
+        lock_path = os.path.join(lock_dir or tempfile.gettempdir(), f"{name}.lock")
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._depth = 0
+        self._owner: Optional[int] = None
+        self._closed = False
+        atexit.register(self.close)
+
+        fingerprint = layout_fingerprint(self._fields)
+        with self.transaction():
+            if not self._header[_INITIALIZED] or self._header[_LAYOUT] != fingerprint:
+                for field in self._fields:
+                    self._values[self._slots[field.name]] = encode_value(field, initial[field.name])
+                self._header[_VERSION] = 0
+                self._header[_EPOCH] = secrets.randbits(48)
+                self._header[_LAYOUT] = fingerprint
+                self._header[_INITIALIZED] = 1
+
+    def __getitem__(self, key: str) -> Any:
+        return decode_value(self._fields[self._slots[key]], self._values[self._slots[key]])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        field = self._fields[self._slots[key]]
+        raw = encode_value(field, value)
+        with self.transaction():
+            if self._values[self._slots[key]] != raw:
+                self._dirty.add(key)
+            self._values[self._slots[key]] = raw
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Shared agent state has a fixed layout")
+
+    def __iter__(self) -> Iterator[str]:
+        return (field.name for field in self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    @property
+    def version(self) -> int:
+        return self._header[_VERSION]
+
+    @property
+    def epoch(self) -> str:
+        return f"{self._header[_EPOCH]:012x}"
+
+    def _next_version(self) -> int:
+        self._header[_VERSION] += 1
+        return self._header[_VERSION]
+
+    def _set_version(self, version: int) -> None:
+        self._header[_VERSION] = version
+
+    @contextmanager
+    def transaction(self) -> Iterator["SharedAgentState"]:
+        with self._lock:
+            if self._depth == 0:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+                self._owner = threading.get_ident()
+                self._header[_SEQUENCE] += 1
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._header[_SEQUENCE] += 1
+                    self._owner = None
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _read(self) -> Tuple[int, List[float]]:
+        if self._owner == threading.get_ident():
+            return self._header[_VERSION], self._values.tolist()
+        while True:
+            sequence = self._header[_SEQUENCE]
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            version, raw = self._header[_VERSION], self._values.tolist()
+            if self._header[_SEQUENCE] == sequence:
+                return version, raw
+
+    def _decode_all(self, raw: List[float]) -> Dict[str, Any]:
+        return {field.name: decode_value(field, raw[index]) for index, field in enumerate(self._fields)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self._decode_all(self._read()[1])
+
+    def versioned_snapshot(self) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        version, raw = self._read()
+        return self._decode_all(raw), self.version_headers(version)
+
+    def attach_buffer(self, suffix: str, nbytes: int) -> SharedMemory:
+        """A further segment ``<name>-<suffix>`` shared by the workers, zero-filled when created.
+
+        Writers must hold ``transaction()``; the caller closes the segment.
+        """
+        segment = _attach(f"{self.name}-{suffix}", nbytes)
+        resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+        return segment
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for view in (self._header, self._values, *self._views):
+            view.release()
+        self._segment.close()
+        os.close(self._lock_fd)
+
+    def unlink(self) -> None:
+        """Remove the segment; workers still attached keep their mapping until they close it."""
+        self._segment.unlink()
+
+
+__all__ = ["SharedAgentState"]
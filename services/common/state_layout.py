@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Type
+
+# Media type of a state encoded as a layout fingerprint followed by its float64 slots.
+STATE_SLOTS_MEDIA_TYPE = "application/x-state-slots"
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+class StateField(NamedTuple):
+    name: str
+    kind: str
+    enum: Optional[Type[Enum]] = None
+
+
+def fields_from_defaults(defaults: Mapping[str, Any]) -> List[StateField]:
+    """Derive the fixed slot layout of a state from the types of its default values."""
+    fields = []
+    for name, value in defaults.items():
+        if isinstance(value, bool):
+            fields.append(StateField(name, "bool"))
+        elif isinstance(value, Enum):
+            fields.append(StateField(name, "enum", type(value)))
+        elif isinstance(value, datetime):
+            fields.append(StateField(name, "datetime"))
+        elif isinstance(value, (int, float)):
+            fields.append(StateField(name, "float"))
+        else:
+            raise TypeError(f"State field {name!r} of type {type(value).__name__} has no fixed-size encoding")
+    return fields
+
+
+def layout_fingerprint(fields: List[StateField]) -> int:
+    description = ",".join(f"{field.name}:{field.kind}" for field in fields)
+    return zlib.crc32(description.encode())
+
+
+def encode_value(field: StateField, value: Any) -> float:
+    if field.kind == "enum":
+        return float(list(field.enum).index(field.enum(value)))
+    if field.kind == "datetime":
+        return value.replace(tzinfo=timezone.utc).timestamp()
+    return float(value)
+
+
+def decode_value(field: StateField, raw: float) -> Any:
+    if field.kind == "float":
+        return raw
+    if field.kind == "bool":
+        return raw != 0.0
+    if field.kind == "enum":
+        return list(field.enum)[int(raw)]
+    return datetime.fromtimestamp(raw, timezone.utc).replace(tzinfo=None)
+
+
+class SlotCodec:
+    """Wire encoding of a state as its fixed slots: a uint32 fingerprint then one little-endian float64 per field.
+
+    The fingerprint covers field names, kinds and enum values, so a reader
+    holding an outdated ``describe()`` notices instead of misreading slots.
+    """
+
+    def __init__(self, fields: List[StateField]) -> None:
+        self.fields = fields
+        self.fingerprint = zlib.crc32(json.dumps(self._description(fields)).encode())
+        self._struct = struct.Struct(f"<I{len(fields)}d")
+        self._names = [field.name for field in fields]
+        # Floats and bools go into the slots as they are; enums and datetimes are converted.
+        self._enum_values: Dict[int, List[Any]] = {}
+        self._enum_positions: Dict[int, Dict[Any, int]] = {}
+        for index, field in enumerate(fields):
+            if field.kind == "enum":
+                self._enum_values[index] = [member.value for member in field.enum]
+                self._enum_positions[index] = {
+                    key: position for position, member in enumerate(field.enum) for key in (member, member.value)
+                }
+        self._bools = [index for index, field in enumerate(fields) if field.kind == "bool"]
+        self._datetimes = [index for index, field in enumerate(fields) if field.kind == "datetime"]
+
+    @staticmethod
+    def _description(fields: List[StateField]) -> List[Dict[str, Any]]:
+        description = []
+        for field in fields:
+            item: Dict[str, Any] = {"name": field.name, "kind": field.kind}
+            if field.enum is not None:
+                item["values"] = [member.value for member in field.enum]
+            description.append(item)
+        return description
+
+    def describe(self) -> Dict[str, Any]:
+        return {"fingerprint": self.fingerprint, "fields": self._description(self.fields)}
+
+    @classmethod
+    def from_description(cls, description: Mapping[str, Any]) -> "SlotCodec":
+        fields = [
+            StateField(item["name"], item["kind"], Enum(item["name"], {v: v for v in item["values"]}))
+            if item["kind"] == "enum"
+            else StateField(item["name"], item["kind"])
+            for item in description["fields"]
+        ]
+        codec = cls(fields)
+        if codec.fingerprint != description["fingerprint"]:
+            raise ValueError(f"Layout fingerprint {description['fingerprint']} does not match its fields")
+        return codec
+
+    @staticmethod
+    def peek_fingerprint(body: bytes) -> int:
+        return struct.unpack_from("<I", body)[0]
+
+    def pack(self, values: Mapping[str, Any]) -> bytes:
+        """Encode ``values``; datetimes must be naive UTC, as the agents keep them."""
+        slots = [values[name] for name in self._names]
+        for index, positions in self._enum_positions.items():
+            slots[index] = positions[slots[index]]
+        for index in self._datetimes:
+            slots[index] = (slots[index] - _UNIX_EPOCH).total_seconds()
+        return self._struct.pack(self.fingerprint, *slots)
+
+    def unpack(self, body: bytes) -> Dict[str, Any]:
+        """The fields as JSON would carry them, except datetimes, which stay ``datetime``."""
+        fingerprint, *raw = self._struct.unpack(body)
+        if fingerprint != self.fingerprint:
+            raise ValueError(f"State slots use layout {fingerprint}, expected {self.fingerprint}")
+        for index, members in self._enum_values.items():
+            raw[index] = members[int(raw[index])]
+        for index in self._bools:
+            raw[index] = raw[index] != 0.0
+        for index in self._datetimes:
+            # Naive UTC like ``decode_value``, without a time zone round trip.
+            raw[index] = _UNIX_EPOCH + timedelta(seconds=raw[index])
+        return dict(zip(self._names, raw))
+
+
+__all__ = [
+    "STATE_SLOTS_MEDIA_TYPE",
+    "SlotCodec",
+    "StateField",
+    "decode_value",
+    "encode_value",
+    "fields_from_defaults",
+    "layout_fingerprint",
+]
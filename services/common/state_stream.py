@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Set, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from services.common.agent_state import AgentState
+
+SNAPSHOT_EVENT = "snapshot"
+DELTA_EVENT = "delta"
+
+
+def format_event(event: str, event_id: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\nid: {event_id}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queued: int) -> None:
+        self.loop = loop
+        self.queue: asyncio.Queue[Tuple[int, str]] = asyncio.Queue(max_queued)
+        self.overflowed = False
+
+    def offer(self, version: int, event: str) -> None:
+        # Commits may happen in FastAPI's threadpool, so hand the event over to
+        # the subscriber's own event loop.
+        self.loop.call_soon_threadsafe(self._put, version, event)
+
+    def _put(self, version: int, event: str) -> None:
+        try:
+            self.queue.put_nowait((version, event))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class StateStream:
+    """Server-sent events with a snapshot of ``state`` followed by one delta per commit.
+
+    A subscriber that falls more than ``max_queued`` events behind gets a fresh
+    snapshot instead of the deltas it missed. The same happens when the version
+    moves without a local commit (state shared with other worker processes),
+    which is checked every ``poll_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        state: AgentState,
+        max_queued: int = 256,
+        keepalive_interval: float = 10.0,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self._state = state
+        self._max_queued = max_queued
+        self._keepalive_interval = keepalive_interval
+        self._poll_interval = min(poll_interval, keepalive_interval)
+        self._subscribers: Set[_Subscriber] = set()
+        self._lock = threading.Lock()
+        state.add_listener(self._publish)
+
+    def _event_id(self, version: int) -> str:
+        return f"{self._state.epoch}-{version}"
+
+    def _publish(self, version: int, changes: Dict[str, Any]) -> None:
+        if not self._subscribers:
+            return
+        event = format_event(
+            DELTA_EVENT, self._event_id(version), {"version": version, "changes": jsonable_encoder(changes)}
+        )
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(version, event)
+
+    def _snapshot(self) -> Tuple[int, str]:
+        with self._state.transaction():
+            version = self._state.version
+            data = self._state.snapshot()
+        return version, format_event(
+            SNAPSHOT_EVENT, self._event_id(version), {"version": version, "state": jsonable_encoder(data)}
+        )
+
+    async def events(self, request: Request) -> AsyncIterator[str]:
+        subscriber = _Subscriber(asyncio.get_running_loop(), self._max_queued)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            # Registered before the snapshot is taken, so no commit falls in between;
+            # deltas already covered by the snapshot are skipped below.
+            sent_version, event = self._snapshot()
+            yield event
+            last_sent = time.monotonic()
+            while True:
+                if subscriber.overflowed:
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    subscriber.overflowed = False
+                    sent_version, event = self._snapshot()
+                    yield event
+                    last_sent = time.monotonic()
+                    continue
+                try:
+                    version, event = await asyncio.wait_for(subscriber.queue.get(), self._poll_interval)
+                except asyncio.TimeoutError:
+                    if self._state.version > sent_version:
+                        sent_version, event = self._snapshot()
+                        yield event
+                        last_sent = time.monotonic()
+                    elif time.monotonic() - last_sent >= self._keepalive_interval:
+                        if await request.is_disconnected():
+                            return
+                        yield ": keepalive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                if version <= sent_version:
+                    continue
+                if version > sent_version + 1:
+                    # Versions committed by another process in between: resend everything.
+                    sent_version, event = self._snapshot()
+                sent_version = max(sent_version, version)
+                yield event
+                last_sent = time.monotonic()
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def response(self, request: Request) -> StreamingResponse:
+        return StreamingResponse(
+            self.events(request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+__all__ = ["DELTA_EVENT", "SNAPSHOT_EVENT", "StateStream", "format_event"]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from services.common.agent_state import AgentState
+from services.common.state_layout import STATE_SLOTS_MEDIA_TYPE, SlotCodec, fields_from_defaults
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def wants_state_slots(accept: Optional[str]) -> bool:
+    """Whether the client asked for the binary slot encoding; JSON otherwise."""
+    return accept is not None and STATE_SLOTS_MEDIA_TYPE in accept
+
+
+class StatusResponseCache:
+    """The state serialized as ``model`` JSON or as its slots, rebuilt only when the state's ETag moves.
+
+    Reads of an unchanged state return the cached bytes without building,
+    validating or encoding a model. The ETag check also catches commits made
+    by other worker processes when the state is shared.
+    """
+
+    def __init__(self, state: AgentState, model: Type[BaseModel]) -> None:
+        self._state = state
+        self._model = model
+        self.codec = SlotCodec(fields_from_defaults(state.snapshot()))
+        self._cached: Optional[Tuple[str, Dict[str, Any], Dict[str, str], Dict[str, bytes]]] = None
+
+    def body(self, media_type: str = JSON_MEDIA_TYPE) -> Tuple[bytes, Dict[str, str]]:
+        """The serialized status and its version headers."""
+        cached = self._cached
+        if cached is None or cached[0] != self._state.etag:
+            data, headers = self._state.versioned_snapshot()
+            cached = self._cached = (headers["ETag"], data, headers, {})
+        _, data, headers, bodies = cached
+        body = bodies.get(media_type)
+        if body is None:
+            if media_type == STATE_SLOTS_MEDIA_TYPE:
+                body = self.codec.pack(data)
+            else:
+                body = self._model(**data).model_dump_json().encode()
+            bodies[media_type] = body
+        return body, headers
+
+    def response(self, accept: Optional[str] = None) -> Response:
+        media_type = STATE_SLOTS_MEDIA_TYPE if wants_state_slots(accept) else JSON_MEDIA_TYPE
+        body, headers = self.body(media_type)
+        return Response(content=body, media_type=media_type, headers={**headers, "Vary": "Accept"})
+
+
+__all__ = ["JSON_MEDIA_TYPE", "StatusResponseCache", "wants_state_slots"]
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Dict
+
+import httpx
+from fastapi import FastAPI
+
+# Central reads the agent URLs when it is imported; in the edge deployment they
+# are virtual hosts served by in-process ASGI transports instead of sockets.
+EDGE_AGENT_URLS: Dict[str, str] = {
+    "SOLAR_AGENT_URL": "http://solar.edge",
+    "BATTERY_AGENT_URL": "http://battery.edge",
+    "VEHICLE_AGENT_URL": "http://vehicle.edge",
+    "LOAD_AGENT_URL": "http://load.edge",
+}
+for variable, url in EDGE_AGENT_URLS.items():
+    os.environ[variable] = url
+
+from services.battery_agent.app.main import app as battery_app  # noqa: E402
+from services.central.app import main as central  # noqa: E402
+from services.load_agent.app.main import app as load_app  # noqa: E402
+from services.solar_agent.app.main import app as solar_app  # noqa: E402
+from services.vehicle_agent.app.main import app as vehicle_app  # noqa: E402
+
+AGENT_APPS: Dict[str, FastAPI] = {
+    "solar": solar_app,
+    "battery": battery_app,
+    "vehicle": vehicle_app,
+    "load": load_app,
+}
+
+# The ASGI transport buffers whole responses, so it cannot carry the agents'
+# /subscribe streams; in-process reads are cheap enough to poll instead.
+central.settings.status_streaming = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    central.app.state.agent_transports = {
+        EDGE_AGENT_URLS[f"{name.upper()}_AGENT_URL"]: httpx.ASGITransport(app=agent_app)
+        for name, agent_app in AGENT_APPS.items()
+    }
+    # Starlette does not run the lifespan of mounted applications.
+    async with AsyncExitStack() as stack:
+        for mounted in [*AGENT_APPS.values(), central.app]:
+            await stack.enter_async_context(mounted.router.lifespan_context(mounted))
+        yield
+
+
+app = FastAPI(title="Edge Energy Node", version="1.0.0", lifespan=lifespan)
+for name, agent_app in AGENT_APPS.items():
+    app.mount(f"/{name}", agent_app)
+app.mount("/", central.app)
+
+
+__all__ = ["app"]
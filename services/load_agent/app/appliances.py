@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Tolerance when comparing sums of appliance power against a shed target.
+_EPSILON_KW = 1e-9
+
+
+@dataclass(eq=False)
+class Appliance:
+    appliance_id: str
+    power_kw: float
+    priority: int
+    min_on_s: float = 0.0
+    min_off_s: float = 0.0
+    on: bool = True
+    switched_at: float = 0.0
+    # Bumped whenever the appliance moves between heaps; older heap entries are stale.
+    generation: int = 0
+
+    @property
+    def unlocks_at(self) -> float:
+        return self.switched_at + (self.min_on_s if self.on else self.min_off_s)
+
+
+# (key, tie-breaker, generation, appliance)
+_Entry = Tuple[float, int, int, Appliance]
+
+
+class ApplianceRegistry:
+    """Flexible loads switched individually, by priority, to meet a shed target.
+
+    A higher ``priority`` is more important: shedding turns off the lowest
+    priority first and restoring turns back on the highest first, in strict
+    order. An appliance switched less than its minimum on (or off) time ago
+    is left alone. Appliances free to switch are in two heaps (on, by
+    priority; off, by reverse priority) and the others in a third one keyed
+    by when their minimum time ends, moved over as they expire. Registering,
+    removing or switching an appliance is O(log n) and a shed target O(k log n)
+    for the k appliances it switches; the flexible and shed totals are kept as
+    running sums. Replaced entries are dropped lazily, by generation.
+    """
+
+    def __init__(self) -> None:
+        self.appliances: Dict[str, Appliance] = {}
+        self._sheddable: List[_Entry] = []
+        self._restorable: List[_Entry] = []
+        self._locked: List[_Entry] = []
+        self._sequence = itertools.count()
+        self.flexible_kw = 0.0
+        self.shed_kw = 0.0
+
+    def _push(self, heap: List[_Entry], key: float, appliance: Appliance) -> None:
+        heapq.heappush(heap, (key, next(self._sequence), appliance.generation, appliance))
+        if len(heap) > 2 * len(self.appliances) + 64:
+            heap[:] = [entry for entry in heap if entry[2] == entry[3].generation]
+            heapq.heapify(heap)
+
+    def _index(self, appliance: Appliance, now: float) -> None:
+        appliance.generation += 1
+        unlocks_at = appliance.unlocks_at
+        if unlocks_at > now:
+            self._push(self._locked, unlocks_at, appliance)
+        elif appliance.on:
+            self._push(self._sheddable, appliance.priority, appliance)
+        else:
+            self._push(self._restorable, -appliance.priority, appliance)
+
+    def _release(self, now: float) -> None:
+        while self._locked and self._locked[0][0] <= now:
+            _, _, generation, appliance = heapq.heappop(self._locked)
+            if generation == appliance.generation:
+                self._index(appliance, now)
+
+    def _switch(self, appliance: Appliance, on: bool, now: float) -> None:
+        appliance.on = on
+        appliance.switched_at = now
+        self.shed_kw += -appliance.power_kw if on else appliance.power_kw
+        self._index(appliance, now)
+
+    def register(self, appliance: Appliance, now: Optional[float] = None) -> None:
+        """Add ``appliance``; re-registering an id keeps its on/off state and switch time."""
+        now = time.time() if now is None else now
+        previous = self.remove(appliance.appliance_id)
+        if previous is not None:
+            appliance.on, appliance.switched_at = previous.on, previous.switched_at
+        self.appliances[appliance.appliance_id] = appliance
+        self.flexible_kw += appliance.power_kw
+        if not appliance.on:
+            self.shed_kw += appliance.power_kw
+        self._index(appliance, now)
+
+    def remove(self, appliance_id: str) -> Optional[Appliance]:
+        appliance = self.appliances.pop(appliance_id, None)
+        if appliance is None:
+            return None
+        appliance.generation += 1
+        if self.appliances:
+            self.flexible_kw -= appliance.power_kw
+            if not appliance.on:
+                self.shed_kw -= appliance.power_kw
+        else:
+            # Nothing left: drop the rounding the running totals collected.
+            self.flexible_kw = self.shed_kw = 0.0
+        return appliance
+
+    def shed_to(self, target_kw: float, now: Optional[float] = None) -> float:
+        """Switch appliances towards ``target_kw`` of shed load; returns the load actually shed.
+
+        Shedding stops at the first appliance that reaches the target, so it may
+        overshoot by less than that appliance's power; restoring never goes
+        below the target. Appliances within their minimum times can leave it
+        short either way.
+        """
+        now = time.time() if now is None else now
+        self._release(now)
+        if target_kw > self.shed_kw + _EPSILON_KW:
+            while self._sheddable and self.shed_kw < target_kw - _EPSILON_KW:
+                _, _, generation, appliance = heapq.heappop(self._sheddable)
+                if generation == appliance.generation:
+                    self._switch(appliance, False, now)
+        else:
+            while self._restorable:
+                _, _, generation, appliance = self._restorable[0]
+                if generation == appliance.generation and self.shed_kw - appliance.power_kw < target_kw - _EPSILON_KW:
+                    break
+                heapq.heappop(self._restorable)
+                if generation == appliance.generation:
+                    self._switch(appliance, True, now)
+        return self.shed_kw
+
+
+__all__ = ["Appliance", "ApplianceRegistry"]
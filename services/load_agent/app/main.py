@@ -1,13 +1,31 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict
+from typing import Any, Dict, List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Security, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from services.common.agent_state import (
+    CONFLICT_RESPONSE,
+    NOT_MODIFIED_RESPONSE,
+    StateBackend,
+    check_expected_version,
+    create_agent_state,
+    not_modified,
+)
+from services.common.forecast import ForecastResponse, create_state_forecaster
+from services.common.history import HistoryResponse, create_state_history
+from services.common.journal import durability_dependency, open_state_journal
+from services.common.metrics import MetricsRegistry, instrument_agent_state, instrument_app
+from services.common.state_stream import StateStream
+from services.common.status_response import StatusResponseCache
+from services.load_agent.app import physics
+from services.load_agent.app.appliances import Appliance, ApplianceRegistry
+
 
 class LoadMeasurement(BaseModel):
     critical_load_kw: float = Field(..., ge=0)
@@ -20,6 +38,9 @@ class LoadMeasurement(BaseModel):
 
 class LoadSheddingRequest(BaseModel):
     shed_kw: float = Field(..., ge=0)
+    expected_version: Optional[int] = Field(
+        None, ge=0, description="Apply only if the state is still at this version; 409 otherwise"
+    )
 
 
 class LoadStatus(BaseModel):
@@ -31,10 +52,50 @@ class LoadStatus(BaseModel):
     last_updated: datetime
 
 
+class ApplianceRegistration(BaseModel):
+    power_kw: float = Field(..., gt=0)
+    priority: int = Field(0, description="Higher is more important: shed last, restored first")
+    min_on_s: float = Field(0.0, ge=0, description="Minimum time on after being restored")
+    min_off_s: float = Field(0.0, ge=0, description="Minimum time off after being shed")
+
+
+class ApplianceBatchItem(ApplianceRegistration):
+    appliance_id: str
+
+
+class ApplianceBatch(BaseModel):
+    appliances: List[ApplianceBatchItem]
+
+
+class ApplianceStatus(ApplianceBatchItem):
+    on: bool
+    switched_at: Optional[datetime]
+
+
+class ApplianceListResponse(BaseModel):
+    appliances: List[ApplianceStatus]
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="")
 
     api_key: str = Field(..., validation_alias="SERVICE_API_KEY")
+    state_backend: StateBackend = Field(default="memory", validation_alias="STATE_BACKEND")
+    state_shm_name: str = Field(default="load-agent-state", validation_alias="STATE_SHM_NAME")
+    history_horizon: int = Field(default=65_536, gt=0, validation_alias="HISTORY_HORIZON")
+    state_dir: Optional[str] = Field(default=None, validation_alias="STATE_DIR")
+    state_wal_sync: bool = Field(default=True, validation_alias="STATE_WAL_SYNC")
+    state_snapshot_every: int = Field(default=10_000, gt=0, validation_alias="STATE_SNAPSHOT_EVERY")
+    forecast_tau: float = Field(default=900.0, gt=0, validation_alias="FORECAST_TAU")
+    forecast_bin: float = Field(default=900.0, gt=0, le=86_400, validation_alias="FORECAST_BIN")
+    forecast_days: float = Field(default=7.0, gt=0, validation_alias="FORECAST_DAYS")
+    load_registry: bool = Field(default=False, validation_alias="LOAD_REGISTRY")
+
+    @model_validator(mode="after")
+    def _registry_needs_local_state(self) -> "Settings":
+        if self.load_registry and self.state_backend == "shared":
+            raise ValueError("LOAD_REGISTRY keeps the appliances in process memory and needs STATE_BACKEND=memory")
+        return self
 
 
 settings = Settings()
@@ -42,7 +103,7 @@ API_KEY_HEADER_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_HEADER_NAME, auto_error=False)
 
 
-def require_api_key(api_key: str = Security(api_key_header)) -> str:
+async def require_api_key(api_key: str = Security(api_key_header)) -> str:
     if api_key is None or api_key != settings.api_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
     return api_key
@@ -58,17 +119,46 @@ DEFAULTS: Dict[str, float | datetime] = {
 }
 
 
-state: Dict[str, float | datetime] = DEFAULTS.copy()
+state = create_agent_state(DEFAULTS, settings.state_backend, settings.state_shm_name)
+state_stream = StateStream(state)
+status_response = StatusResponseCache(state, LoadStatus)
+history = create_state_history(state, settings.history_horizon)
+forecaster = create_state_forecaster(
+    state,
+    ["critical_load_kw", "flexible_load_kw"],
+    settings.forecast_tau,
+    settings.forecast_bin,
+    settings.forecast_days,
+)
+journal = open_state_journal(
+    state, settings.state_dir, "load", sync=settings.state_wal_sync, snapshot_every=settings.state_snapshot_every
+)
+durable_commit = durability_dependency(journal)
+registry = ApplianceRegistry() if settings.load_registry else None
 app = FastAPI(title="Flexible Load Agent", version="1.0.0")
+metrics = MetricsRegistry()
+instrument_app(app, metrics)
+instrument_agent_state(metrics, state)
 
 
 def recompute_totals() -> None:
-    critical = float(state["critical_load_kw"])
-    flexible = float(state["flexible_load_kw"])
-    shed = min(float(state["shed_kw"]), flexible)
-    state["shed_kw"] = shed
-    state["total_nominal_load_kw"] = critical + flexible
-    state["total_consumption_kw"] = critical + max(flexible - shed, 0.0)
+    if registry is not None:
+        # The registered appliances, whatever /update measured.
+        state["flexible_load_kw"] = registry.flexible_kw
+        state["shed_kw"] = registry.shed_kw
+    shed, nominal, consumption = physics.recompute_totals(
+        float(state["critical_load_kw"]), float(state["flexible_load_kw"]), float(state["shed_kw"])
+    )
+    state["shed_kw"] = float(shed)
+    state["total_nominal_load_kw"] = float(nominal)
+    state["total_consumption_kw"] = float(consumption)
+
+
+if registry is not None:
+    # The appliances are not journaled: start from an empty registry and let them register again.
+    with state.transaction():
+        recompute_totals()
+        state.commit()
 
 
 @app.get("/health")
@@ -76,32 +166,144 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.get("/status", response_model=LoadStatus)
-def get_status(_: str = Depends(require_api_key)) -> LoadStatus:
-    return LoadStatus(**state)
-
-
-@app.post("/update", response_model=LoadStatus)
-def update_loads(measurement: LoadMeasurement, _: str = Depends(require_api_key)) -> LoadStatus:
-    state["critical_load_kw"] = measurement.critical_load_kw
-    state["flexible_load_kw"] = measurement.flexible_load_kw
-    recompute_totals()
-    state["last_updated"] = datetime.utcnow()
-    return LoadStatus(**state)
-
-
-@app.post("/shed", response_model=LoadStatus)
-def apply_shedding(request: LoadSheddingRequest, _: str = Depends(require_api_key)) -> LoadStatus:
-    flexible = float(state["flexible_load_kw"])
-    if request.shed_kw > flexible:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot shed {request.shed_kw} kW; only {flexible} kW flexible load available.",
-        )
-    state["shed_kw"] = request.shed_kw
-    recompute_totals()
-    state["last_updated"] = datetime.utcnow()
-    return LoadStatus(**state)
+@app.get("/status", response_model=LoadStatus, responses=NOT_MODIFIED_RESPONSE)
+async def get_status(
+    request: Request, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    unchanged = not_modified(request, state)
+    if unchanged is not None:
+        return unchanged
+    return status_response.response(accept)
+
+
+@app.post("/update", response_model=LoadStatus, dependencies=[Depends(durable_commit)])
+async def update_loads(
+    measurement: LoadMeasurement, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    with state.transaction():
+        state["critical_load_kw"] = measurement.critical_load_kw
+        state["flexible_load_kw"] = measurement.flexible_load_kw
+        recompute_totals()
+        state.commit()
+        return status_response.response(accept)
+
+
+@app.post("/shed", response_model=LoadStatus, responses=CONFLICT_RESPONSE, dependencies=[Depends(durable_commit)])
+async def apply_shedding(
+    request: LoadSheddingRequest, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    with state.transaction():
+        check_expected_version(state, request.expected_version)
+        flexible = float(state["flexible_load_kw"])
+        if request.shed_kw > flexible:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot shed {request.shed_kw} kW; only {flexible} kW flexible load available.",
+            )
+        if registry is not None:
+            registry.shed_to(request.shed_kw)
+        else:
+            state["shed_kw"] = request.shed_kw
+        recompute_totals()
+        state.commit()
+        return status_response.response(accept)
+
+
+def _appliance_status(appliance: Appliance) -> ApplianceStatus:
+    return ApplianceStatus(
+        appliance_id=appliance.appliance_id,
+        power_kw=appliance.power_kw,
+        priority=appliance.priority,
+        min_on_s=appliance.min_on_s,
+        min_off_s=appliance.min_off_s,
+        on=appliance.on,
+        switched_at=datetime.utcfromtimestamp(appliance.switched_at) if appliance.switched_at else None,
+    )
+
+
+def _appliance(appliance_id: str, registration: ApplianceRegistration) -> Appliance:
+    return Appliance(
+        appliance_id=appliance_id,
+        power_kw=registration.power_kw,
+        priority=registration.priority,
+        min_on_s=registration.min_on_s,
+        min_off_s=registration.min_off_s,
+    )
+
+
+if registry is not None:
+
+    @app.get("/appliances", response_model=ApplianceListResponse)
+    async def list_appliances(_: str = Depends(require_api_key)) -> ApplianceListResponse:
+        with state.transaction():
+            return ApplianceListResponse(
+                appliances=[_appliance_status(appliance) for appliance in registry.appliances.values()]
+            )
+
+    @app.post("/appliances", response_model=LoadStatus, dependencies=[Depends(durable_commit)])
+    async def register_appliances(
+        batch: ApplianceBatch, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+    ) -> Response:
+        with state.transaction():
+            for item in batch.appliances:
+                registry.register(_appliance(item.appliance_id, item))
+            recompute_totals()
+            state.commit()
+            return status_response.response(accept)
+
+    @app.put("/appliances/{appliance_id}", response_model=LoadStatus, dependencies=[Depends(durable_commit)])
+    async def register_appliance(
+        appliance_id: str,
+        registration: ApplianceRegistration,
+        _: str = Depends(require_api_key),
+        accept: Optional[str] = Header(None),
+    ) -> Response:
+        with state.transaction():
+            registry.register(_appliance(appliance_id, registration))
+            recompute_totals()
+            state.commit()
+            return status_response.response(accept)
+
+    @app.delete("/appliances/{appliance_id}", response_model=LoadStatus, dependencies=[Depends(durable_commit)])
+    async def remove_appliance(
+        appliance_id: str, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+    ) -> Response:
+        with state.transaction():
+            if registry.remove(appliance_id) is None:
+                raise HTTPException(status_code=404, detail=f"Appliance {appliance_id!r} not registered")
+            recompute_totals()
+            state.commit()
+            return status_response.response(accept)
+
+
+@app.get("/layout")
+async def get_layout(_: str = Depends(require_api_key)) -> Dict[str, Any]:
+    """Slot layout of the ``application/x-state-slots`` status encoding."""
+    return status_response.codec.describe()
+
+
+@app.get("/history", response_model=HistoryResponse)
+def get_history(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    step: float = Query(60.0, gt=0, description="Bucket width in seconds"),
+    _: str = Depends(require_api_key),
+) -> HistoryResponse:
+    return history.query(start, end, step)
+
+
+@app.get("/forecast", response_model=ForecastResponse)
+def get_forecast(
+    horizon: int = Query(96, gt=0, le=10_000, description="Number of steps"),
+    step: float = Query(900.0, gt=0, description="Step width in seconds"),
+    _: str = Depends(require_api_key),
+) -> ForecastResponse:
+    return forecaster.query(horizon, step)
+
+
+@app.get("/subscribe", response_class=StreamingResponse)
+async def subscribe(request: Request, _: str = Depends(require_api_key)) -> StreamingResponse:
+    return state_stream.response(request)
 
 
 __all__ = ["app"]
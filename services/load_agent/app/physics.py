@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Tuple, TypeVar
+
+import numpy as np
+
+Value = TypeVar("Value", float, np.ndarray)
+
+
+def recompute_totals(critical: Value, flexible: Value, shed: Value) -> Tuple[Value, Value, Value]:
+    # (shed, total nominal load, total consumption) for floats or arrays; the
+    # shed amount never exceeds the flexible load. Builtins on scalars, where
+    # the ufuncs cost ~1 us a call.
+    if not isinstance(critical, np.ndarray):
+        shed = min(shed, flexible)
+        return shed, critical + flexible, critical + max(flexible - shed, 0.0)
+    shed = np.minimum(shed, flexible)
+    return shed, critical + flexible, critical + np.maximum(flexible - shed, 0.0)
+
+
+__all__ = ["recompute_totals"]
@@ -0,0 +1,3 @@
+from services.simulator.engine import SimulationResult, SiteParameters, energy_balance_error, simulate
+
+__all__ = ["SimulationResult", "SiteParameters", "energy_balance_error", "simulate"]
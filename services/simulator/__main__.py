@@ -0,0 +1,108 @@
+"""Replay measurement series offline through the coordination rules.
+
+Each input is a CSV file with a header (``production_kw``, ``critical_load_kw``,
+``flexible_load_kw`` and optionally ``vehicle_connected``) holding one scenario,
+or a ``.npz`` archive with arrays of those names, shaped ``(steps,)`` or
+``(steps, scenarios)``. All inputs must have the same number of steps; their
+scenarios are simulated side by side. Example::
+
+    python -m services.simulator site-a.csv site-b.csv --step-hours 0.25 --trajectories out.npz
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from services.simulator.engine import SiteParameters, energy_balance_error, simulate
+
+COLUMNS = ("production_kw", "critical_load_kw", "flexible_load_kw", "vehicle_connected")
+
+
+def load_series(path: str) -> Dict[str, np.ndarray]:
+    if path.endswith(".npz"):
+        with np.load(path) as archive:
+            series = {name: archive[name] for name in COLUMNS if name in archive}
+    else:
+        with open(path, encoding="utf-8") as source:
+            header = [name.strip() for name in source.readline().split(",")]
+            table = np.loadtxt(source, delimiter=",", ndmin=2)
+        series = {name: table[:, header.index(name)] for name in COLUMNS if name in header}
+    missing = [name for name in COLUMNS[:3] if name not in series]
+    if missing:
+        raise ValueError(f"{path}: missing series {', '.join(missing)}")
+    return {name: values if values.ndim == 2 else values[:, None] for name, values in series.items()}
+
+
+def stack(inputs: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    lengths = {len(series["production_kw"]) for series in inputs}
+    if len(lengths) != 1:
+        raise ValueError(f"inputs have different lengths: {sorted(lengths)}")
+    steps = lengths.pop()
+    columns: Dict[str, List[np.ndarray]] = {name: [] for name in COLUMNS}
+    for series in inputs:
+        shape = (steps, max(values.shape[1] for values in series.values()))
+        series.setdefault("vehicle_connected", np.ones((steps, 1)))
+        for name, values in series.items():
+            columns[name].append(np.broadcast_to(values, shape))
+    return {name: np.hstack(parts) for name, parts in columns.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--step-hours", type=float, default=1.0, help="duration of one row of the series")
+    parser.add_argument("--parameters", help="JSON object with SiteParameters fields (scalars or per-scenario lists)")
+    parser.add_argument("--record-every", type=int, default=1, help="keep SoC/shed trajectories every N steps")
+    parser.add_argument("--trajectories", help="write the SoC and shed trajectories to this .npz file")
+    args = parser.parse_args()
+
+    try:
+        series = stack([load_series(path) for path in args.inputs])
+        parameters = SiteParameters()
+        if args.parameters:
+            with open(args.parameters, encoding="utf-8") as source:
+                parameters = parameters._replace(**json.load(source))
+    except (OSError, ValueError, TypeError) as exc:
+        sys.exit(f"error: {exc}")
+
+    started = time.perf_counter()
+    result = simulate(
+        series["production_kw"],
+        series["critical_load_kw"],
+        series["flexible_load_kw"],
+        series.get("vehicle_connected"),
+        parameters=parameters,
+        step_hours=args.step_hours,
+        record_every=args.record_every,
+    )
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "steps": result.steps,
+        "scenarios": result.scenarios,
+        "steps_per_s": result.steps * result.scenarios / elapsed,
+        "totals_kwh": result.summary(),
+        "final_soc_kwh": {
+            "battery": result.final_soc_kwh[0].tolist(),
+            "vehicle": result.final_soc_kwh[1].tolist(),
+        },
+        "balance_error_kwh": {name: float(np.abs(gap).max()) for name, gap in energy_balance_error(result).items()},
+    }
+    print(json.dumps(report, indent=2))
+    if args.trajectories:
+        np.savez(
+            args.trajectories,
+            battery_soc_kwh=result.battery_soc_kwh,
+            vehicle_soc_kwh=result.vehicle_soc_kwh,
+            shed_kw=result.shed_kw,
+            record_every=result.record_every,
+        )
+
+
+if __name__ == "__main__":
+    main()
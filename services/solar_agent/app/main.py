@@ -1,11 +1,20 @@
 from datetime import datetime
-from typing import Dict
+from typing import Any, Dict, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Security, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from services.common.agent_state import NOT_MODIFIED_RESPONSE, StateBackend, create_agent_state, not_modified
+from services.common.forecast import ForecastResponse, create_state_forecaster
+from services.common.history import HistoryResponse, create_state_history
+from services.common.journal import durability_dependency, open_state_journal
+from services.common.metrics import MetricsRegistry, instrument_agent_state, instrument_app
+from services.common.state_stream import StateStream
+from services.common.status_response import StatusResponseCache
+
 
 class ProductionUpdate(BaseModel):
     production_kw: float = Field(..., ge=0, description="Instantaneous solar production in kW")
@@ -20,6 +29,15 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="")
 
     api_key: str = Field(..., validation_alias="SERVICE_API_KEY")
+    state_backend: StateBackend = Field(default="memory", validation_alias="STATE_BACKEND")
+    state_shm_name: str = Field(default="solar-agent-state", validation_alias="STATE_SHM_NAME")
+    history_horizon: int = Field(default=65_536, gt=0, validation_alias="HISTORY_HORIZON")
+    state_dir: Optional[str] = Field(default=None, validation_alias="STATE_DIR")
+    state_wal_sync: bool = Field(default=True, validation_alias="STATE_WAL_SYNC")
+    state_snapshot_every: int = Field(default=10_000, gt=0, validation_alias="STATE_SNAPSHOT_EVERY")
+    forecast_tau: float = Field(default=900.0, gt=0, validation_alias="FORECAST_TAU")
+    forecast_bin: float = Field(default=900.0, gt=0, le=86_400, validation_alias="FORECAST_BIN")
+    forecast_days: float = Field(default=7.0, gt=0, validation_alias="FORECAST_DAYS")
 
 
 settings = Settings()
@@ -27,7 +45,7 @@ API_KEY_HEADER_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_HEADER_NAME, auto_error=False)
 
 
-def require_api_key(api_key: str = Security(api_key_header)) -> str:
+async def require_api_key(api_key: str = Security(api_key_header)) -> str:
     if api_key is None or api_key != settings.api_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
     return api_key
@@ -37,8 +55,21 @@ def default_state() -> Dict[str, datetime | float]:
     return {"production_kw": 0.0, "last_updated": datetime.utcnow()}
 
 
-state = default_state()
+state = create_agent_state(default_state(), settings.state_backend, settings.state_shm_name)
+state_stream = StateStream(state)
+status_response = StatusResponseCache(state, SolarStatus)
+history = create_state_history(state, settings.history_horizon)
+forecaster = create_state_forecaster(
+    state, ["production_kw"], settings.forecast_tau, settings.forecast_bin, settings.forecast_days
+)
+journal = open_state_journal(
+    state, settings.state_dir, "solar", sync=settings.state_wal_sync, snapshot_every=settings.state_snapshot_every
+)
+durable_commit = durability_dependency(journal)
 app = FastAPI(title="Solar Generation Agent", version="1.0.0")
+metrics = MetricsRegistry()
+instrument_app(app, metrics)
+instrument_agent_state(metrics, state)
 
 
 @app.get("/health")
@@ -46,16 +77,54 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.get("/status", response_model=SolarStatus)
-def get_status(_: str = Depends(require_api_key)) -> SolarStatus:
-    return SolarStatus(**state)
+@app.get("/status", response_model=SolarStatus, responses=NOT_MODIFIED_RESPONSE)
+async def get_status(
+    request: Request, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    unchanged = not_modified(request, state)
+    if unchanged is not None:
+        return unchanged
+    return status_response.response(accept)
+
+
+@app.post("/production", response_model=SolarStatus, dependencies=[Depends(durable_commit)])
+async def update_production(
+    update: ProductionUpdate, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    with state.transaction():
+        state["production_kw"] = update.production_kw
+        state.commit()
+        return status_response.response(accept)
+
+
+@app.get("/layout")
+async def get_layout(_: str = Depends(require_api_key)) -> Dict[str, Any]:
+    """Slot layout of the ``application/x-state-slots`` status encoding."""
+    return status_response.codec.describe()
+
+
+@app.get("/history", response_model=HistoryResponse)
+def get_history(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    step: float = Query(60.0, gt=0, description="Bucket width in seconds"),
+    _: str = Depends(require_api_key),
+) -> HistoryResponse:
+    return history.query(start, end, step)
+
+
+@app.get("/forecast", response_model=ForecastResponse)
+def get_forecast(
+    horizon: int = Query(96, gt=0, le=10_000, description="Number of steps"),
+    step: float = Query(900.0, gt=0, description="Step width in seconds"),
+    _: str = Depends(require_api_key),
+) -> ForecastResponse:
+    return forecaster.query(horizon, step)
 
 
-@app.post("/production", response_model=SolarStatus)
-def update_production(update: ProductionUpdate, _: str = Depends(require_api_key)) -> SolarStatus:
-    state["production_kw"] = update.production_kw
-    state["last_updated"] = datetime.utcnow()
-    return SolarStatus(**state)
+@app.get("/subscribe", response_class=StreamingResponse)
+async def subscribe(request: Request, _: str = Depends(require_api_key)) -> StreamingResponse:
+    return state_stream.response(request)
 
 
 __all__ = ["app"]
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_seconds(moment: datetime) -> float:
+    """Seconds since the Unix epoch; naive datetimes are taken as UTC, like the rest of the state."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - _UNIX_EPOCH).total_seconds()
+
+
+def from_epoch_seconds(seconds: float) -> datetime:
+    return datetime.utcfromtimestamp(seconds)
+
+
+@dataclass(eq=False)
+class DepotVehicle:
+    vehicle_id: str
+    capacity_kwh: float
+    state_of_charge_kwh: float
+    target_kwh: float
+    max_charge_rate_kw: float
+    max_discharge_rate_kw: float
+    departure: float
+    mode: str = "idle"
+    power_kw: float = 0.0
+    # Bumped whenever the vehicle's heap keys change; older heap entries are stale.
+    generation: int = 0
+
+
+# (key, tie-breaker, generation, vehicle)
+_Entry = Tuple[float, int, int, DepotVehicle]
+
+
+class Depot:
+    """Vehicles connected to a charging depot and the scheduler that splits ``/control`` power between them.
+
+    Charging is least-laxity first: a vehicle's latest start time is its
+    departure minus the cycles it still needs to reach its target at full
+    rate, and the vehicle that must start soonest is served first (earliest
+    departure first among those already at target). Discharging takes the
+    most slack first, and only what a vehicle could charge back at full rate
+    from the next cycle until it leaves, so it stops at the first vehicle
+    with less than a cycle of slack. Both orders are heaps whose keys only
+    change for vehicles whose charge changes, so connecting or disconnecting
+    costs O(log n) and a command O(k log n) for the k vehicles it reaches.
+    Replaced entries are dropped lazily, by generation, when popped or when
+    a heap is compacted.
+
+    Each command is the energy of one cycle of ``cycle_seconds``, as for a
+    single vehicle; departures are converted to cycles with it.
+    """
+
+    def __init__(self, cycle_seconds: float = 3600.0) -> None:
+        self.cycle_seconds = cycle_seconds
+        self.vehicles: Dict[str, DepotVehicle] = {}
+        self._charge: List[_Entry] = []
+        self._discharge: List[_Entry] = []
+        self._sequence = itertools.count()
+        self._active: List[DepotVehicle] = []
+        self.capacity_kwh = 0.0
+        self.state_of_charge_kwh = 0.0
+        self.max_charge_rate_kw = 0.0
+        self.max_discharge_rate_kw = 0.0
+
+    def _latest_start(self, vehicle: DepotVehicle) -> float:
+        # When charging at full rate must start to reach the target by departure; past it for a
+        # vehicle above target, by the time its surplus would take to charge.
+        missing = vehicle.target_kwh - vehicle.state_of_charge_kwh
+        return vehicle.departure - missing / vehicle.max_charge_rate_kw * self.cycle_seconds
+
+    def _index(self, vehicle: DepotVehicle) -> None:
+        vehicle.generation += 1
+        latest_start = self._latest_start(vehicle)
+        if vehicle.state_of_charge_kwh < vehicle.capacity_kwh:
+            self._push(self._charge, min(latest_start, vehicle.departure), vehicle)
+        if vehicle.state_of_charge_kwh > 0 and vehicle.max_discharge_rate_kw > 0:
+            self._push(self._discharge, -latest_start, vehicle)
+
+    def _push(self, heap: List[_Entry], key: float, vehicle: DepotVehicle) -> None:
+        heapq.heappush(heap, (key, next(self._sequence), vehicle.generation, vehicle))
+        if len(heap) > 2 * len(self.vehicles) + 64:
+            heap[:] = [entry for entry in heap if entry[2] == entry[3].generation]
+            heapq.heapify(heap)
+
+    def _add_totals(self, vehicle: DepotVehicle, sign: float) -> None:
+        self.capacity_kwh += sign * vehicle.capacity_kwh
+        self.state_of_charge_kwh += sign * vehicle.state_of_charge_kwh
+        self.max_charge_rate_kw += sign * vehicle.max_charge_rate_kw
+        self.max_discharge_rate_kw += sign * vehicle.max_discharge_rate_kw
+
+    def connect(self, vehicle: DepotVehicle) -> None:
+        """Add ``vehicle``, replacing a connected one with the same id."""
+        self.disconnect(vehicle.vehicle_id)
+        vehicle.state_of_charge_kwh = min(vehicle.state_of_charge_kwh, vehicle.capacity_kwh)
+        vehicle.target_kwh = min(vehicle.target_kwh, vehicle.capacity_kwh)
+        self.vehicles[vehicle.vehicle_id] = vehicle
+        self._add_totals(vehicle, 1.0)
+        self._index(vehicle)
+
+    def disconnect(self, vehicle_id: str) -> Optional[DepotVehicle]:
+        vehicle = self.vehicles.pop(vehicle_id, None)
+        if vehicle is None:
+            return None
+        vehicle.generation += 1
+        if self.vehicles:
+            self._add_totals(vehicle, -1.0)
+        else:
+            # Nothing left: drop the rounding the running totals collected.
+            self.capacity_kwh = self.state_of_charge_kwh = 0.0
+            self.max_charge_rate_kw = self.max_discharge_rate_kw = 0.0
+        return vehicle
+
+    def dispatch(self, mode: str, power_kw: float, now: Optional[float] = None) -> float:
+        """Split one command between the vehicles and apply it; returns the power applied."""
+        for vehicle in self._active:
+            vehicle.mode, vehicle.power_kw = "idle", 0.0
+        self._active = []
+        if mode == "idle" or power_kw <= 0:
+            return 0.0
+        charging = mode == "charge"
+        heap = self._charge if charging else self._discharge
+        now = time.time() if now is None else now
+        remaining = power_kw
+        while remaining > 0 and heap:
+            entry = heap[0]
+            vehicle = entry[3]
+            if entry[2] != vehicle.generation:
+                heapq.heappop(heap)
+                continue
+            # Same limits as ``physics.apply_control``, per vehicle.
+            if charging:
+                energy = min(remaining, vehicle.max_charge_rate_kw, vehicle.capacity_kwh - vehicle.state_of_charge_kwh)
+            else:
+                # What can be charged back between the next cycle and departure.
+                spare = vehicle.max_charge_rate_kw * ((-entry[0] - now) / self.cycle_seconds - 1.0)
+                energy = min(remaining, vehicle.max_discharge_rate_kw, vehicle.state_of_charge_kwh, spare)
+            if energy <= 0:
+                # Every vehicle below this one has less slack (or no room) as well.
+                break
+            heapq.heappop(heap)
+            delta = energy if charging else -energy
+            vehicle.state_of_charge_kwh = min(max(vehicle.state_of_charge_kwh + delta, 0.0), vehicle.capacity_kwh)
+            self.state_of_charge_kwh += delta
+            vehicle.mode, vehicle.power_kw = mode, energy
+            self._active.append(vehicle)
+            remaining -= energy
+        # Re-keyed only now, so no vehicle is served twice by one command.
+        for vehicle in self._active:
+            self._index(vehicle)
+        return power_kw - remaining
+
+    def aggregate(self) -> Dict[str, float | bool]:
+        """The depot as one vehicle, in the fields of the single-vehicle state."""
+        return {
+            "connected": bool(self.vehicles),
+            "capacity_kwh": self.capacity_kwh,
+            "state_of_charge_kwh": min(max(self.state_of_charge_kwh, 0.0), self.capacity_kwh),
+            "max_charge_rate_kw": self.max_charge_rate_kw,
+            "max_discharge_rate_kw": self.max_discharge_rate_kw,
+        }
+
+
+__all__ = ["Depot", "DepotVehicle", "epoch_seconds", "from_epoch_seconds"]
@@ -2,13 +2,30 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Security, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from services.common.agent_state import (
+    CONFLICT_RESPONSE,
+    NOT_MODIFIED_RESPONSE,
+    StateBackend,
+    check_expected_version,
+    create_agent_state,
+    not_modified,
+)
+from services.common.history import HistoryResponse, create_state_history
+from services.common.journal import durability_dependency, open_state_journal
+from services.common.metrics import MetricsRegistry, instrument_agent_state, instrument_app
+from services.common.state_stream import StateStream
+from services.common.status_response import StatusResponseCache
+from services.vehicle_agent.app import physics
+from services.vehicle_agent.app.depot import Depot, DepotVehicle, epoch_seconds, from_epoch_seconds
+
 
 class VehicleMode(str, Enum):
     charge = "charge"
@@ -25,6 +42,9 @@ class VehicleMeasurement(BaseModel):
 class VehicleControl(BaseModel):
     mode: VehicleMode
     power_kw: float = Field(..., ge=0)
+    expected_version: Optional[int] = Field(
+        None, ge=0, description="Apply only if the state is still at this version; 409 otherwise"
+    )
 
 
 class VehicleStatus(BaseModel):
@@ -38,10 +58,49 @@ class VehicleStatus(BaseModel):
     last_updated: datetime
 
 
+class DepotVehicleConnection(BaseModel):
+    capacity_kwh: float = Field(..., gt=0)
+    state_of_charge_kwh: float = Field(..., ge=0)
+    target_kwh: Optional[float] = Field(None, ge=0, description="Charge wanted at departure; the capacity if omitted")
+    max_charge_rate_kw: float = Field(7.0, gt=0)
+    max_discharge_rate_kw: float = Field(7.0, ge=0)
+    departure: datetime
+
+
+class DepotVehicleStatus(BaseModel):
+    vehicle_id: str
+    capacity_kwh: float
+    state_of_charge_kwh: float
+    target_kwh: float
+    max_charge_rate_kw: float
+    max_discharge_rate_kw: float
+    departure: datetime
+    mode: VehicleMode
+    power_kw: float
+
+
+class DepotResponse(BaseModel):
+    vehicles: List[DepotVehicleStatus]
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="")
 
     api_key: str = Field(..., validation_alias="SERVICE_API_KEY")
+    state_backend: StateBackend = Field(default="memory", validation_alias="STATE_BACKEND")
+    state_shm_name: str = Field(default="vehicle-agent-state", validation_alias="STATE_SHM_NAME")
+    history_horizon: int = Field(default=65_536, gt=0, validation_alias="HISTORY_HORIZON")
+    state_dir: Optional[str] = Field(default=None, validation_alias="STATE_DIR")
+    state_wal_sync: bool = Field(default=True, validation_alias="STATE_WAL_SYNC")
+    state_snapshot_every: int = Field(default=10_000, gt=0, validation_alias="STATE_SNAPSHOT_EVERY")
+    depot_mode: bool = Field(default=False, validation_alias="DEPOT_MODE")
+    depot_cycle_seconds: float = Field(default=3600.0, gt=0, validation_alias="DEPOT_CYCLE_SECONDS")
+
+    @model_validator(mode="after")
+    def _depot_needs_local_state(self) -> "Settings":
+        if self.depot_mode and self.state_backend == "shared":
+            raise ValueError("DEPOT_MODE keeps the vehicles in process memory and needs STATE_BACKEND=memory")
+        return self
 
 
 settings = Settings()
@@ -49,7 +108,7 @@ API_KEY_HEADER_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_HEADER_NAME, auto_error=False)
 
 
-def require_api_key(api_key: str = Security(api_key_header)) -> str:
+async def require_api_key(api_key: str = Security(api_key_header)) -> str:
     if api_key is None or api_key != settings.api_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
     return api_key
@@ -67,14 +126,39 @@ DEFAULTS: Dict[str, float | bool | datetime | VehicleMode] = {
 }
 
 
-state: Dict[str, float | bool | datetime | VehicleMode] = DEFAULTS.copy()
+state = create_agent_state(DEFAULTS, settings.state_backend, settings.state_shm_name)
+state_stream = StateStream(state)
+status_response = StatusResponseCache(state, VehicleStatus)
+history = create_state_history(state, settings.history_horizon)
+journal = open_state_journal(
+    state, settings.state_dir, "vehicle", sync=settings.state_wal_sync, snapshot_every=settings.state_snapshot_every
+)
+durable_commit = durability_dependency(journal)
+depot = Depot(settings.depot_cycle_seconds) if settings.depot_mode else None
 app = FastAPI(title="Electric Vehicle Agent", version="1.0.0")
+metrics = MetricsRegistry()
+instrument_app(app, metrics)
+instrument_agent_state(metrics, state)
 
 
 def clamp_state_of_charge() -> None:
-    capacity = float(state["capacity_kwh"])
-    soc = float(state["state_of_charge_kwh"])
-    state["state_of_charge_kwh"] = min(max(soc, 0.0), capacity)
+    state["state_of_charge_kwh"] = float(
+        physics.clamp_state_of_charge(float(state["state_of_charge_kwh"]), float(state["capacity_kwh"]))
+    )
+
+
+def write_depot_aggregate() -> None:
+    for name, value in depot.aggregate().items():
+        state[name] = value
+
+
+if depot is not None:
+    # The vehicle list is not journaled: start from an empty depot and let vehicles reconnect.
+    with state.transaction():
+        write_depot_aggregate()
+        state["mode"] = VehicleMode.idle
+        state["power_kw"] = 0.0
+        state.commit()
 
 
 @app.get("/health")
@@ -82,52 +166,135 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.get("/status", response_model=VehicleStatus)
-def get_status(_: str = Depends(require_api_key)) -> VehicleStatus:
-    return VehicleStatus(**state)
-
-
-@app.post("/update", response_model=VehicleStatus)
-def update_measurement(measurement: VehicleMeasurement, _: str = Depends(require_api_key)) -> VehicleStatus:
-    if measurement.connected is not None:
-        state["connected"] = measurement.connected
-    if measurement.capacity_kwh:
-        state["capacity_kwh"] = measurement.capacity_kwh
-    state["state_of_charge_kwh"] = measurement.state_of_charge_kwh
-    clamp_state_of_charge()
-    state["last_updated"] = datetime.utcnow()
-    return VehicleStatus(**state)
-
-
-@app.post("/control", response_model=VehicleStatus)
-def apply_control(control: VehicleControl, _: str = Depends(require_api_key)) -> VehicleStatus:
-    if not state["connected"] and control.mode != VehicleMode.idle:
-        raise HTTPException(status_code=400, detail="Vehicle not connected")
-
-    state["mode"] = control.mode
-    effective_power = 0.0
-    soc = float(state["state_of_charge_kwh"])
-    capacity = float(state["capacity_kwh"])
-
-    if control.mode == VehicleMode.charge:
-        available_room = capacity - soc
-        if available_room > 0:
-            effective_power = min(control.power_kw, float(state["max_charge_rate_kw"]), available_room)
-            state["state_of_charge_kwh"] = soc + effective_power
-    elif control.mode == VehicleMode.discharge:
-        available_energy = soc
-        if available_energy > 0:
-            effective_power = min(control.power_kw, float(state["max_discharge_rate_kw"]), available_energy)
-            state["state_of_charge_kwh"] = soc - effective_power
-    elif control.mode == VehicleMode.idle:
-        effective_power = 0.0
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported mode")
-
-    state["power_kw"] = effective_power
-    clamp_state_of_charge()
-    state["last_updated"] = datetime.utcnow()
-    return VehicleStatus(**state)
+@app.get("/status", response_model=VehicleStatus, responses=NOT_MODIFIED_RESPONSE)
+async def get_status(
+    request: Request, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    unchanged = not_modified(request, state)
+    if unchanged is not None:
+        return unchanged
+    return status_response.response(accept)
+
+
+@app.post("/update", response_model=VehicleStatus, dependencies=[Depends(durable_commit)])
+async def update_measurement(
+    measurement: VehicleMeasurement, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    if depot is not None:
+        raise HTTPException(status_code=400, detail="Depot mode: connect vehicles through PUT /vehicles/{vehicle_id}")
+    with state.transaction():
+        if measurement.connected is not None:
+            state["connected"] = measurement.connected
+        if measurement.capacity_kwh:
+            state["capacity_kwh"] = measurement.capacity_kwh
+        state["state_of_charge_kwh"] = measurement.state_of_charge_kwh
+        clamp_state_of_charge()
+        state.commit()
+        return status_response.response(accept)
+
+
+@app.post("/control", response_model=VehicleStatus, responses=CONFLICT_RESPONSE, dependencies=[Depends(durable_commit)])
+async def apply_control(
+    control: VehicleControl, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+) -> Response:
+    with state.transaction():
+        check_expected_version(state, control.expected_version)
+        if not state["connected"] and control.mode != VehicleMode.idle:
+            raise HTTPException(status_code=400, detail="Vehicle not connected")
+
+        state["mode"] = control.mode
+        if depot is not None:
+            state["power_kw"] = depot.dispatch(control.mode.value, control.power_kw)
+            write_depot_aggregate()
+        else:
+            effective_power, soc = physics.apply_control(
+                float(state["state_of_charge_kwh"]),
+                float(state["capacity_kwh"]),
+                float(state["max_charge_rate_kw"]),
+                float(state["max_discharge_rate_kw"]),
+                control.power_kw if control.mode == VehicleMode.charge else 0.0,
+                control.power_kw if control.mode == VehicleMode.discharge else 0.0,
+            )
+            state["state_of_charge_kwh"] = float(soc)
+            state["power_kw"] = float(effective_power)
+        state.commit()
+        return status_response.response(accept)
+
+
+def _depot_vehicle_status(vehicle: DepotVehicle) -> DepotVehicleStatus:
+    return DepotVehicleStatus(
+        vehicle_id=vehicle.vehicle_id,
+        capacity_kwh=vehicle.capacity_kwh,
+        state_of_charge_kwh=vehicle.state_of_charge_kwh,
+        target_kwh=vehicle.target_kwh,
+        max_charge_rate_kw=vehicle.max_charge_rate_kw,
+        max_discharge_rate_kw=vehicle.max_discharge_rate_kw,
+        departure=from_epoch_seconds(vehicle.departure),
+        mode=vehicle.mode,
+        power_kw=vehicle.power_kw,
+    )
+
+
+if depot is not None:
+
+    @app.get("/vehicles", response_model=DepotResponse)
+    async def list_vehicles(_: str = Depends(require_api_key)) -> DepotResponse:
+        with state.transaction():
+            return DepotResponse(vehicles=[_depot_vehicle_status(vehicle) for vehicle in depot.vehicles.values()])
+
+    @app.put("/vehicles/{vehicle_id}", response_model=VehicleStatus, dependencies=[Depends(durable_commit)])
+    async def connect_vehicle(
+        vehicle_id: str,
+        connection: DepotVehicleConnection,
+        _: str = Depends(require_api_key),
+        accept: Optional[str] = Header(None),
+    ) -> Response:
+        vehicle = DepotVehicle(
+            vehicle_id=vehicle_id,
+            capacity_kwh=connection.capacity_kwh,
+            state_of_charge_kwh=connection.state_of_charge_kwh,
+            target_kwh=connection.capacity_kwh if connection.target_kwh is None else connection.target_kwh,
+            max_charge_rate_kw=connection.max_charge_rate_kw,
+            max_discharge_rate_kw=connection.max_discharge_rate_kw,
+            departure=epoch_seconds(connection.departure),
+        )
+        with state.transaction():
+            depot.connect(vehicle)
+            write_depot_aggregate()
+            state.commit()
+            return status_response.response(accept)
+
+    @app.delete("/vehicles/{vehicle_id}", response_model=VehicleStatus, dependencies=[Depends(durable_commit)])
+    async def disconnect_vehicle(
+        vehicle_id: str, _: str = Depends(require_api_key), accept: Optional[str] = Header(None)
+    ) -> Response:
+        with state.transaction():
+            if depot.disconnect(vehicle_id) is None:
+                raise HTTPException(status_code=404, detail=f"Vehicle {vehicle_id!r} not connected")
+            write_depot_aggregate()
+            state.commit()
+            return status_response.response(accept)
+
+
+@app.get("/layout")
+async def get_layout(_: str = Depends(require_api_key)) -> Dict[str, Any]:
+    """Slot layout of the ``application/x-state-slots`` status encoding."""
+    return status_response.codec.describe()
+
+
+@app.get("/history", response_model=HistoryResponse)
+def get_history(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    step: float = Query(60.0, gt=0, description="Bucket width in seconds"),
+    _: str = Depends(require_api_key),
+) -> HistoryResponse:
+    return history.query(start, end, step)
+
+
+@app.get("/subscribe", response_class=StreamingResponse)
+async def subscribe(request: Request, _: str = Depends(require_api_key)) -> StreamingResponse:
+    return state_stream.response(request)
 
 
 __all__ = ["app"]
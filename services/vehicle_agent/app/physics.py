@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from typing import Tuple, TypeVar
+
+import numpy as np
+
+Value = TypeVar("Value", float, np.ndarray)
+
+
+def _extrema(value: Value):
+    # Builtins on scalars, where the ufuncs cost ~1 us a call; ufuncs on arrays.
+    return (np.minimum, np.maximum) if isinstance(value, np.ndarray) else (min, max)
+
+
+def clamp_state_of_charge(soc: Value, capacity: Value) -> Value:
+    minimum, maximum = _extrema(soc)
+    return minimum(maximum(soc, 0.0), capacity)
+
+
+def apply_control(
+    soc: Value,
+    capacity: Value,
+    max_charge_rate: Value,
+    max_discharge_rate: Value,
+    charge_kw: Value,
+    discharge_kw: Value,
+) -> Tuple[Value, Value]:
+    # Vehicle response to one /control step, returning (applied power, new SoC),
+    # for floats or arrays. Whether the vehicle is connected is checked by the
+    # caller: a disconnected vehicle is only ever sent zero power. ``soc``
+    # decides between scalar and array arithmetic.
+    minimum, maximum = _extrema(soc)
+    room = maximum(capacity - soc, 0.0)
+    charged = minimum(minimum(charge_kw, max_charge_rate), room)
+    discharged = minimum(minimum(discharge_kw, max_discharge_rate), maximum(soc, 0.0))
+    soc = clamp_state_of_charge(soc + charged - discharged, capacity)
+    return charged + discharged, soc
+
+
+__all__ = ["apply_control", "clamp_state_of_charge"]
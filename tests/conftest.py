@@ -0,0 +1,4 @@
+import os
+
+# The agents and central read their settings at import time.
+os.environ.setdefault("SERVICE_API_KEY", "test-key")
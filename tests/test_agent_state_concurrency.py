@@ -0,0 +1,82 @@
+"""Concurrent battery ``/control`` calls against one in-process ``AgentState``."""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+from typing import AsyncIterator, List, Tuple
+
+import httpx
+import pytest
+
+from services.battery_agent.app.main import app
+
+CONTROLS = 200
+INITIAL_SOC_KWH = 5.0
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def client() -> AsyncIterator[httpx.AsyncClient]:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-API-Key": os.environ["SERVICE_API_KEY"]}
+    async with httpx.AsyncClient(transport=transport, base_url="http://battery", headers=headers) as client:
+        response = await client.post("/update", json={"state_of_charge_kwh": INITIAL_SOC_KWH})
+        response.raise_for_status()
+        yield client
+
+
+def _version(response: httpx.Response) -> int:
+    return int(response.headers["X-State-Version"])
+
+
+async def _control(client: httpx.AsyncClient, mode: str, power_kw: float, **fields: int) -> httpx.Response:
+    return await client.post("/control", json={"mode": mode, "power_kw": power_kw, **fields})
+
+
+async def test_concurrent_controls_apply_every_delta_once(client: httpx.AsyncClient) -> None:
+    start = _version(await client.get("/status"))
+    rng = random.Random(0)
+    commands = [(rng.choice(["charge", "discharge"]), rng.uniform(0.0, 2.0)) for _ in range(CONTROLS)]
+    responses = await asyncio.gather(*(_control(client, mode, power) for mode, power in commands))
+
+    replies: List[Tuple[int, float]] = []
+    for (mode, _), response in zip(commands, responses):
+        assert response.status_code == 200
+        applied = response.json()["power_kw"]
+        replies.append((_version(response), applied if mode == "charge" else -applied))
+    replies.sort()
+    versions = [version for version, _ in replies]
+    assert versions == list(range(start + 1, start + CONTROLS + 1))
+
+    final = (await client.get("/status")).json()
+    assert abs(final["state_of_charge_kwh"] - (INITIAL_SOC_KWH + sum(delta for _, delta in replies))) < 1e-9
+    assert final["min_state_of_charge_kwh"] <= final["state_of_charge_kwh"] <= final["capacity_kwh"]
+
+
+async def test_stale_expected_version_is_rejected(client: httpx.AsyncClient) -> None:
+    read = _version(await client.get("/status"))
+    assert (await _control(client, "charge", 1.0, expected_version=read)).status_code == 200
+
+    stale = await _control(client, "charge", 1.0, expected_version=read)
+    assert stale.status_code == 409
+    assert _version(stale) == read + 1
+    current = await client.get("/status")
+    assert _version(current) == read + 1
+    assert current.json()["state_of_charge_kwh"] == pytest.approx(INITIAL_SOC_KWH + 1.0)
+
+
+async def test_only_one_control_wins_a_version(client: httpx.AsyncClient) -> None:
+    read = _version(await client.get("/status"))
+    responses = await asyncio.gather(
+        *(_control(client, "discharge", 0.5, expected_version=read) for _ in range(20))
+    )
+    codes = sorted(response.status_code for response in responses)
+    assert codes == [200] + [409] * 19
+    assert _version(await client.get("/status")) == read + 1
@@ -0,0 +1,85 @@
+"""Horizon planner on constant forecasts, where the ADMM solve used to run into its iteration bound."""
+from __future__ import annotations
+
+import pytest
+
+from services.central.app.models import (
+    BatteryMode,
+    BatteryStatus,
+    HorizonForecast,
+    LoadStatus,
+    SolarStatus,
+    SystemStatus,
+    VehicleMode,
+    VehicleStatus,
+)
+from services.central.app.mpc import MPCPlanner
+from services.central.app.planner import plan_actions
+
+HORIZON = 96
+STEP_HOURS = 0.25
+
+
+def _status(production: float, critical: float, flexible: float, soc: float, connected: bool) -> SystemStatus:
+    return SystemStatus(
+        solar=SolarStatus(production_kw=production),
+        battery=BatteryStatus(
+            capacity_kwh=10.0, state_of_charge_kwh=soc, min_state_of_charge_kwh=1.0,
+            max_charge_rate_kw=5.0, max_discharge_rate_kw=5.0, mode=BatteryMode.idle, power_kw=0.0,
+        ),
+        vehicle=VehicleStatus(
+            connected=connected, capacity_kwh=60.0, state_of_charge_kwh=30.0,
+            max_charge_rate_kw=7.0, max_discharge_rate_kw=7.0, mode=VehicleMode.idle, power_kw=0.0,
+        ),
+        load=LoadStatus(
+            critical_load_kw=critical, flexible_load_kw=flexible, shed_kw=0.0,
+            total_nominal_load_kw=critical + flexible, total_consumption_kw=critical + flexible,
+        ),
+    )
+
+
+def _constant(production: float, critical: float, flexible: float, connected: bool) -> HorizonForecast:
+    return HorizonForecast(
+        production_kw=[production] * HORIZON,
+        critical_load_kw=[critical] * HORIZON,
+        flexible_load_kw=[flexible] * HORIZON,
+        vehicle_connected=[connected] * HORIZON,
+    )
+
+
+def test_constant_deficit_at_minimum_soc_converges() -> None:
+    # Empty battery, vehicle away and an 8 kW deficit for the whole horizon:
+    # nothing can be dispatched, so the flexible load is shed and the rest is unserved.
+    planner = MPCPlanner(HORIZON, STEP_HOURS)
+    status = _status(0.0, 6.0, 2.0, soc=1.0, connected=False)
+    forecast = _constant(0.0, 6.0, 2.0, False)
+    for _ in range(3):
+        solution = planner.solve(status, forecast)
+        assert solution.converged
+        assert solution.iterations < 200
+        assert solution.battery_kw[0] == pytest.approx(0.0, abs=1e-3)
+        assert solution.vehicle_kw[0] == 0.0
+        assert solution.shed_kw[0] == pytest.approx(2.0, abs=1e-2)
+        assert solution.unserved_kw[0] == pytest.approx(6.0, abs=1e-2)
+
+
+@pytest.mark.parametrize(
+    ("production", "critical", "flexible", "soc", "connected"),
+    [(0.0, 6.0, 2.0, 1.0, True), (8.0, 1.0, 1.0, 5.0, False), (3.0, 2.0, 1.0, 5.0, False)],
+)
+def test_constant_forecasts_converge_cold(
+    production: float, critical: float, flexible: float, soc: float, connected: bool
+) -> None:
+    planner = MPCPlanner(HORIZON, STEP_HOURS)
+    status = _status(production, critical, flexible, soc, connected)
+    solution = planner.solve(status, _constant(production, critical, flexible, connected), warm=False)
+    assert solution.converged
+
+
+def test_bounded_solve_falls_back_to_greedy_plan() -> None:
+    planner = MPCPlanner(HORIZON, STEP_HOURS, max_iterations=1)
+    status = _status(0.0, 6.0, 2.0, soc=5.0, connected=True)
+    actions, schedule = planner.plan(status, _constant(0.0, 6.0, 2.0, True))
+    assert not schedule.converged
+    assert schedule.fallback
+    assert actions == plan_actions(status)
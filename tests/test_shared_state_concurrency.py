@@ -0,0 +1,93 @@
+"""Battery ``/control`` from several processes sharing one ``SharedAgentState`` segment."""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+import random
+import tempfile
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, List, Tuple
+
+import httpx
+import pytest
+
+PROCESSES = 4
+CONTROLS_PER_PROCESS = 150
+INITIAL_SOC_KWH = 5.0
+
+Reply = Tuple[int, float, float, float, float]
+
+
+async def _send_controls(seed: int) -> List[Reply]:
+    from services.battery_agent.app.main import app
+
+    rng = random.Random(seed)
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-API-Key": os.environ["SERVICE_API_KEY"]}
+    async with httpx.AsyncClient(transport=transport, base_url="http://battery", headers=headers) as client:
+
+        async def control() -> Reply:
+            mode = rng.choice(["charge", "discharge"])
+            response = await client.post("/control", json={"mode": mode, "power_kw": rng.uniform(0.0, 2.0)})
+            response.raise_for_status()
+            body = response.json()
+            applied = body["power_kw"] if mode == "charge" else -body["power_kw"]
+            return (
+                int(response.headers["X-State-Version"]),
+                applied,
+                body["state_of_charge_kwh"],
+                body["min_state_of_charge_kwh"],
+                body["capacity_kwh"],
+            )
+
+        return await asyncio.gather(*(control() for _ in range(CONTROLS_PER_PROCESS)))
+
+
+def _worker(name: str, seed: int, start: Any, replies: Any) -> None:
+    os.environ["STATE_BACKEND"] = "shared"
+    os.environ["STATE_SHM_NAME"] = name
+    # Attach to the segment before the race starts.
+    importlib.import_module("services.battery_agent.app.main")
+
+    start.wait()
+    replies.put(asyncio.run(_send_controls(seed)))
+
+
+@pytest.fixture
+def segment_name():
+    name = f"test-battery-{os.getpid()}"
+    yield name
+    for segment in (name, f"{name}-history", f"{name}-forecast"):
+        try:
+            SharedMemory(name=segment).unlink()
+        except FileNotFoundError:
+            pass
+    try:
+        os.remove(os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+    except FileNotFoundError:
+        pass
+
+
+def test_parallel_control_keeps_soc_invariants(segment_name):
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(PROCESSES)
+    queue = context.Queue()
+    workers = [
+        context.Process(target=_worker, args=(segment_name, seed, start, queue)) for seed in range(PROCESSES)
+    ]
+    for worker in workers:
+        worker.start()
+    replies = [reply for _ in workers for reply in queue.get(timeout=60)]
+    for worker in workers:
+        worker.join(timeout=10)
+        assert worker.exitcode == 0
+
+    versions = sorted(reply[0] for reply in replies)
+    assert versions == list(range(1, PROCESSES * CONTROLS_PER_PROCESS + 1))
+    for _, _, soc, min_soc, capacity in replies:
+        assert min_soc <= soc <= capacity
+    final_soc = max(replies)[2]
+    expected_soc = INITIAL_SOC_KWH + sum(reply[1] for reply in replies)
+    assert abs(final_soc - expected_soc) < 1e-9